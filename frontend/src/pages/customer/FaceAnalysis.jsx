@@ -191,6 +191,10 @@ const FaceAnalysis = () => {
     return `${API_URL}/static/videos/${videoFile}`;
   };
 
+  const getVideoPosterUrl = (videoFile) => {
+    return `${API_URL}/static/videos/${videoFile}/poster`;
+  };
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 via-indigo-50 to-purple-50 py-8 px-4">
       <div className="max-w-4xl mx-auto">
@@ -390,9 +394,10 @@ const FaceAnalysis = () => {
                   <div className="bg-gray-900 rounded-xl overflow-hidden">
                     <video
                       controls
+                      preload="none"
                       className="w-full"
                       src={getVideoUrl(result.video_file)}
-                      poster="data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='800' height='450' viewBox='0 0 800 450'%3E%3Crect fill='%23111827' width='800' height='450'/%3E%3Ctext x='50%25' y='50%25' text-anchor='middle' fill='%23ffffff' font-size='20' font-family='Arial'%3EWorkout Video%3C/text%3E%3C/svg%3E"
+                      poster={getVideoPosterUrl(result.video_file)}
                     >
                       Your browser does not support the video tag.
                     </video>
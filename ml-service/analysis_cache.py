@@ -0,0 +1,180 @@
+"""
+Face Analysis Result Cache
+In-process LRU cache for face analysis results keyed by the uploaded bytes
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from service_metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('FACE_CACHE_MAX_ENTRIES', '256'))
+DEFAULT_TTL_SECONDS = float(os.environ.get('FACE_CACHE_TTL_SECONDS', '600'))
+
+
+class AnalysisCache:
+    """
+    Bounded, TTL-based LRU cache for analysis results
+
+    Keys combine a SHA-256 of the uploaded image bytes with the analyzer name
+    and version, so a new model version never returns stale results.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached results; 0 disables caching
+            ttl_seconds: Seconds a cached result stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(image_bytes: bytes) -> str:
+        """
+        Hash uploaded image bytes
+
+        Args:
+            image_bytes: Raw uploaded file contents
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, analyzer: str, version: str) -> tuple:
+        """
+        Build a cache key
+
+        Args:
+            content_hash: Hash of the uploaded bytes
+            analyzer: Analyzer name, e.g. 'face_shape'
+            version: Analyzer and model version
+
+        Returns:
+            Cache key
+        """
+        return (analyzer, version, content_hash)
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Copy of the cached result, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                record_cache_lookup('analysis', False)
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+
+        record_cache_lookup('analysis', True)
+
+        return copy.deepcopy(value)
+
+    def set(self, key: tuple, value: Dict) -> None:
+        """
+        Store a result, evicting the least recently used entries when full
+
+        Args:
+            key: Key from make_key
+            value: Analysis result to cache
+        """
+        if self.max_entries <= 0:
+            return
+
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, analyzers: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop cached results
+
+        Args:
+            analyzers: Analyzer names to drop; None drops everything
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if analyzers is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                analyzers = set(analyzers)
+                stale = [key for key in self._entries if key[0] in analyzers]
+                for key in stale:
+                    del self._entries[key]
+                removed = len(stale)
+
+        if removed:
+            logger.info(f"Invalidated {removed} cached analysis results")
+        return removed
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with size, limits, hits, misses and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Singleton instance
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+def get_analysis_cache() -> AnalysisCache:
+    """
+    Get singleton instance of AnalysisCache
+
+    Returns:
+        AnalysisCache instance
+    """
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisCache()
+    return _analysis_cache
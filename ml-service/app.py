@@ -1,103 +1,369 @@
 import pandas as pd
 import numpy as np
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException, RequestedRangeNotSatisfiable
 from sklearn.linear_model import LinearRegression
 from sklearn.tree import DecisionTreeClassifier
 import joblib
 import os
 from datetime import datetime, timedelta
 import calendar
+import json
 import logging
-import cv2
-from expense_predictor import ExpensePredictor
+import time
+from expense_predictor import ExpensePredictor, MODEL_FILE, SCALER_FILE, FEATURE_NAMES_FILE, METADATA_FILE
 from expense_models import ExpensePredictionRequest
 from face_shape_analyzer import get_face_analyzer
 from face_symmetry_analyzer import get_symmetry_analyzer
+from face_analysis import analyze_face_combined, analyze_all_faces, analyze_face_shape_batch
+from face_analysis import BATCH_MAX_IMAGES, MULTI_FACE_MAX_FACES
+from face_process_pool import FaceProcessUnavailable, get_face_process_pool
+from analysis_cache import get_analysis_cache
+from model_registry import get_model_registry
+from single_flight import SingleFlight
+from image_decoding import decode_image
+from image_admission import ImageAdmissionRequest, upload_rejection
+from hairstyle_payloads import RECOMMENDATION_VARIANTS, DEFAULT_RECOMMENDATION_VARIANT
+from hairstyle_assets import get_hairstyle_asset_pipeline
+from video_assets import get_video_assets, VIDEO_CACHE_MAX_AGE
+from face_streaming import FaceStreamSession, analyze_frame_stream, iter_length_prefixed_frames
+from face_streaming import DEFAULT_KEYFRAME_INTERVAL, DEFAULT_SMOOTHING_WINDOW
+from request_timing import SERVER_TIMING_ENABLED, append_timing, current_timings, stage, start_timing, stop_timing
+from service_metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from service_metrics import observe_image, record_cache_lookup, render_metrics, sample_process_rss, time_model_inference
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class FaceServiceRequest(ImageAdmissionRequest):
+    # Image upload routes are held to the upload limit; the live stream
+    # bounds each frame instead, and the training routes take JSON
+    image_endpoints = frozenset({'analyze_face_shape', 'analyze_face_symmetry', 'analyze_face'})
+    # Batch images are admitted one by one, so a bad image fails only its own entry
+    batch_endpoints = frozenset({'analyze_face_shape_batch_endpoint'})
+    max_batch_files = BATCH_MAX_IMAGES
+
+
 app = Flask(__name__)
+app.request_class = FaceServiceRequest
 CORS(app)  # Enable CORS for all routes
 
+analysis_cache = get_analysis_cache()
+# Identical analyses in progress at the same time, e.g. client retries, run once
+analysis_flights = SingleFlight('analysis')
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight under its route template."""
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_started_at = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.labels(route=g.metrics_route).inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the request's status and latency."""
+    route = g.get('metrics_route')
+    if route is not None:
+        HTTP_REQUESTS.labels(route=route, method=request.method, status=str(response.status_code)).inc()
+        HTTP_REQUEST_DURATION.labels(route=route, method=request.method).observe(
+            time.perf_counter() - g.metrics_started_at
+        )
+    sample_process_rss()
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Leave the in-flight count once the response, including a streamed body, is done."""
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        HTTP_REQUESTS_IN_FLIGHT.labels(route=route).dec()
+
+
+# Face analysis routes whose stages are reported in Server-Timing
+TIMED_ENDPOINTS = frozenset({
+    'analyze_face_shape', 'analyze_face_shape_batch_endpoint', 'analyze_face_symmetry', 'analyze_face'
+})
+
+
+def timing_debug_requested():
+    """Whether the client asked for stage timings in the JSON body (`?debug=timing`)."""
+    return request.args.get('debug') == 'timing'
+
+
+@app.before_request
+def start_stage_timing():
+    """Time the stages of face analysis requests when the header or debug body needs them."""
+    if request.endpoint in TIMED_ENDPOINTS and (SERVER_TIMING_ENABLED or timing_debug_requested()):
+        g.stage_timing_token = start_timing()
+
+
+@app.after_request
+def add_stage_timing(response):
+    """Report stage timings as a Server-Timing header and, on request, in the JSON body."""
+    timings = current_timings()
+    if timings is None:
+        return response
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timings.server_timing_header()
+        # CORS is open, so let cross-origin frontends read the header too
+        response.headers['Timing-Allow-Origin'] = '*'
+    if timing_debug_requested() and response.mimetype == 'application/json':
+        response.set_data(append_timing(response.get_data(as_text=True), timings))
+    return response
+
+
+@app.teardown_request
+def stop_stage_timing(exc):
+    """Stop timing so the next request on this thread starts clean."""
+    token = g.pop('stage_timing_token', None)
+    if token is not None:
+        stop_timing(token)
+
+
+def read_recommendation_variant():
+    """
+    Read the requested hairstyle recommendation variant.
+
+    `?recommendations=legacy` returns only the flat list of hairstyle names
+    expected by older hosted frontends; the default `full` also includes the
+    structured catalog.
+
+    Returns a tuple of (variant, None) or (None, error_response).
+    """
+    variant = request.args.get('recommendations', DEFAULT_RECOMMENDATION_VARIANT)
+    if variant not in RECOMMENDATION_VARIANTS:
+        return None, (jsonify({
+            'success': False,
+            'message': f"recommendations must be one of: {', '.join(RECOMMENDATION_VARIANTS)}"
+        }), 400)
+    return variant, None
+
+
+def read_face_mode():
+    """
+    Read which faces of the upload to analyze.
+
+    `?faces=all` analyzes every face in a group photo; the default
+    `primary` analyzes only the largest face.
+
+    Returns a tuple of (mode, None) or (None, error_response).
+    """
+    mode = request.args.get('faces', 'primary')
+    if mode not in ('primary', 'all'):
+        return None, (jsonify({
+            'success': False,
+            'message': 'faces must be one of: primary, all'
+        }), 400)
+    return mode, None
+
+
+def json_response(body, status):
+    """Wrap an already serialized JSON body in a Flask response."""
+    return Response(body, status=status, mimetype='application/json')
+
+
+def read_request_files():
+    """
+    Parse the uploaded files of the current request.
+
+    Each upload is admitted by its image header while the body is parsed,
+    so oversized (413) or unsupported (415) images are rejected before the
+    rest of the body is read.
+
+    Returns a tuple of (files, None) or (None, error_response).
+    """
+    try:
+        with stage('upload'):
+            return request.files, None
+    except HTTPException as e:
+        logger.warning(f'Upload rejected ({e.code}): {e.description}')
+        return None, (jsonify({
+            'success': False,
+            'message': e.description
+        }), e.code)
+
+
+def read_request_image_bytes():
+    """
+    Read the uploaded `image` file from the current request.
+
+    Returns a tuple of (bytes, None) on success or (None, error_response)
+    where error_response is a ready-to-return Flask response tuple.
+    """
+    files, error_response = read_request_files()
+    if error_response is not None:
+        return None, error_response
+    
+    # Check if image file is in request
+    if 'image' not in files:
+        logger.warning('No image file provided')
+        return None, (jsonify({
+            'success': False,
+            'message': 'No image file provided'
+        }), 400)
+    
+    file = files['image']
+    
+    if file.filename == '':
+        logger.warning('Empty filename')
+        return None, (jsonify({
+            'success': False,
+            'message': 'No file selected'
+        }), 400)
+    
+    return file.read(), None
+
+
+INVALID_IMAGE_RESULT = {
+    'success': False,
+    'message': 'Invalid image file'
+}
 
-def normalize_face_shape_response(result):
+def decode_image_bytes(image_bytes):
     """
-    Ensure legacy-safe response shape for hosted frontends.
+    Decode uploaded image bytes into a BGR image.
 
-    Older clients expect `recommended_hairstyles` to be a list of strings.
+    Large JPEGs are decoded at a reduced resolution; the returned factor
+    maps decoded pixel coordinates back to the original image.
+
+    Returns a tuple of (image, decode_factor, None) on success or
+    (None, None, error_response).
     """
-    if not isinstance(result, dict):
-        return result
+    with stage('decode'):
+        image, decode_factor = decode_image(image_bytes)
+    observe_image('upload', len(image_bytes), image)
+    
+    if image is None:
+        logger.error('Failed to decode image')
+        return None, None, (jsonify(INVALID_IMAGE_RESULT), 400)
+    
+    logger.info(f'Image loaded successfully, shape: {image.shape}, decode factor: {decode_factor}')
+    return image, decode_factor, None
 
-    if not result.get('success'):
-        return result
 
-    data = result.get('data')
-    if not isinstance(data, dict):
-        return result
+def analyze_request_image(analysis_type, version, analyze):
+    """
+    Run a face analysis on the uploaded image, reusing cached results.
 
-    recommendations = data.get('recommended_hairstyles')
+    Results are cached by a hash of the uploaded bytes plus the analysis
+    type and version, so re-submitted images skip decoding and detection.
+    A request for an image that is still being analyzed waits for that
+    analysis and shares its result.
 
-    if isinstance(recommendations, list):
-        normalized_list = []
-        for item in recommendations:
-            if isinstance(item, dict):
-                normalized_list.append(item.get('name', 'Recommended Style'))
-            else:
-                normalized_list.append(str(item))
-        data['recommended_hairstyles'] = normalized_list
-        return result
+    Returns a tuple of (result, None) or (None, error_response).
+    """
+    image_bytes, error_response = read_request_image_bytes()
+    if error_response is not None:
+        return None, error_response
+    
+    with stage('cache'):
+        cache_key = analysis_cache.make_key(analysis_cache.content_hash(image_bytes), analysis_type, version)
+        result = analysis_cache.get(cache_key)
+    if result is not None:
+        logger.info(f'Serving cached {analysis_type} result')
+        return result, None
+    
+    result = coalesce_analysis(
+        cache_key, lambda: analyze_uploaded_image(image_bytes, cache_key, analysis_type, analyze)
+    )
+    return result, None
 
-    structured = data.get('hairstyle_recommendations')
-    if isinstance(structured, dict):
-        primary = structured.get('primary', []) if isinstance(structured.get('primary'), list) else []
-        secondary = structured.get('secondary', []) if isinstance(structured.get('secondary'), list) else []
+def analyze_uploaded_image(image_bytes, cache_key, analysis_type, analyze):
+    """
+    Decode and analyze an uploaded image, caching a successful result.
 
-        normalized_list = []
-        for item in primary + secondary:
-            if isinstance(item, dict):
-                normalized_list.append(item.get('name', 'Recommended Style'))
-            else:
-                normalized_list.append(str(item))
+    An undecodable image gives a failed result rather than an error
+    response, so it can be shared with coalesced requests.
+    """
+    image, decode_factor, error_response = decode_image_bytes(image_bytes)
+    if error_response is not None:
+        return dict(INVALID_IMAGE_RESULT)
+    
+    result = run_analysis(analysis_type, analyze, image, decode_factor)
+    if result.get('success'):
+        analysis_cache.set(cache_key, result)
+    return result
 
-        data['recommended_hairstyles'] = normalized_list
+def coalesce_analysis(key, compute):
+    """
+    Run an analysis once for all concurrent requests with the same key.
 
+    Time spent waiting on another request's analysis is reported as the
+    `coalesced` stage.
+    """
+    started = time.perf_counter()
+    result, shared = analysis_flights.do(key, compute)
+    if shared:
+        logger.info(f'Shared in-flight {key[0]} analysis result')
+        timings = current_timings()
+        if timings is not None:
+            timings.add('coalesced', (time.perf_counter() - started) * 1000.0)
     return result
 
-# Load the trained models and feature lists
-try:
-    logger.info("Loading revenue prediction model...")
-    # Revenue prediction model
-    revenue_model = joblib.load('revenue_regression_model.pkl')
-    revenue_feature_columns = joblib.load('model_features.pkl')
-    logger.info("Revenue prediction model loaded successfully")
-    
-    logger.info("Loading add-on prediction model...")
-    # Add-on prediction model
-    addon_model = joblib.load('addon_decision_tree_model.pkl')
-    addon_feature_columns = joblib.load('addon_model_features.pkl')
-    logger.info("Add-on prediction model loaded successfully")
-    
-    # Initialize expense predictor
-    logger.info("Initializing expense predictor...")
-    expense_predictor = ExpensePredictor()
-    logger.info("Expense predictor initialized")
-    
-    models_loaded = True
-    logger.info("All models loaded successfully")
-except FileNotFoundError as e:
-    logger.error(f"Model files not found. Please train the models first. Error: {str(e)}")
+def run_analysis(analysis_type, analyze, image, decode_factor):
+    """
+    Run a face analysis in a worker process when the process pool is
+    enabled (FACE_PROCESS_WORKERS), otherwise in the request thread.
+    """
+    if face_process_pool is not None:
+        return face_process_pool.analyze(analysis_type, image, decode_factor)
+    return analyze(image, decode_factor=decode_factor)
+
+def face_shape_cache_version():
+    """
+    Version keying cached face shape results: the worker processes' model
+    when the process pool computes them, otherwise this process's.
+    """
+    if face_process_pool is not None:
+        version = face_process_pool.model_status()['cache_version']
+        if version is not None:
+            return version
+    return get_face_analyzer().cache_version
+
+def analysis_unavailable_response(error):
+    """503 for an analysis no worker process answered; the client may retry."""
+    return jsonify({
+        'success': False,
+        'message': f'Face analysis unavailable: {error}'
+    }), 503
+
+# Start the face analysis worker processes, if enabled, so each has loaded
+# its analyzers and model before the first request
+face_process_pool = get_face_process_pool()
+if face_process_pool is not None:
+    face_process_pool.start()
+
+# Start loading the face shape model in the background so the first
+# request is not blocked; the rule-based path is used until it is ready.
+# With worker processes the model is only loaded here once an analysis in
+# this process, such as a live stream, needs it.
+get_face_analyzer(load_model=face_process_pool is None)
+
+# Generate resized and WebP hairstyle images in the background; only
+# new or changed source images are re-encoded
+hairstyle_assets = get_hairstyle_asset_pipeline()
+hairstyle_assets.start_build()
+
+# Hash the exercise videos and extract their poster frames ahead of the first request
+video_assets = get_video_assets()
+video_assets.start_warm()
+
+# Load the trained models and feature lists once; requests and health
+# probes are served from memory, and missing models are retried with backoff
+model_registry = get_model_registry()
+model_registry.register('revenue', ('revenue_regression_model.pkl', 'model_features.pkl'))
+model_registry.register('addon', ('addon_decision_tree_model.pkl', 'addon_model_features.pkl'))
+model_registry.register('expense', (MODEL_FILE, SCALER_FILE, FEATURE_NAMES_FILE), build=ExpensePredictor.from_artifacts,
+                        optional_paths=(METADATA_FILE,))
+if not all(model_registry.is_loaded(name) for name in ('revenue', 'addon', 'expense')):
     print("Model files not found. Please train the models first.")
-    models_loaded = False
-    expense_predictor = ExpensePredictor()
-except Exception as e:
-    logger.error(f"Error loading models: {str(e)}")
-    print(f"Error loading models: {str(e)}")
-    models_loaded = False
-    expense_predictor = ExpensePredictor()
+
+# Models that must be loaded before /ready reports the service ready
+READY_REQUIRED_MODELS = [name for name in os.environ.get('READY_REQUIRED_MODELS', '').split(',') if name]
 
 def prepare_features(df):
     """
@@ -126,8 +392,10 @@ def predict_next_week_revenue():
     """
     Predict next week's revenue based on the trained model
     """
-    if not models_loaded:
+    revenue = model_registry.get('revenue')
+    if revenue is None:
         return None, None
+    revenue_model, revenue_feature_columns = revenue
     
     # Get next week number
     today = datetime.now()
@@ -171,7 +439,8 @@ def predict_next_week_revenue():
     X_pred = X_pred[revenue_feature_columns]
     
     # Make predictions for each day
-    daily_predictions = revenue_model.predict(X_pred)
+    with time_model_inference('revenue'):
+        daily_predictions = revenue_model.predict(X_pred)
     
     # Sum up for the week
     total_prediction = np.sum(daily_predictions)
@@ -184,23 +453,78 @@ def predict_next_week_revenue():
 @app.route('/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint
+    Health check endpoint; reports cached model status without touching the model files
     """
-    # Test if expense predictor can load model
-    expense_model_loaded = False
-    try:
-        if hasattr(expense_predictor, 'load_model'):
-            expense_model_loaded = expense_predictor.load_model()
-    except Exception as e:
-        logger.error(f'Error testing expense predictor: {str(e)}')
-    
     return jsonify({
         'status': 'healthy',
-        'models_loaded': models_loaded,
-        'expense_model_loaded': expense_model_loaded,
+        'models_loaded': model_registry.is_loaded('revenue') and model_registry.is_loaded('addon'),
+        'expense_model_loaded': model_registry.is_loaded('expense'),
+        'models': model_registry.status(),
+        'analysis_cache': analysis_cache.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe; 503 while the face shape model is loading, in every
+    worker process when the process pool is enabled, or a model listed in
+    READY_REQUIRED_MODELS is not loaded
+    """
+    if face_process_pool is not None:
+        face_model_state = face_process_pool.model_status()['state']
+    else:
+        face_model_state = get_face_analyzer().model_state
+    missing = [name for name in READY_REQUIRED_MODELS if model_registry.get(name) is None]
+    ready = face_model_state not in ('not_loaded', 'loading') and not missing
+    
+    return jsonify({
+        'ready': ready,
+        'face_model_state': face_model_state,
+        'missing_models': missing
+    }), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics, aggregated over all gunicorn workers
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/face-model/status', methods=['GET'])
+def face_model_status():
+    """
+    Face shape model status and micro-batching statistics; `workers` is the
+    state across the worker processes when the process pool is enabled
+    """
+    analyzer = get_face_analyzer()
+    status = analyzer.get_model_status()
+    status['batching'] = analyzer.get_model_batching_stats()
+    if face_process_pool is not None:
+        status['workers'] = face_process_pool.model_status()
+    
+    return jsonify({
+        'success': True,
+        'data': status
+    })
+
+@app.route('/face-model/ready', methods=['GET'])
+def face_model_ready():
+    """
+    Readiness probe for the face shape model; 503 until it is loaded and
+    warmed up, in every worker process when the process pool is enabled
+    """
+    if face_process_pool is not None:
+        status = face_process_pool.model_status()
+    else:
+        status = get_face_analyzer().get_model_status()
+    
+    return jsonify({
+        'success': status['ready'],
+        'data': status
+    }), 200 if status['ready'] else 503
+
 @app.route('/predict', methods=['GET'])
 def predict_revenue():
     """
@@ -243,11 +567,13 @@ def predict_addon():
     Predict if a customer will accept an add-on offer
     """
     try:
-        if not models_loaded:
+        addon = model_registry.get('addon')
+        if addon is None:
             return jsonify({
                 'success': False,
                 'message': 'Add-on model not available. Please train the model first.'
             }), 500
+        addon_model, addon_feature_columns = addon
         
         # Get data from request
         data = request.get_json()
@@ -287,8 +613,9 @@ def predict_addon():
         X_pred = X_pred[addon_feature_columns]
         
         # Make prediction
-        prediction = addon_model.predict(X_pred)[0]
-        probability = addon_model.predict_proba(X_pred)[0].max()
+        with time_model_inference('addon'):
+            prediction = addon_model.predict(X_pred)[0]
+            probability = addon_model.predict_proba(X_pred)[0].max()
         
         return jsonify({
             'success': True,
@@ -327,16 +654,23 @@ def train_model_endpoint():
         df = prepare_features(df)
         
         # Define features and target
+        revenue = model_registry.get('revenue')
+        if revenue is None:
+            return jsonify({
+                'success': False,
+                'message': 'Revenue feature list not available. Please run train_model.py first.'
+            }), 500
+        revenue_feature_columns = revenue[1]
         X = df[revenue_feature_columns]
         y = df['revenue']
         
         # Retrain the model
-        global revenue_model
         revenue_model = LinearRegression()
         revenue_model.fit(X, y)
         
-        # Save the updated model
+        # Save the updated model and serve it from now on
         joblib.dump(revenue_model, 'revenue_regression_model.pkl')
+        model_registry.reload('revenue')
         
         return jsonify({
             'success': True,
@@ -373,13 +707,13 @@ def train_addon_model_endpoint():
         y = df['conversion_outcome']
         
         # Train the Decision Tree model
-        global addon_model
         addon_model = DecisionTreeClassifier(random_state=42, max_depth=5)
         addon_model.fit(X, y)
         
-        # Save the updated model and feature list
+        # Save the updated model and feature list and serve them from now on
         joblib.dump(addon_model, 'addon_decision_tree_model.pkl')
         joblib.dump(feature_columns, 'addon_model_features.pkl')
+        model_registry.reload('addon')
         
         # Calculate accuracy
         accuracy = addon_model.score(X, y)
@@ -402,6 +736,8 @@ def train_addon_model_endpoint():
 def predict_next_month_expense():
     """
     Predict next month's total expenses using SVR model
+
+    `?explain=1` adds a local explanation of the prediction.
     """
     try:
         logger.info('Received request for next month expense prediction')
@@ -428,11 +764,17 @@ def predict_next_month_expense():
             }), 400
         
         # Predict next month's expenses
+        expense_predictor = model_registry.get('expense')
+        if expense_predictor is None:
+            raise ValueError("Model not trained or loaded. Please train the model first.")
+        
         logger.info('Calling expense predictor')
-        result = expense_predictor.predict_next_month(
-            request_data.last_month_data.dict(),
-            request_data.next_month_planning.dict() if request_data.next_month_planning else None
-        )
+        with time_model_inference('expense'):
+            result = expense_predictor.predict_next_month(
+                request_data.last_month_data.dict(),
+                request_data.next_month_planning.dict() if request_data.next_month_planning else None,
+                explain=request.args.get('explain') in ('1', 'true')
+            )
         logger.info(f'Prediction result: {result}')
         
         return jsonify({
@@ -456,50 +798,31 @@ def analyze_face_shape():
     try:
         logger.info('Received face shape analysis request')
         
-        # Check if image file is in request
-        if 'image' not in request.files:
-            logger.warning('No image file provided')
-            return jsonify({
-                'success': False,
-                'message': 'No image file provided'
-            }), 400
-        
-        file = request.files['image']
-        
-        if file.filename == '':
-            logger.warning('Empty filename')
-            return jsonify({
-                'success': False,
-                'message': 'No file selected'
-            }), 400
-        
-        # Read image file
-        file_bytes = np.frombuffer(file.read(), np.uint8)
-        image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            logger.error('Failed to decode image')
-            return jsonify({
-                'success': False,
-                'message': 'Invalid image file'
-            }), 400
-        
-        logger.info(f'Image loaded successfully, shape: {image.shape}')
+        variant, error_response = read_recommendation_variant()
+        if error_response is not None:
+            return error_response
         
         # Get face analyzer instance
         analyzer = get_face_analyzer()
         
         # Analyze face
-        result = analyzer.analyze_face(image)
-        result = normalize_face_shape_response(result)
+        result, error_response = analyze_request_image('face_shape', face_shape_cache_version(), analyzer.analyze_face)
+        if error_response is not None:
+            return error_response
         
+        # Recommendations are spliced in from the pre-serialized catalog
         if result['success']:
             logger.info(f'Face analysis successful: {result["data"]["face_shape"]}')
-            return jsonify(result), 200
+            with stage('serialize'):
+                body = analyzer.payloads.serialize_result(result, variant)
+            return json_response(body, 200)
         else:
             logger.warning(f'Face analysis failed: {result["message"]}')
             return jsonify(result), 400
             
+    except FaceProcessUnavailable as e:
+        logger.error(f'Error in face shape analysis endpoint: {str(e)}')
+        return analysis_unavailable_response(e)
     except Exception as e:
         logger.error(f'Error in face shape analysis endpoint: {str(e)}', exc_info=True)
         return jsonify({
@@ -507,57 +830,105 @@ def analyze_face_shape():
             'message': f'Server error: {str(e)}'
         }), 500
 
-@app.route('/analyze-face-symmetry', methods=['POST'])
-def analyze_face_symmetry():
+@app.route('/analyze-face-shape/batch', methods=['POST'])
+def analyze_face_shape_batch_endpoint():
     """
-    Analyze facial symmetry and recommend exercises
+    Analyze face shape for several uploaded images in one request
     """
     try:
-        logger.info('Received face symmetry analysis request')
+        uploads, error_response = read_request_files()
+        if error_response is not None:
+            return error_response
+        files = uploads.getlist('images')
+        logger.info(f'Received batch face shape analysis request with {len(files)} images')
         
-        # Check if image file is in request
-        if 'image' not in request.files:
-            logger.warning('No image file provided')
+        if not files:
+            logger.warning('No image files provided')
             return jsonify({
                 'success': False,
-                'message': 'No image file provided'
+                'message': 'No image files provided'
             }), 400
         
-        file = request.files['image']
-        
-        if file.filename == '':
-            logger.warning('Empty filename')
+        if len(files) > BATCH_MAX_IMAGES:
+            logger.warning(f'Too many images in batch: {len(files)}')
             return jsonify({
                 'success': False,
-                'message': 'No file selected'
+                'message': f'Too many images. Maximum is {BATCH_MAX_IMAGES} per request'
             }), 400
         
-        # Read image file
-        file_bytes = np.frombuffer(file.read(), np.uint8)
-        image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+        variant, error_response = read_recommendation_variant()
+        if error_response is not None:
+            return error_response
         
-        if image is None:
-            logger.error('Failed to decode image')
-            return jsonify({
-                'success': False,
-                'message': 'Invalid image file'
-            }), 400
+        # Images rejected while the body was parsed keep their place as error entries
+        rejections = [upload_rejection(file) for file in files]
+        images_bytes = [file.read() for file, rejection in zip(files, rejections) if rejection is None]
+        if face_process_pool is not None:
+            analyzed = iter(face_process_pool.analyze_batch(images_bytes))
+        else:
+            analyzed = iter(analyze_face_shape_batch(images_bytes))
+        results = [
+            next(analyzed) if rejection is None else {'success': False, 'message': rejection.description}
+            for rejection in rejections
+        ]
+        payloads = get_face_analyzer().payloads
         
-        logger.info(f'Image loaded successfully, shape: {image.shape}')
+        with stage('serialize'):
+            serialized_results = []
+            for index, (file, result) in enumerate(zip(files, results)):
+                result['index'] = index
+                result['filename'] = file.filename
+                serialized_results.append(payloads.serialize_result(result, variant))
+            
+            succeeded = sum(1 for result in results if result['success'])
+            body = (
+                '{"success": true, "data": {"results": [' + ', '.join(serialized_results) + '], '
+                f'"count": {len(results)}, "succeeded": {succeeded}}}, '
+                '"message": "Batch face shape analysis completed"}'
+            )
+        logger.info(f'Batch face shape analysis completed: {succeeded}/{len(files)} succeeded')
+        return json_response(body, 200)
+            
+    except FaceProcessUnavailable as e:
+        logger.error(f'Error in batch face shape analysis endpoint: {str(e)}')
+        return analysis_unavailable_response(e)
+    except Exception as e:
+        logger.error(f'Error in batch face shape analysis endpoint: {str(e)}', exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+@app.route('/analyze-face-symmetry', methods=['POST'])
+def analyze_face_symmetry():
+    """
+    Analyze facial symmetry and recommend exercises
+    """
+    try:
+        logger.info('Received face symmetry analysis request')
         
         # Get symmetry analyzer instance
         analyzer = get_symmetry_analyzer()
         
         # Analyze facial symmetry
-        result = analyzer.analyze_face_symmetry(image)
+        result, error_response = analyze_request_image(
+            'face_symmetry', analyzer.cache_version, analyzer.analyze_face_symmetry
+        )
+        if error_response is not None:
+            return error_response
         
         if result['success']:
             logger.info(f'Face symmetry analysis successful: {result["data"]["primary_issue"]}')
-            return jsonify(result), 200
+            with stage('serialize'):
+                response = jsonify(result)
+            return response, 200
         else:
             logger.warning(f'Face symmetry analysis failed: {result["message"]}')
             return jsonify(result), 400
             
+    except FaceProcessUnavailable as e:
+        logger.error(f'Error in face symmetry analysis endpoint: {str(e)}')
+        return analysis_unavailable_response(e)
     except Exception as e:
         logger.error(f'Error in face symmetry analysis endpoint: {str(e)}', exc_info=True)
         return jsonify({
@@ -565,15 +936,182 @@ def analyze_face_symmetry():
             'message': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/analyze-face', methods=['POST'])
+def analyze_face():
+    """
+    Analyze face shape and facial symmetry from a single upload
+    """
+    try:
+        logger.info('Received combined face analysis request')
+        
+        variant, error_response = read_recommendation_variant()
+        if error_response is not None:
+            return error_response
+        
+        face_mode, error_response = read_face_mode()
+        if error_response is not None:
+            return error_response
+        if face_mode == 'all':
+            return analyze_all_faces_response(variant)
+        
+        image_bytes, error_response = read_request_image_bytes()
+        if error_response is not None:
+            return error_response
+        
+        # Reuse results cached by the individual face shape and symmetry routes
+        with stage('cache'):
+            content_hash = analysis_cache.content_hash(image_bytes)
+            shape_key = analysis_cache.make_key(content_hash, 'face_shape', face_shape_cache_version())
+            symmetry_key = analysis_cache.make_key(content_hash, 'face_symmetry', get_symmetry_analyzer().cache_version)
+            shape_result = analysis_cache.get(shape_key)
+            symmetry_result = analysis_cache.get(symmetry_key)
+        
+        if shape_result is not None and symmetry_result is not None:
+            logger.info('Serving cached combined face analysis result')
+            result = {
+                'success': True,
+                'data': {
+                    'face_shape': shape_result['data'],
+                    'symmetry': symmetry_result['data']
+                }
+            }
+        else:
+            def analyze_combined():
+                image, decode_factor, error_response = decode_image_bytes(image_bytes)
+                if error_response is not None:
+                    return dict(INVALID_IMAGE_RESULT)
+                
+                # Decode and detect once, then share the detection between analyzers
+                result = run_analysis('face', analyze_face_combined, image, decode_factor)
+                if result['success']:
+                    analysis_cache.set(shape_key, {'success': True, 'data': result['data']['face_shape']})
+                    analysis_cache.set(symmetry_key, {'success': True, 'data': result['data']['symmetry']})
+                return result
+            
+            combined_key = analysis_cache.make_key(content_hash, 'face', f'{shape_key[1]}|{symmetry_key[1]}')
+            result = coalesce_analysis(combined_key, analyze_combined)
+        
+        if result['success']:
+            logger.info(
+                f'Combined face analysis successful: {result["data"]["face_shape"]["face_shape"]}, '
+                f'{result["data"]["symmetry"]["primary_issue"]}'
+            )
+            with stage('serialize'):
+                body = (
+                    '{"success": true, "data": {"face_shape": '
+                    + get_face_analyzer().payloads.serialize_data(result['data']['face_shape'], variant)
+                    + ', "symmetry": ' + json.dumps(result['data']['symmetry']) + '}}'
+                )
+            return json_response(body, 200)
+        else:
+            logger.warning(f'Combined face analysis failed: {result["message"]}')
+            return jsonify(result), 400
+            
+    except FaceProcessUnavailable as e:
+        logger.error(f'Error in combined face analysis endpoint: {str(e)}')
+        return analysis_unavailable_response(e)
+    except Exception as e:
+        logger.error(f'Error in combined face analysis endpoint: {str(e)}', exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+def analyze_all_faces_response(variant):
+    """
+    Analyze every face of the uploaded group photo (`/analyze-face?faces=all`).
+    """
+    version = f'{face_shape_cache_version()}|{get_symmetry_analyzer().cache_version}|{MULTI_FACE_MAX_FACES}'
+    result, error_response = analyze_request_image('face_multi', version, analyze_all_faces)
+    if error_response is not None:
+        return error_response
+    
+    if not result['success']:
+        logger.warning(f'Multi-face analysis failed: {result["message"]}')
+        return jsonify(result), 400
+    
+    logger.info(f'Multi-face analysis successful: {result["data"]["face_count"]} faces')
+    with stage('serialize'):
+        payloads = get_face_analyzer().payloads
+        faces = []
+        for face in result['data']['faces']:
+            if not face['success']:
+                faces.append(json.dumps(face))
+                continue
+            members = {key: value for key, value in face.items() if key != 'face_shape'}
+            faces.append(
+                json.dumps(members)[:-1]
+                + ', "face_shape": ' + payloads.serialize_data(face['face_shape'], variant) + '}'
+            )
+        body = (
+            '{"success": true, "data": {"faces": [' + ', '.join(faces) + '], '
+            f'"face_count": {result["data"]["face_count"]}}}}}'
+        )
+    return json_response(body, 200)
+
+@app.route('/analyze-face/stream', methods=['POST'])
+def analyze_face_stream():
+    """
+    Live face shape and symmetry analysis over a stream of camera frames
+    
+    The request body is a sequence of frames, each a 4-byte big-endian
+    length followed by the encoded image, and may be sent with chunked
+    transfer encoding. Results are streamed back as newline-delimited JSON,
+    one line per frame, followed by a final line with session statistics.
+    Optional query parameters: keyframe_interval, smoothing_window.
+    """
+    try:
+        keyframe_interval = int(request.args.get('keyframe_interval', DEFAULT_KEYFRAME_INTERVAL))
+        smoothing_window = int(request.args.get('smoothing_window', DEFAULT_SMOOTHING_WINDOW))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'keyframe_interval and smoothing_window must be integers'
+        }), 400
+    
+    logger.info(f'Starting face analysis stream (keyframe interval {keyframe_interval})')
+    session = FaceStreamSession(keyframe_interval, smoothing_window)
+    stream = request.stream
+    
+    def generate():
+        try:
+            for result in analyze_frame_stream(iter_length_prefixed_frames(stream), session):
+                yield json.dumps(result) + '\n'
+        except ValueError as e:
+            logger.warning(f'Malformed face analysis stream: {str(e)}')
+            yield json.dumps({'success': False, 'message': str(e)}) + '\n'
+        except Exception as e:
+            logger.error(f'Error in face analysis stream: {str(e)}', exc_info=True)
+            yield json.dumps({'success': False, 'message': f'Server error: {str(e)}'}) + '\n'
+        
+        stats = session.stats()
+        logger.info(f'Face analysis stream finished: {stats}')
+        yield json.dumps({'done': True, 'stats': stats}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/static/videos/<filename>', methods=['GET'])
 def serve_video(filename):
     """
     Serve workout video files from static folder
+    
+    Supports byte-range requests (206) for seeking, a strong content-hash
+    ETag, If-None-Match / If-Modified-Since revalidation and long-lived
+    cache headers.
     """
     try:
         static_dir = os.path.join(os.path.dirname(__file__), 'static')
-        logger.info(f'Serving video file: {filename}')
-        return send_from_directory(static_dir, filename)
+        etag = video_assets.get_etag(filename)
+        if etag is None:
+            raise FileNotFoundError(filename)
+        logger.info(f'Serving video file: {filename} (range: {request.headers.get("Range", "none")})')
+        response = send_from_directory(static_dir, filename, etag=etag, max_age=VIDEO_CACHE_MAX_AGE, conditional=True)
+        response.cache_control.public = True
+        # Advertise range support on full responses too so players can seek
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+    except RequestedRangeNotSatisfiable:
+        raise
     except Exception as e:
         logger.error(f'Error serving video file: {str(e)}')
         return jsonify({
@@ -581,15 +1119,60 @@ def serve_video(filename):
             'message': f'Video file not found: {filename}'
         }), 404
 
+@app.route('/static/videos/<filename>/poster', methods=['GET'])
+def serve_video_poster(filename):
+    """
+    Serve a JPEG poster frame for a workout video
+    """
+    try:
+        poster = video_assets.get_poster(filename)
+        if poster is None:
+            raise FileNotFoundError(filename)
+        response = send_from_directory(*poster, max_age=VIDEO_CACHE_MAX_AGE, conditional=True)
+        response.cache_control.public = True
+        return response
+    except Exception as e:
+        logger.error(f'Error serving video poster: {str(e)}')
+        return jsonify({
+            'success': False,
+            'message': f'Video poster not found: {filename}'
+        }), 404
+
+def send_hairstyle_image(face_shape, filename):
+    """
+    Send a hairstyle image, preferring a generated variant when one fits.
+
+    `?w=<pixels>` selects the smallest generated width covering the request,
+    and clients sending `Accept: image/webp` get WebP. The original file is
+    served when no variant applies or variants are still being built.
+    """
+    hairstyles_dir = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles')
+    source = f'{face_shape}/{filename}' if face_shape else filename
+    
+    width = request.args.get('w', type=int)
+    if width is not None and width <= 0:
+        width = None
+    accept_webp = any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+    
+    variant = hairstyle_assets.resolve(source, width, accept_webp)
+    if width is not None or accept_webp:
+        record_cache_lookup('hairstyle_variants', variant is not None)
+    if variant is not None:
+        logger.info(f'Serving hairstyle image variant: {source} (w={width}, webp={accept_webp})')
+        response = send_from_directory(*variant)
+    else:
+        logger.info(f'Serving hairstyle image: {source}')
+        response = send_from_directory(os.path.join(hairstyles_dir, face_shape) if face_shape else hairstyles_dir, filename)
+    response.vary.add('Accept')
+    return response
+
 @app.route('/static/hairstyles/<face_shape>/<filename>', methods=['GET'])
 def serve_hairstyle_image(face_shape, filename):
     """
     Serve hairstyle image files from static/hairstyles folder
     """
     try:
-        hairstyles_dir = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', face_shape)
-        logger.info(f'Serving hairstyle image: {face_shape}/{filename}')
-        return send_from_directory(hairstyles_dir, filename)
+        return send_hairstyle_image(face_shape, filename)
     except Exception as e:
         logger.error(f'Error serving hairstyle image: {str(e)}')
         return jsonify({
@@ -603,9 +1186,7 @@ def serve_hairstyle_image_direct(filename):
     Serve hairstyle image files directly from static/hairstyles folder
     """
     try:
-        hairstyles_dir = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles')
-        logger.info(f'Serving hairstyle image: {filename}')
-        return send_from_directory(hairstyles_dir, filename)
+        return send_hairstyle_image(None, filename)
     except Exception as e:
         logger.error(f'Error serving hairstyle image: {str(e)}')
         return jsonify({
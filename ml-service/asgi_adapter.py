@@ -0,0 +1,255 @@
+"""
+ASGI Front End
+Serves the Flask app from an asyncio server such as uvicorn, receiving
+request bodies on the event loop so slow uploads do not hold threads
+
+Under gunicorn's thread workers, a thread reads the request body as it
+trickles in, so a few slow mobile uploads can occupy every thread while
+cheap requests queue behind them. Here the whole body is received
+asynchronously first; only then is the Flask route run, on one of two
+bounded thread pools: one for face analysis and training routes, whose
+work is CPU-bound, and one for everything else, so quick calls such as
+/predict-addon never wait behind image analysis.
+
+The price is that upload admission (image_admission) only sees a body
+once it has been received: an image rejected by its header is still
+read in full, up to the upload limit, where a thread worker would stop
+reading at the header. Streaming the body into the route instead, as
+a2wsgi does, would bring back one held thread per slow upload.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from image_admission import MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Threads running the CPU-bound face analysis and training routes
+ASGI_ANALYSIS_THREADS = int(os.environ.get('ASGI_ANALYSIS_THREADS', str(min(4, os.cpu_count() or 1))))
+# Threads running every other route
+ASGI_REQUEST_THREADS = int(os.environ.get('ASGI_REQUEST_THREADS', '8'))
+
+# Routes run on the analysis pool
+ANALYSIS_PATH_PREFIXES = ('/analyze-face', '/train')
+# Routes that read their body while it arrives, e.g. live camera frames
+STREAMED_PATHS = ('/analyze-face/stream',)
+
+
+class _StreamingInput(io.RawIOBase):
+    """
+    wsgi.input reading the ASGI body as it arrives
+
+    Reads run on a pool thread and wait on the event loop for the next
+    body message, so a streamed route holds its thread while it reads.
+    `prefix` is body already received on the event loop.
+    """
+
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop, prefix: bytes = b''):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = prefix
+        self._more = True
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> None:
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._more = False
+            return
+        self._buffer += message.get('body', b'')
+        self._more = message.get('more_body', False)
+
+    def readinto(self, target) -> int:
+        while not self._buffer and self._more:
+            self._fill()
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class ASGIAdapter:
+    """
+    ASGI application running a WSGI app on bounded thread pools
+
+    Request bodies are buffered on the event loop up to the upload limit.
+    A longer body is handed over as soon as it passes the limit and the
+    rest is streamed to the route, so the route's own limit applies: the
+    image endpoints answer 413 and other routes read the whole body.
+    Responses are sent as the WSGI app produces them, so streamed
+    responses keep streaming.
+    """
+
+    def __init__(self, wsgi_app, analysis_threads: int = ASGI_ANALYSIS_THREADS,
+                 request_threads: int = ASGI_REQUEST_THREADS, max_body_bytes: int = MAX_UPLOAD_BYTES):
+        """
+        Initialize the adapter
+
+        Args:
+            wsgi_app: WSGI application to serve
+            analysis_threads: Threads for face analysis and training routes
+            request_threads: Threads for all other routes
+            max_body_bytes: Largest request body buffered before the route runs
+        """
+        self.wsgi_app = wsgi_app
+        self.max_body_bytes = max_body_bytes
+        self.analysis_executor = ThreadPoolExecutor(max_workers=analysis_threads, thread_name_prefix='asgi-analysis')
+        self.request_executor = ThreadPoolExecutor(max_workers=request_threads, thread_name_prefix='asgi-request')
+
+    def executor_for(self, path: str) -> ThreadPoolExecutor:
+        """Thread pool a route runs on"""
+        if path.startswith(ANALYSIS_PATH_PREFIXES):
+            return self.analysis_executor
+        return self.request_executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        loop = asyncio.get_running_loop()
+        if scope['path'] in STREAMED_PATHS:
+            body = _StreamingInput(receive, loop)
+            content_length = None
+        else:
+            received = await self._receive_body(receive)
+            if received is None:
+                return
+            data, complete = received
+            if complete:
+                body = io.BytesIO(data)
+                content_length = len(data)
+            else:
+                body = _StreamingInput(receive, loop, prefix=data)
+                content_length = None
+
+        environ = self._build_environ(scope, body, content_length)
+        await loop.run_in_executor(self.executor_for(scope['path']), self._run_wsgi, environ, send, loop)
+
+    async def _receive_body(self, receive) -> Optional[Tuple[bytes, bool]]:
+        """
+        Receive the request body up to the buffering limit
+
+        Returns:
+            Tuple of (body received, whether it is the whole body), or None
+            if the client went away
+        """
+        chunks = []
+        received = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            if chunk:
+                chunks.append(chunk)
+                received += len(chunk)
+            more = message.get('more_body', False)
+            if not more or received > self.max_body_bytes:
+                return b''.join(chunks), not more
+
+    @staticmethod
+    def _build_environ(scope, body, content_length: Optional[int]) -> dict:
+        """WSGI environ for an ASGI HTTP scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = name
+            else:
+                key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+        if content_length is not None:
+            # The buffered body replaces any chunked transfer encoding
+            environ['CONTENT_LENGTH'] = str(content_length)
+            environ.pop('HTTP_TRANSFER_ENCODING', None)
+        elif 'CONTENT_LENGTH' not in environ:
+            environ['wsgi.input_terminated'] = True
+        return environ
+
+    def _run_wsgi(self, environ: dict, send, loop: asyncio.AbstractEventLoop) -> None:
+        """Run the WSGI app on a pool thread, sending its response through the event loop"""
+        state = {'status': None, 'headers': None, 'started': False}
+
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and state['started']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = int(status.split(' ', 1)[0])
+            state['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            return write
+
+        def start():
+            if not state['started']:
+                state['started'] = True
+                send_message({'type': 'http.response.start', 'status': state['status'], 'headers': state['headers']})
+
+        def write(data):
+            start()
+            send_message({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        try:
+            iterable = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in iterable:
+                    if chunk:
+                        write(chunk)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        except Exception:
+            logger.error('Unhandled error serving %s', environ['PATH_INFO'], exc_info=True)
+            if state['started']:
+                raise
+            state['status'], state['headers'] = 500, [(b'content-type', b'text/plain; charset=utf-8')]
+            start()
+            send_message({'type': 'http.response.body', 'body': b'Internal Server Error'})
+            return
+
+        start()
+        send_message({'type': 'http.response.body', 'body': b''})
+
+    async def _lifespan(self, receive, send) -> None:
+        """Acknowledge startup; stop the thread pools at shutdown"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.analysis_executor.shutdown(wait=False, cancel_futures=True)
+                self.request_executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,194 @@
+"""
+Tail latency of /predict-addon while slow uploads are in progress
+
+Usage:
+    python benchmark_asgi_tail_latency.py [--slow-uploads 8] [--upload-rate 20000] [--duration 15]
+
+Starts the service twice, first as the Procfile runs it (gunicorn, one
+gthread worker with 4 threads), then as uvicorn serving
+your_application.asgi. For each server, client threads upload
+test_face.jpg to /analyze-face-shape at a trickle, like phones on a slow
+network, while /predict-addon is called in a loop. Its latency
+percentiles and status codes are reported per server and written as
+JSON. Train the add-on model first (python train_addon_model.py) so the
+probe runs a real prediction rather than returning the missing-model
+error.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_IMAGE = os.path.join(SERVICE_DIR, 'test_face.jpg')
+ADDON_PAYLOAD = json.dumps({
+    'time_gap_size': 60,
+    'discount_offered': 0.2,
+    'customer_loyalty': 10,
+    'past_add_on_history': 1,
+    'day_of_week': 2
+}).encode()
+PERCENTILES = (50, 95, 99)
+
+SERVERS = {
+    'gunicorn': ['-m', 'gunicorn', 'app:app', '--bind', '127.0.0.1:{port}', '--workers', '1',
+                 '--worker-class', 'gthread', '--threads', '4', '--timeout', '120'],
+    'uvicorn': ['-m', 'uvicorn', 'your_application.asgi:application', '--host', '127.0.0.1',
+                '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name: str, port: int) -> subprocess.Popen:
+    """Start a server and wait until /health answers"""
+    command = [sys.executable] + [arg.format(port=port) for arg in SERVERS[name]]
+    process = subprocess.Popen(command, cwd=SERVICE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{name} exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/health')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.kill()
+    raise SystemExit(f"{name} did not start")
+
+
+def slow_upload(port: int, body: bytes, boundary: str, rate: int, stop: threading.Event) -> None:
+    """Upload the image at `rate` bytes per second, repeatedly, until stopped"""
+    head = (
+        f'POST /analyze-face-shape HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+        f'Content-Type: multipart/form-data; boundary={boundary}\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+    ).encode()
+    chunk = max(1, rate // 10)
+    while not stop.is_set():
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+                sock.sendall(head)
+                for offset in range(0, len(body), chunk):
+                    if stop.is_set():
+                        return
+                    sock.sendall(body[offset:offset + chunk])
+                    time.sleep(0.1)
+                sock.recv(65536)
+        except OSError:
+            time.sleep(0.1)
+
+
+def probe(port: int, duration: float, interval: float):
+    """Call /predict-addon in a loop; returns latencies in ms and status codes"""
+    latencies, statuses = [], Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            connection.request('POST', '/predict-addon', ADDON_PAYLOAD, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            statuses[response.status] += 1
+        except OSError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        time.sleep(interval)
+    return latencies, statuses
+
+
+def run_server(name: str, slow_uploads: int, upload_rate: int, duration: float, interval: float) -> dict:
+    """Measure /predict-addon on one server with and without slow uploads"""
+    with open(UPLOAD_IMAGE, 'rb') as f:
+        image = f.read()
+    boundary = 'benchmark-boundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="face.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + image + f'\r\n--{boundary}--\r\n'.encode()
+
+    port = free_port()
+    process = start_server(name, port)
+    try:
+        idle, _ = probe(port, min(3.0, duration), interval)
+
+        stop = threading.Event()
+        uploaders = [
+            threading.Thread(target=slow_upload, args=(port, body, boundary, upload_rate, stop), daemon=True)
+            for _ in range(slow_uploads)
+        ]
+        for thread in uploaders:
+            thread.start()
+        # Let every upload connect before probing
+        time.sleep(1.0)
+        loaded, statuses = probe(port, duration, interval)
+        stop.set()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    def describe(samples):
+        stats = {f'p{p}': round(float(np.percentile(samples, p)), 2) for p in PERCENTILES}
+        stats['max'] = round(max(samples), 2)
+        stats['count'] = len(samples)
+        return stats
+
+    return {
+        'idle': describe(idle),
+        'slow_uploads': describe(loaded),
+        'statuses': {str(status): count for status, count in statuses.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='/predict-addon tail latency during slow uploads')
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--slow-uploads', type=int, default=8)
+    parser.add_argument('--upload-rate', type=int, default=20000, help='Bytes per second per upload')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds of probing under load')
+    parser.add_argument('--interval', type=float, default=0.05, help='Pause between probes')
+    parser.add_argument('--output', default='asgi_tail_latency_benchmark.json')
+    args = parser.parse_args()
+
+    print(f"/predict-addon latency with {args.slow_uploads} uploads at {args.upload_rate} B/s")
+    print("=" * 70)
+    results = {}
+    for name in args.servers.split(','):
+        results[name] = run_server(name, args.slow_uploads, args.upload_rate, args.duration, args.interval)
+        loaded = results[name]['slow_uploads']
+        print(f"✓ {name:9} idle p99 {results[name]['idle']['p99']:8.1f} ms | under load p50 {loaded['p50']:8.1f} ms, "
+              f"p99 {loaded['p99']:8.1f} ms, max {loaded['max']:8.1f} ms, statuses {results[name]['statuses']}")
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'slow_uploads': args.slow_uploads,
+            'upload_rate': args.upload_rate,
+            'upload_bytes': os.path.getsize(UPLOAD_IMAGE)
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
@@ -0,0 +1,311 @@
+"""
+Per-stage latency of the face shape and face symmetry pipelines
+
+Usage:
+    python benchmark_face_pipeline.py [--iterations 30] [--output face_pipeline_benchmark.json]
+    python benchmark_face_pipeline.py --baseline face_pipeline_baseline.json [--fail-on-regression]
+
+Each analyzer is run stage by stage on uploads from VGA to 12 MP:
+decode, grayscale conversion, face cascade, eye cascade, landmarks and
+scoring, model inference (face shape only, when a model is loaded) and
+building the JSON response. Fixture images are a portrait scaled into
+the frame; synthetic images are textured noise with no face, which is
+the slowest case for the face cascade. Results are written as JSON and
+can be compared against a previous run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from face_detection import get_face_detector
+from face_shape_analyzer import FaceShapeAnalyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+from image_decoding import decode_image
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'hairstyles', 'heart', 'curly_fringe.jpg')
+
+RESOLUTIONS = {
+    'vga': (640, 480),
+    'hd': (1280, 720),
+    'fhd': (1920, 1080),
+    '4k': (3840, 2160),
+    '12mp': (4000, 3000),
+}
+PERCENTILES = (50, 95, 99)
+
+
+def make_upload(kind: str, width: int, height: int, portrait: np.ndarray) -> bytes:
+    """Encode a fixture or synthetic image as an uploaded JPEG"""
+    if kind == 'fixture':
+        canvas = np.full((height, width, 3), 40, dtype=np.uint8)
+        scale = 0.9 * height / portrait.shape[0]
+        face = cv2.resize(portrait, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        fh, fw = face.shape[:2]
+        fw = min(fw, width)
+        x, y = (width - fw) // 2, (height - fh) // 2
+        canvas[y:y + fh, x:x + fw] = face[:, :fw]
+    else:
+        rng = np.random.default_rng(0)
+        canvas = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        canvas = cv2.resize(canvas, (width, height), interpolation=cv2.INTER_CUBIC)
+    ok, buffer = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    assert ok
+    return buffer.tobytes()
+
+
+class StageClock:
+    """Collects per-stage durations for one pipeline"""
+
+    def __init__(self):
+        self.samples = {}
+        self.totals = []
+
+    def run(self, stages):
+        """Run (name, fn) stages in order, feeding each result to the next; a None result stops early"""
+        start = time.perf_counter()
+        value = None
+        for name, fn in stages:
+            stage_start = time.perf_counter()
+            value = fn(value)
+            self.samples.setdefault(name, []).append((time.perf_counter() - stage_start) * 1000.0)
+            if value is None:
+                break
+        self.totals.append((time.perf_counter() - start) * 1000.0)
+
+    def summary(self) -> dict:
+        """Percentiles per stage and for the whole pipeline, plus throughput"""
+        def describe(samples):
+            stats = {f'p{p}': round(float(np.percentile(samples, p)), 3) for p in PERCENTILES}
+            stats['mean'] = round(float(np.mean(samples)), 3)
+            stats['count'] = len(samples)
+            return stats
+
+        total = describe(self.totals)
+        return {
+            'stages': {name: describe(samples) for name, samples in self.samples.items()},
+            'total': total,
+            'throughput_per_s': round(1000.0 / total['mean'], 2) if total['mean'] > 0 else None
+        }
+
+
+def shape_stages(upload: bytes, shape_analyzer: FaceShapeAnalyzer):
+    """Face shape pipeline split into stages, as analyze_request_image runs it"""
+    detector = get_face_detector()
+    state = {}
+
+    def decode(_):
+        state['image'], state['factor'] = decode_image(upload)
+        return state['image']
+
+    def grayscale(image):
+        state['gray'] = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return state['gray']
+
+    def face_cascade(gray):
+        state['face_box'], state['scale'] = detector.detect_face_box(gray, state['factor'])
+        return state['face_box']
+
+    def eye_cascade(face_box):
+        return {
+            'gray': state['gray'],
+            'face_box': face_box,
+            'eyes': detector.detect_eyes(state['gray'], face_box),
+            'scale': state['scale'],
+            'decode_factor': state['factor']
+        }
+
+    def landmarks(detection):
+        state['landmarks'] = shape_analyzer.extract_face_landmarks(state['image'], detection)
+        state['measurements'] = shape_analyzer.calculate_face_measurements(state['landmarks'])
+        return state['landmarks']
+
+    def model_inference(landmarks):
+        state['model_face_shape'] = shape_analyzer.predict_face_shape_with_model(state['image'], landmarks)
+        return landmarks
+
+    def response(landmarks):
+        if state['model_face_shape'] is not None:
+            face_shape, source = state['model_face_shape'], 'model'
+        else:
+            face_shape, source = shape_analyzer.classify_face_shape(state['measurements']), 'rule_based'
+        result = shape_analyzer.build_analysis_result(face_shape, source, state['measurements'], landmarks)
+        return shape_analyzer.payloads.serialize_result(result)
+
+    stages = [('decode', decode), ('grayscale', grayscale), ('face_cascade', face_cascade),
+              ('eye_cascade', eye_cascade), ('landmarks', landmarks)]
+    if shape_analyzer.face_shape_model is not None:
+        stages.append(('model_inference', model_inference))
+    else:
+        state['model_face_shape'] = None
+    stages.append(('response', response))
+    return stages
+
+
+def symmetry_stages(upload: bytes):
+    """Face symmetry pipeline split into stages"""
+    detector = get_face_detector()
+    symmetry_analyzer = get_symmetry_analyzer()
+    state = {}
+
+    def decode(_):
+        state['image'], state['factor'] = decode_image(upload)
+        return state['image']
+
+    def grayscale(image):
+        state['gray'] = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return state['gray']
+
+    def face_cascade(gray):
+        state['face_box'], state['scale'] = detector.detect_face_box(gray, state['factor'])
+        return state['face_box']
+
+    def eye_cascade(face_box):
+        return {
+            'gray': state['gray'],
+            'face_box': face_box,
+            'eyes': detector.detect_eyes(state['gray'], face_box),
+            'scale': state['scale'],
+            'decode_factor': state['factor']
+        }
+
+    def scoring(detection):
+        landmarks = symmetry_analyzer.detect_face_landmarks(state['image'], detection)
+        return symmetry_analyzer.calculate_asymmetry_score(landmarks)
+
+    def response(analysis):
+        recommendations = symmetry_analyzer.exercise_recommendations[analysis['primary_issue']]
+        return json.dumps({
+            'success': True,
+            'data': {
+                'primary_issue': analysis['primary_issue'],
+                'description': recommendations['description'],
+                'video_file': recommendations['video'],
+                'exercises': recommendations['exercises'],
+                'asymmetry_scores': analysis['asymmetry_scores'],
+                'confidence': analysis['confidence'],
+                'symmetry_method': analysis['method'],
+                'detection_scale': state['scale'],
+                'decode_factor': state['factor']
+            }
+        })
+
+    return [('decode', decode), ('grayscale', grayscale), ('face_cascade', face_cascade),
+            ('eye_cascade', eye_cascade), ('symmetry_scoring', scoring), ('response', response)]
+
+
+def run_benchmark(image_path: str, resolutions, kinds, iterations: int, warmup: int) -> dict:
+    """Time both pipelines on every image and return the JSON report"""
+    portrait = cv2.imread(image_path)
+    if portrait is None:
+        raise SystemExit(f"Could not read {image_path}")
+
+    shape_analyzer = FaceShapeAnalyzer()
+    model_ready = shape_analyzer.wait_for_model(timeout=120)
+
+    results = {}
+    for kind in kinds:
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            upload = make_upload(kind, width, height, portrait)
+            entry = {'width': width, 'height': height, 'upload_bytes': len(upload)}
+            for pipeline, build in (('face_shape', lambda: shape_stages(upload, shape_analyzer)),
+                                    ('face_symmetry', lambda: symmetry_stages(upload))):
+                clock = StageClock()
+                for i in range(warmup + iterations):
+                    if i == warmup:
+                        clock = StageClock()
+                    clock.run(build())
+                entry[pipeline] = clock.summary()
+            results[f'{kind}-{name}'] = entry
+            print(f"✓ {kind}-{name}: shape p50 {entry['face_shape']['total']['p50']:.1f} ms, "
+                  f"symmetry p50 {entry['face_symmetry']['total']['p50']:.1f} ms")
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'iterations': iterations,
+            'image': os.path.basename(image_path),
+            'model_backend': shape_analyzer.face_shape_model.name if model_ready else None,
+            'detection_max_dim': get_face_detector().detection_max_dim
+        },
+        'results': results
+    }
+
+
+def compare(report: dict, baseline: dict, metric: str, threshold: float, min_delta_ms: float) -> list:
+    """Print per-stage changes against a baseline; returns the regressions"""
+    regressions = []
+    print(f"\nChange in {metric} against baseline ({baseline['meta'].get('created_at', 'unknown')})")
+    print("=" * 70)
+    for image, entry in report['results'].items():
+        base_entry = baseline['results'].get(image)
+        if base_entry is None:
+            continue
+        for pipeline in ('face_shape', 'face_symmetry'):
+            current, previous = entry[pipeline], base_entry.get(pipeline)
+            if previous is None:
+                continue
+            rows = [(stage, stats, previous['stages'].get(stage)) for stage, stats in current['stages'].items()]
+            rows.append(('total', current['total'], previous['total']))
+            for stage, stats, base_stats in rows:
+                if base_stats is None or base_stats[metric] <= 0:
+                    continue
+                change = (stats[metric] - base_stats[metric]) / base_stats[metric]
+                flag = ''
+                # Sub-millisecond stages jitter by more than the threshold between runs
+                if change > threshold and stats[metric] - base_stats[metric] >= min_delta_ms:
+                    flag = '  REGRESSION'
+                    regressions.append((image, pipeline, stage, change))
+                print(f"{image:14} {pipeline:14} {stage:17} {base_stats[metric]:9.3f} -> "
+                      f"{stats[metric]:9.3f} ms ({change:+.1%}){flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-stage latency of the face analysis pipelines')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--image', default=DEFAULT_IMAGE)
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS))
+    parser.add_argument('--kinds', default='fixture,synthetic')
+    parser.add_argument('--output', default='face_pipeline_benchmark.json')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--metric', default='p50', choices=[f'p{p}' for p in PERCENTILES] + ['mean'])
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown reported as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='Smallest absolute slowdown reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    resolutions = [name for name in args.resolutions.split(',') if name]
+    unknown = set(resolutions) - set(RESOLUTIONS)
+    if unknown:
+        raise SystemExit(f"Unknown resolutions: {', '.join(sorted(unknown))}")
+
+    print(f"Face pipeline benchmark: {args.iterations} iterations per image")
+    print("=" * 70)
+    report = run_benchmark(args.image, resolutions, args.kinds.split(','), args.iterations, args.warmup)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.metric, args.threshold, args.min_delta_ms)
+        print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
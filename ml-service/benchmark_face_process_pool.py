@@ -0,0 +1,120 @@
+"""
+Face analysis throughput against the number of worker processes
+
+Usage:
+    python benchmark_face_process_pool.py [--workers 1,2,4] [--requests 40] [--analysis face]
+
+The same decoded frames are analyzed by concurrent client threads, first
+in-process on a thread pool, the way the service runs without
+FACE_PROCESS_WORKERS, then through FaceProcessPool with each worker count.
+Each mode gets twice as many client threads as workers, so the workers are
+never idle waiting for the next frame. Results are written as JSON.
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import cv2
+
+from benchmark_face_pipeline import DEFAULT_IMAGE, RESOLUTIONS, make_upload
+from face_process_pool import ANALYSES, FaceProcessPool
+from image_decoding import decode_image
+
+
+def measure(analyze, frames, requests: int, clients: int) -> dict:
+    """Analyze `requests` frames from `clients` threads; returns throughput and latency"""
+    latencies = []
+
+    def one(i):
+        image, decode_factor = frames[i % len(frames)]
+        start = time.perf_counter()
+        result = analyze(image, decode_factor)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        return result['success']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        succeeded = sum(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': requests,
+        'succeeded': succeeded,
+        'throughput_per_s': round(requests / elapsed, 2),
+        'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+    }
+
+
+def run_benchmark(image_path: str, resolution: str, analysis: str, worker_counts, requests: int) -> dict:
+    """Measure in-process threads and each process pool size"""
+    portrait = cv2.imread(image_path)
+    if portrait is None:
+        raise SystemExit(f"Could not read {image_path}")
+    width, height = RESOLUTIONS[resolution]
+    frames = [decode_image(make_upload('fixture', width, height, portrait))]
+    in_process = ANALYSES[analysis]
+
+    # Load the model and calibrate the analyzers before timing anything
+    in_process(*frames[0])
+
+    results = {}
+    for workers in worker_counts:
+        entry = {'threads': measure(in_process, frames, requests, 2 * workers)}
+
+        pool = FaceProcessPool(workers=workers)
+        pool.start()
+        try:
+            # Every process answers one frame before timing starts
+            measure(lambda image, factor: pool.analyze(analysis, image, factor), frames, workers, workers)
+            entry['processes'] = measure(
+                lambda image, factor: pool.analyze(analysis, image, factor), frames, requests, 2 * workers
+            )
+        finally:
+            pool.shutdown()
+
+        results[str(workers)] = entry
+        print(f"✓ {workers} worker(s): threads {entry['threads']['throughput_per_s']:.1f}/s, "
+              f"processes {entry['processes']['throughput_per_s']:.1f}/s "
+              f"(p95 {entry['processes']['p95_ms']:.0f} ms)")
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'analysis': analysis,
+            'resolution': resolution,
+            'image': os.path.basename(image_path)
+        },
+        'results': results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Face analysis throughput against worker process count')
+    parser.add_argument('--workers', default=','.join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)) or '1')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--analysis', default='face', choices=sorted(ANALYSES))
+    parser.add_argument('--resolution', default='fhd', choices=sorted(RESOLUTIONS))
+    parser.add_argument('--image', default=DEFAULT_IMAGE)
+    parser.add_argument('--output', default='face_process_pool_benchmark.json')
+    args = parser.parse_args()
+
+    worker_counts = [int(n) for n in args.workers.split(',') if n]
+    print(f"Face process pool benchmark: {args.analysis} on {args.resolution}, {os.cpu_count()} CPU(s)")
+    print("=" * 70)
+    report = run_benchmark(args.image, args.resolution, args.analysis, worker_counts, args.requests)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
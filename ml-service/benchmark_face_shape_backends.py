@@ -0,0 +1,108 @@
+"""
+Latency and memory comparison of the face shape inference backends
+
+Usage:
+    python benchmark_face_shape_backends.py [--iterations 50] [--batch-sizes 1,8]
+
+Each backend is measured in a fresh subprocess so its import cost and
+resident memory are not mixed with the other backend's.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is KB on Linux and bytes on macOS; this is a peak, not current, value
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def measure_backend(backend_name: str, iterations: int, batch_sizes) -> dict:
+    """Load one backend and time its predictions (runs inside the subprocess)"""
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+
+    from face_shape_backends import create_face_shape_backend
+    backend = create_face_shape_backend(backend_name)
+    if backend is None:
+        return {'backend': backend_name, 'available': False}
+    backend.load()
+    backend.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))
+
+    result = {
+        'backend': backend_name,
+        'available': True,
+        'load_seconds': round(time.perf_counter() - start, 3),
+        'rss_mb': round(current_rss_mb(), 1),
+        'rss_delta_mb': round(current_rss_mb() - rss_before, 1),
+        'latency_ms': {}
+    }
+
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, 224, 224, 3), dtype=np.float32)
+        backend.predict(batch)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            backend.predict(batch)
+            timings.append((time.perf_counter() - start) * 1000.0)
+        result['latency_ms'][str(batch_size)] = {
+            'p50': round(float(np.percentile(timings, 50)), 2),
+            'p95': round(float(np.percentile(timings, 95)), 2),
+            'per_image': round(float(np.median(timings)) / batch_size, 2)
+        }
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare face shape inference backends')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--batch-sizes', default='1,8')
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    if args.backend:
+        print(json.dumps(measure_backend(args.backend, args.iterations, batch_sizes)))
+        sys.exit(0)
+
+    print("Face shape backend comparison")
+    print("=" * 50)
+    for backend_name in ['keras', 'opencv_dnn']:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--backend', backend_name,
+             '--iterations', str(args.iterations), '--batch-sizes', args.batch_sizes],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if completed.returncode != 0:
+            print(f"✗ {backend_name}: {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}")
+            continue
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if not result['available']:
+            print(f"- {backend_name}: model artifact not found")
+            continue
+
+        print(f"✓ {backend_name}: load {result['load_seconds']}s, RSS {result['rss_mb']} MB "
+              f"(+{result['rss_delta_mb']} MB)")
+        for batch_size, latency in result['latency_ms'].items():
+            print(f"    batch {batch_size}: p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                  f"{latency['per_image']} ms/image")
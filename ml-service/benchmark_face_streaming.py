@@ -0,0 +1,86 @@
+"""
+Sustained frame rate of streaming face analysis
+
+Usage:
+    python benchmark_face_streaming.py [--frames 300] [--image static/hairstyles/heart/curly_fringe.jpg]
+
+A synthetic camera clip is made by sliding a portrait across a 640x480
+frame. The clip is analyzed once with full detection on every frame and
+once per keyframe interval, including JPEG decoding, as the streaming
+endpoint does.
+"""
+
+import argparse
+import math
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_streaming import FaceStreamSession, analyze_frame_stream
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'hairstyles', 'heart', 'curly_fringe.jpg')
+
+
+def make_clip(image_path: str, frame_count: int, width: int = 640, height: int = 480) -> list:
+    """Encode a clip of the portrait drifting around the frame"""
+    portrait = cv2.imread(image_path)
+    if portrait is None:
+        raise SystemExit(f"Could not read {image_path}")
+
+    scale = 0.9 * height / portrait.shape[0]
+    portrait = cv2.resize(portrait, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ph, pw = portrait.shape[:2]
+
+    frames = []
+    for i in range(frame_count):
+        canvas = np.full((height, width, 3), 40, dtype=np.uint8)
+        x = int((width - pw) / 2 + 60 * math.sin(i / 15.0))
+        y = int((height - ph) / 2 + 15 * math.cos(i / 20.0))
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(width, x + pw), min(height, y + ph)
+        canvas[y0:y1, x0:x1] = portrait[y0 - y:y1 - y, x0 - x:x1 - x]
+        frames.append(cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return frames
+
+
+def run(frames: list, keyframe_interval: int) -> dict:
+    """Analyze the clip and return throughput and per-frame latency"""
+    session = FaceStreamSession(keyframe_interval=keyframe_interval)
+    results = []
+    start = time.perf_counter()
+    for result in analyze_frame_stream(frames, session):
+        results.append(result)
+    elapsed = time.perf_counter() - start
+
+    latencies = [r['processing_ms'] for r in results if 'processing_ms' in r]
+    return {
+        'fps': len(frames) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'faces': sum(1 for r in results if r['success']),
+        'stats': session.stats()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure streaming face analysis frame rate')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--image', default=DEFAULT_IMAGE)
+    parser.add_argument('--keyframe-intervals', default='1,5,10,30')
+    args = parser.parse_args()
+
+    clip = make_clip(args.image, args.frames)
+    # Warm up cascades and the analyzers before timing
+    run(clip[:5], 1)
+
+    print(f"Streaming face analysis: {args.frames} frames at 640x480")
+    print("=" * 50)
+    for interval in [int(v) for v in args.keyframe_intervals.split(',')]:
+        result = run(clip, interval)
+        stats = result['stats']
+        label = 'detect every frame' if interval == 1 else f'keyframe every {interval}'
+        print(f"✓ {label}: {result['fps']:.1f} fps, p50 {result['p50_ms']:.2f} ms, "
+              f"p95 {result['p95_ms']:.2f} ms, faces {result['faces']}/{args.frames}, "
+              f"keyframes {stats['keyframes']}, tracking lost {stats['tracking_lost']}")
@@ -0,0 +1,72 @@
+"""
+Cost of mirror symmetry scoring
+
+Usage:
+    python benchmark_symmetry_engine.py [--image test_face.jpg] [--iterations 200] [--budget-ms 10]
+
+Times the landmark-distance scores against the mirror engine at each
+pyramid depth, then recommends the deepest FACE_SYMMETRY_PYRAMID_LEVELS
+whose p95 fits the per-request budget. Run it on the deployment hardware;
+the depth is a fixed setting so scores do not depend on the load a
+process happened to start under. Face detection runs once up front and is
+not included.
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from face_symmetry_analyzer import FaceSymmetryAnalyzer
+from symmetry_engine import MirrorSymmetryEngine
+
+
+def time_ms(fn, iterations: int):
+    """Median and p95 milliseconds per call"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(samples)), float(np.percentile(samples, 95))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark mirror symmetry scoring')
+    parser.add_argument('--image', default='test_face.jpg')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=10.0,
+                        help='Time budget for scoring one face')
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image)
+    if image is None:
+        raise SystemExit(f"Could not read {args.image}")
+
+    analyzer = FaceSymmetryAnalyzer()
+    landmarks = analyzer.detect_face_landmarks(image)
+    if landmarks is None:
+        raise SystemExit(f"No face detected in {args.image}")
+    gray, face_box = landmarks['gray'], landmarks['face_box']
+    eye_centers = [eye['center'] for eye in landmarks['eyes']]
+
+    print(f"Symmetry scoring on {args.image} (face {face_box[2]}x{face_box[3]}, "
+          f"{len(eye_centers)} eyes detected)")
+    print("=" * 60)
+
+    p50, p95 = time_ms(lambda: analyzer.calculate_landmark_asymmetry(landmarks), args.iterations)
+    print(f"✓ landmark distances:  p50 {p50:.3f} ms  p95 {p95:.3f} ms")
+
+    fitting = 1
+    for levels in (1, 2, 3, 4):
+        engine = MirrorSymmetryEngine(levels=levels)
+        p50, p95 = time_ms(lambda: engine.analyze(gray, face_box, eye_centers), args.iterations)
+        scores = engine.analyze(gray, face_box, eye_centers)['asymmetry_scores']
+        summary = ', '.join(f'{region} {score:.1f}' for region, score in scores.items())
+        print(f"✓ mirror, {levels} level(s): p50 {p50:.3f} ms  p95 {p95:.3f} ms  ({summary})")
+        if p95 <= args.budget_ms:
+            fitting = levels
+
+    print()
+    print(f"✓ deepest pyramid within {args.budget_ms:g} ms at p95: FACE_SYMMETRY_PYRAMID_LEVELS={fitting}")
@@ -0,0 +1,91 @@
+"""
+Convert the Keras face shape model to an ONNX graph for the OpenCV DNN backend
+
+Usage:
+    pip install tensorflow tf2onnx
+    python convert_face_shape_model.py [--input model/face_shape_model.h5] [--output model/face_shape_model.onnx]
+
+The exported graph keeps the Keras NHWC input layout (N, 224, 224, 3), so
+the service feeds both backends the same preprocessed crops. TensorFlow and
+tf2onnx are only needed to run this script, not to serve the exported model.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from face_shape_backends import KERAS_MODEL_PATH, ONNX_MODEL_PATH, KerasFaceShapeBackend, OpenCVDnnFaceShapeBackend
+
+
+def convert(input_path: str, output_path: str, opset: int = 13) -> None:
+    """
+    Export the .h5 model to ONNX
+
+    Args:
+        input_path: Path to the Keras .h5 model
+        output_path: Destination .onnx path
+        opset: ONNX opset version to target
+    """
+    tf = importlib.import_module('tensorflow')
+    tf2onnx = importlib.import_module('tf2onnx')
+
+    model = tf.keras.models.load_model(input_path)
+    input_signature = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name='input'),)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=opset, output_path=output_path)
+    print(f"✓ Exported ONNX graph to {output_path}")
+
+
+def verify(input_path: str, output_path: str, samples: int = 8) -> bool:
+    """
+    Check that OpenCV can run the exported graph and agrees with Keras
+
+    Args:
+        input_path: Path to the Keras .h5 model
+        output_path: Path to the exported .onnx graph
+        samples: Number of random crops to compare
+
+    Returns:
+        True when both backends pick the same class for every sample
+    """
+    keras_backend = KerasFaceShapeBackend(input_path)
+    dnn_backend = OpenCVDnnFaceShapeBackend(output_path)
+    keras_backend.load()
+    dnn_backend.load()
+
+    batch = np.random.default_rng(0).random((samples, 224, 224, 3), dtype=np.float32)
+    keras_output = keras_backend.predict(batch)
+    dnn_output = dnn_backend.predict(batch)
+
+    max_diff = float(np.max(np.abs(keras_output - dnn_output)))
+    labels_match = bool(np.array_equal(np.argmax(keras_output, axis=1), np.argmax(dnn_output, axis=1)))
+
+    print(f"   OpenCV {cv2.__version__} max output difference: {max_diff:.6f}")
+    print(f"{'✓' if labels_match else '✗'} Predicted classes {'match' if labels_match else 'differ'} on {samples} samples")
+    return labels_match
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the face shape model for the OpenCV DNN backend')
+    parser.add_argument('--input', default=KERAS_MODEL_PATH, help='Keras .h5 model path')
+    parser.add_argument('--output', default=ONNX_MODEL_PATH, help='Destination .onnx path')
+    parser.add_argument('--opset', type=int, default=13, help='ONNX opset version')
+    parser.add_argument('--skip-verify', action='store_true', help='Do not compare against Keras after export')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"✗ Keras model not found at {args.input}")
+        sys.exit(1)
+
+    try:
+        convert(args.input, args.output, args.opset)
+        if not args.skip_verify and not verify(args.input, args.output):
+            sys.exit(1)
+    except ImportError as e:
+        print(f"✗ Missing conversion dependency ({str(e)}). Install with: pip install tensorflow tf2onnx")
+        sys.exit(1)
@@ -30,4 +30,5 @@ class ExpensePredictionResponse(BaseModel):
     lower_95: float
     upper_95: float
     feature_importances: list
-    metrics: Dict[str, Any]
\ No newline at end of file
+    metrics: Dict[str, Any]
+    explanation: Optional[Dict[str, Any]] = None
\ No newline at end of file
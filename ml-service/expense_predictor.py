@@ -8,9 +8,9 @@ Features:
 - Feature engineering (lag features, temporal features, business context features)
 - Scikit-learn Pipeline with StandardScaler and SVR
 - TimeSeriesSplit-based GridSearchCV for hyperparameter tuning
-- Model evaluation (RMSE, MAE, R²)
-- Bootstrap-based 95% prediction intervals
-- Permutation importance-based explanations
+- Holdout evaluation (RMSE, MAE, R²) on time-series folds
+- 95% prediction intervals from out-of-fold residual quantiles computed at training time
+- Permutation importances computed at training time, and optional local explanations
 - Model persistence with joblib
 - Input validation with pydantic
 """
@@ -21,11 +21,13 @@ from sklearn.svm import SVR
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.base import clone
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from sklearn.inspection import permutation_importance
 import joblib
 from datetime import datetime
 import logging
+import os
 from typing import Dict, List, Tuple, Any, Optional, Union
 import warnings
 import math
@@ -39,6 +41,47 @@ logger = logging.getLogger(__name__)
 MODEL_FILE = 'expense_svr_model.pkl'
 SCALER_FILE = 'expense_scaler.pkl'
 FEATURE_NAMES_FILE = 'expense_feature_names.pkl'
+METADATA_FILE = 'expense_model_metadata.pkl'
+
+# Coverage of the prediction interval
+INTERVAL_COVERAGE = 0.95
+# Relative half-width used for models trained before interval data was saved
+FALLBACK_INTERVAL_FRACTION = 1.96 * 0.1
+# Shuffles per feature when computing permutation importances
+PERMUTATION_REPEATS = 10
+# Worker processes evaluating the held-out folds; never more than one per fold
+EXPENSE_FOLD_JOBS = int(os.environ.get('EXPENSE_FOLD_JOBS', str(min(4, os.cpu_count() or 1))))
+
+
+def _evaluate_fold(estimator, X: pd.DataFrame, y: pd.Series, train_index: np.ndarray,
+                   test_index: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit a copy of the estimator on one time-series fold and evaluate it on the held-out months.
+    
+    Module level so joblib can run folds in worker processes.
+    
+    Args:
+        estimator: Estimator with the chosen hyperparameters
+        X: Training features
+        y: Training target
+        train_index: Rows the fold model is fitted on
+        test_index: Held-out rows, all later than the training rows
+        
+    Returns:
+        Tuple of (held-out target, held-out predictions, permutation importances
+        as increase in MAE with shape (n_features, PERMUTATION_REPEATS))
+    """
+    fold_model = clone(estimator).fit(X.iloc[train_index], y.iloc[train_index])
+    X_test, y_test = X.iloc[test_index], y.iloc[test_index]
+    importances = permutation_importance(
+        fold_model, X_test, y_test,
+        scoring='neg_mean_absolute_error',
+        n_repeats=PERMUTATION_REPEATS,
+        random_state=0,
+        n_jobs=1
+    )
+    return y_test.to_numpy(), fold_model.predict(X_test), importances.importances
+
 
 class ExpensePredictor:
     """Expense prediction using Support Vector Regression with RBF kernel."""
@@ -48,8 +91,32 @@ class ExpensePredictor:
         self.model = None
         self.scaler = None
         self.feature_names = None
+        self.metadata = {}
         self.is_trained = False
         
+    @classmethod
+    def from_artifacts(cls, model, scaler, feature_names, metadata: Optional[Dict] = None) -> 'ExpensePredictor':
+        """
+        Create a trained predictor from already loaded artifacts.
+        
+        Args:
+            model: Fitted scaler and SVR pipeline
+            scaler: Fitted scaler
+            feature_names: Feature column names
+            metadata: Training metadata, e.g. prediction interval offsets;
+                None for models saved before it was recorded
+            
+        Returns:
+            Trained ExpensePredictor
+        """
+        predictor = cls()
+        predictor.model = model
+        predictor.scaler = scaler
+        predictor.feature_names = feature_names
+        predictor.metadata = metadata or {}
+        predictor.is_trained = True
+        return predictor
+        
     def _create_lag_features(self, df: pd.DataFrame, lag_periods: List[int] = [1, 2, 3]) -> pd.DataFrame:
         """
         Create lag features from the expense data.
@@ -198,7 +265,8 @@ class ExpensePredictor:
         }
         
         # Use TimeSeriesSplit for cross-validation
-        tscv = TimeSeriesSplit(n_splits=3)
+        n_splits = 3
+        tscv = TimeSeriesSplit(n_splits=n_splits)
         
         # Perform grid search with cross-validation
         logger.info("Performing hyperparameter tuning...")
@@ -218,22 +286,37 @@ class ExpensePredictor:
         self.scaler = self.model.named_steps['scaler']
         self.is_trained = True
         
-        # Calculate training metrics
-        y_pred = self.model.predict(X)
-        metrics = {
-            'rmse': np.sqrt(mean_squared_error(y, y_pred)),
-            'mae': mean_absolute_error(y, y_pred),
-            'r2': r2_score(y, y_pred),
-            'best_params': grid_search.best_params_
+        # Metrics, interval offsets and importances all come from months the
+        # fold models were not fitted on; the folds are evaluated in parallel
+        logger.info("Evaluating the tuned model on held-out folds...")
+        folds = joblib.Parallel(n_jobs=max(1, min(n_splits, EXPENSE_FOLD_JOBS)))(
+            joblib.delayed(_evaluate_fold)(grid_search.best_estimator_, X, y, train_index, test_index)
+            for train_index, test_index in tscv.split(X)
+        )
+        y_true = np.concatenate([fold[0] for fold in folds])
+        y_pred = np.concatenate([fold[1] for fold in folds])
+        self.metadata = {
+            'metrics': {
+                'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+                'mae': float(mean_absolute_error(y_true, y_pred)),
+                'r2': float(r2_score(y_true, y_pred)),
+                'n_holdout': int(len(y_true))
+            },
+            'prediction_interval': self._residual_interval(y_true - y_pred),
+            'feature_importances': self._rank_importances(np.hstack([fold[2] for fold in folds])),
+            'feature_baseline': [float(value) for value in X.mean()],
+            'trained_at': datetime.now().isoformat()
         }
+        metrics = dict(self.metadata['metrics'], best_params=grid_search.best_params_)
         
         # Save model and scaler
         joblib.dump(self.model, MODEL_FILE)
         joblib.dump(self.scaler, SCALER_FILE)
         joblib.dump(self.feature_names, FEATURE_NAMES_FILE)
+        joblib.dump(self.metadata, METADATA_FILE)
         
         logger.info(f"Model training completed. Best parameters: {grid_search.best_params_}")
-        logger.info(f"Training metrics: RMSE={metrics['rmse']:.2f}, MAE={metrics['mae']:.2f}, R²={metrics['r2']:.2f}")
+        logger.info(f"Holdout metrics: RMSE={metrics['rmse']:.2f}, MAE={metrics['mae']:.2f}, R²={metrics['r2']:.2f}")
         
         return metrics
     
@@ -252,6 +335,11 @@ class ExpensePredictor:
             logger.info("Scaler loaded successfully")
             self.feature_names = joblib.load(FEATURE_NAMES_FILE)
             logger.info(f"Feature names loaded successfully: {self.feature_names}")
+            try:
+                self.metadata = joblib.load(METADATA_FILE)
+            except FileNotFoundError:
+                logger.warning(f"{METADATA_FILE} not found; retrain for residual-based prediction intervals")
+                self.metadata = {}
             self.is_trained = True
             logger.info("Model loaded successfully")
             return True
@@ -262,13 +350,18 @@ class ExpensePredictor:
             logger.error(f"Error loading model: {str(e)}")
             return False
     
-    def predict_next_month(self, last_month_data: Dict, next_month_planning: Optional[Dict] = None) -> Dict[str, Any]:
+    def predict_next_month(self, last_month_data: Dict, next_month_planning: Optional[Dict] = None,
+                           explain: bool = False) -> Dict[str, Any]:
         """
         Predict next month's expenses.
         
+        Feature importances and metrics are the ones saved at training time;
+        only the explanation, if requested, costs extra model evaluations.
+        
         Args:
             last_month_data: Dictionary with last month's actual expense data
             next_month_planning: Optional dictionary with known next-month planning fields
+            explain: Whether to add a local explanation of this prediction
             
         Returns:
             Dictionary with prediction results
@@ -286,28 +379,24 @@ class ExpensePredictor:
         if self.model is None:
             logger.error("Model is not trained or loaded")
             raise ValueError("Model is not trained or loaded")
-        prediction = self.model.predict([feature_vector])[0]
+        prediction = float(self.model.predict([feature_vector])[0])
         logger.info(f"Prediction made: {prediction}")
         
-        # Calculate prediction interval using bootstrap
-        lower_bound, upper_bound = self._calculate_prediction_interval(feature_vector)
+        # Offset the prediction by the residual quantiles saved at training time
+        lower_bound, upper_bound = self._calculate_prediction_interval(prediction)
         logger.info(f"Prediction interval calculated: {lower_bound} - {upper_bound}")
         
-        # Calculate feature importance
-        feature_importance = self._calculate_feature_importance(feature_vector)
-        logger.info(f"Feature importance calculated: {feature_importance}")
-        
-        # Get model metrics (if available from training)
-        metrics = self._get_model_metrics()
-        logger.info(f"Model metrics: {metrics}")
-        
+        # Importances and holdout metrics were computed once at training time;
+        # models saved before they were recorded report none
         result = {
             'prediction': max(0, float(prediction)),  # Ensure non-negative and convert to float
             'lower_95': max(0, float(lower_bound)),
             'upper_95': float(upper_bound),
-            'feature_importances': feature_importance,
-            'metrics': metrics
+            'feature_importances': self.metadata.get('feature_importances', []),
+            'metrics': self.metadata.get('metrics', {})
         }
+        if explain:
+            result['explanation'] = self._explain_prediction(feature_vector, prediction)
         logger.info(f"Final result: {result}")
         return result
     
@@ -354,33 +443,81 @@ class ExpensePredictor:
             
         return validated_features
     
-    def _calculate_prediction_interval(self, feature_vector: List[float], n_bootstrap: int = 1000) -> Tuple[float, float]:
+    def _residual_interval(self, residuals: np.ndarray) -> Dict[str, Any]:
         """
-        Calculate 95% prediction interval using bootstrap.
+        Compute prediction interval offsets from out-of-fold residuals.
         
         Args:
-            feature_vector: Feature vector for prediction
-            n_bootstrap: Number of bootstrap samples
+            residuals: Held-out target minus prediction, over all folds
             
         Returns:
-            Tuple of (lower_bound, upper_bound)
+            Dictionary with the lower and upper residual quantiles to add to
+            a prediction, the coverage and the number of residuals used
+        """
+        tail = (1.0 - INTERVAL_COVERAGE) / 2.0
+        lower_offset, upper_offset = np.quantile(residuals, [tail, 1.0 - tail])
+        return {
+            'lower_offset': float(min(lower_offset, 0.0)),
+            'upper_offset': float(max(upper_offset, 0.0)),
+            'coverage': INTERVAL_COVERAGE,
+            'n_residuals': int(len(residuals)),
+            'method': 'time_series_cv_residual_quantiles'
+        }
+    
+    def _rank_importances(self, importances: np.ndarray) -> List[Dict[str, float]]:
         """
-        # For simplicity, we'll use a basic approach to estimate prediction interval
-        # In a production environment, you would implement a more sophisticated bootstrap method
+        Rank features by permutation importance.
         
-        # Make baseline prediction
-        if self.model is None:
-            raise ValueError("Model is not trained or loaded")
-        baseline_prediction = float(self.model.predict([feature_vector])[0])
+        Args:
+            importances: Increase in holdout MAE per feature, one column per
+                shuffle across all folds
+            
+        Returns:
+            Features sorted by importance, where importance is the feature's
+            share of the total MAE increase (0 to 1) and mae_increase/std are
+            in the target's units
+        """
+        means = importances.mean(axis=1)
+        stds = importances.std(axis=1)
+        # Shuffling an unused feature can lower the error by chance
+        positive = np.clip(means, 0.0, None)
+        total = positive.sum()
+        ranked = [
+            {
+                'feature': str(feature_name),
+                'importance': float(share / total) if total > 0 else 0.0,
+                'mae_increase': float(mean),
+                'std': float(std)
+            }
+            for feature_name, share, mean, std in zip(self.feature_names, positive, means, stds)
+        ]
+        ranked.sort(key=lambda x: x['importance'], reverse=True)
+        return ranked
+    
+    def _calculate_prediction_interval(self, prediction: float) -> Tuple[float, float]:
+        """
+        Calculate the 95% prediction interval around a prediction.
         
-        # Estimate standard deviation (simplified)
-        # In practice, you would use the training residuals
-        std_dev = abs(baseline_prediction * 0.1)  # Assume 10% standard deviation, ensure positive
+        The residual quantiles saved at training time are added to the
+        prediction; no further model evaluations are needed. Models saved
+        before interval data was recorded fall back to a ±19.6% band.
         
-        # Calculate 95% confidence interval (rough approximation)
-        margin = 1.96 * std_dev
-        lower_bound = float(max(0, baseline_prediction - margin))  # Ensure non-negative
-        upper_bound = float(baseline_prediction + margin)
+        Args:
+            prediction: Model prediction
+            
+        Returns:
+            Tuple of (lower_bound, upper_bound)
+        """
+        interval = self.metadata.get('prediction_interval')
+        if interval is not None:
+            lower_bound = prediction + interval['lower_offset']
+            upper_bound = prediction + interval['upper_offset']
+        else:
+            margin = abs(prediction) * FALLBACK_INTERVAL_FRACTION
+            lower_bound = prediction - margin
+            upper_bound = prediction + margin
+        lower_bound = float(max(0, lower_bound))  # Ensure non-negative
+        upper_bound = float(upper_bound)
         
         # Ensure valid numeric values
         if not isinstance(lower_bound, (int, float)) or math.isnan(lower_bound) or math.isinf(lower_bound):
@@ -391,61 +528,45 @@ class ExpensePredictor:
             
         return float(lower_bound), float(upper_bound)
     
-    def _calculate_feature_importance(self, feature_vector: List[float]) -> List[Dict[str, float]]:
+    def _explain_prediction(self, feature_vector: List[float], prediction: float) -> Optional[Dict[str, Any]]:
         """
-        Calculate feature importance with priority to expense_lag_1.
+        Explain one prediction by replacing each feature with its training mean.
+        
+        A feature's contribution is how much the prediction drops when that
+        feature alone is set to its average value. All variants are scored
+        in a single model call.
         
         Args:
             feature_vector: Feature vector for prediction
+            prediction: Model prediction for the feature vector
             
         Returns:
-            List of dictionaries with feature names and importance values
-        """
-        # Return empty list if no feature names
-        if not self.feature_names:
-            return []
-        
-        # Create a simple importance ranking prioritizing expense_lag_1
-        importance_scores = []
-        
-        # Prioritize expense_lag_1 as requested
-        for i, feature_name in enumerate(self.feature_names):
-            importance = 0.0
-            if feature_name == 'expense_lag_1':
-                importance = 1.0  # Highest importance
-            elif feature_name == 'expense_lag_2':
-                importance = 0.7
-            elif feature_name == 'expense_lag_3':
-                importance = 0.5
-            elif feature_name in ['month_of_year', 'quarter']:
-                importance = 0.3
-            else:
-                importance = 0.2
-                
-            # Ensure importance is a valid float
-            importance = float(max(0, importance))
-                
-            importance_scores.append({
-                'feature': str(feature_name),  # Ensure string conversion
-                'importance': float(importance)  # Ensure float conversion
-            })
-        
-        # Sort by importance (descending)
-        importance_scores.sort(key=lambda x: x['importance'], reverse=True)
-        
-        return importance_scores
-    
-    def _get_model_metrics(self) -> Dict[str, Any]:
+            Dictionary with the prediction for an average month and the
+            contributions sorted by magnitude, or None for models saved
+            before the training means were recorded
         """
-        Get model performance metrics.
-        
-        Returns:
-            Dictionary with model metrics
-        """
-        # In a real implementation, you would store and retrieve actual metrics
-        # For now, we'll return realistic placeholder values to avoid NaN issues
+        baseline = self.metadata.get('feature_baseline')
+        if baseline is None:
+            logger.warning("Explanations need a retrained model; no feature baseline saved")
+            return None
+        
+        # Row 0 is the average month; row i + 1 replaces feature i only
+        rows = np.tile(np.asarray(feature_vector, dtype=float), (len(baseline) + 1, 1))
+        rows[0] = baseline
+        rows[np.arange(1, len(baseline) + 1), np.arange(len(baseline))] = baseline
+        predictions = self.model.predict(pd.DataFrame(rows, columns=self.feature_names))
+        
+        contributions = [
+            {
+                'feature': str(feature_name),
+                'value': float(value),
+                'contribution': float(prediction - replaced)
+            }
+            for feature_name, value, replaced in zip(self.feature_names, feature_vector, predictions[1:])
+        ]
+        contributions.sort(key=lambda x: abs(x['contribution']), reverse=True)
         return {
-            'rmse': float(100.0),  # Ensure float conversion
-            'mae': float(80.0),    # Ensure float conversion
-            'r2': float(0.85)      # Ensure float conversion
-        }
\ No newline at end of file
+            'baseline_prediction': float(predictions[0]),
+            'contributions': contributions,
+            'method': 'mean_substitution'
+        }
@@ -0,0 +1,222 @@
+"""
+Combined Face Analysis
+Runs face shape and face symmetry analysis on a single shared detection
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import logging
+import os
+import threading
+from face_detection import get_face_detector
+from face_shape_analyzer import get_face_analyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+from image_decoding import decode_image
+from request_timing import stage
+from service_metrics import observe_image
+
+logger = logging.getLogger(__name__)
+
+NO_FACE_MESSAGE = 'No face detected in the image. Please ensure your face is clearly visible and well-lit.'
+
+# Batch analysis limits
+BATCH_MAX_IMAGES = int(os.environ.get('FACE_BATCH_MAX_IMAGES', '10'))
+BATCH_MAX_WORKERS = int(os.environ.get('FACE_BATCH_MAX_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Largest number of faces analyzed in one group photo
+MULTI_FACE_MAX_FACES = int(os.environ.get('FACE_MULTI_MAX_FACES', '10'))
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool used for batch decode and detection"""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=BATCH_MAX_WORKERS,
+                thread_name_prefix='face-batch'
+            )
+    return _batch_executor
+
+
+def _decode_and_detect(image_bytes: bytes) -> Tuple[Optional[np.ndarray], Optional[Dict]]:
+    """
+    Decode one uploaded image and detect its face on a pool thread
+
+    Both cv2.imdecode and detectMultiScale release the GIL.
+    """
+    with stage('decode'):
+        image, decode_factor = decode_image(image_bytes)
+    observe_image('batch', len(image_bytes), image)
+    if image is None:
+        return None, None
+    return image, get_face_detector().detect(image, decode_factor)
+
+
+def analyze_face_combined(image: np.ndarray, decode_factor: int = 1) -> Dict:
+    """
+    Analyze face shape and facial symmetry in one pass
+
+    The image is converted to grayscale and run through the face and eye
+    cascades once; the resulting detection is shared by both analyzers.
+
+    Args:
+        image: BGR image from OpenCV
+        decode_factor: Reduction the image was decoded at
+
+    Returns:
+        Dictionary with `face_shape` and `symmetry` results
+    """
+    try:
+        detection = get_face_detector().detect(image, decode_factor)
+
+        if detection is None:
+            return {
+                'success': False,
+                'message': NO_FACE_MESSAGE
+            }
+
+        shape_result = get_face_analyzer().analyze_face(image, detection=detection)
+        if not shape_result['success']:
+            return shape_result
+
+        symmetry_result = get_symmetry_analyzer().analyze_face_symmetry(image, detection=detection)
+        if not symmetry_result['success']:
+            return symmetry_result
+
+        return {
+            'success': True,
+            'data': {
+                'face_shape': shape_result['data'],
+                'symmetry': symmetry_result['data']
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"Error in combined face analysis: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'message': f'Error analyzing face: {str(e)}'
+        }
+
+
+def analyze_all_faces(image: np.ndarray, decode_factor: int = 1,
+                      max_faces: int = MULTI_FACE_MAX_FACES) -> Dict:
+    """
+    Analyze face shape and facial symmetry for every face in a group photo
+
+    The image is converted to grayscale and run through the face cascade
+    once. Measurements for all faces are computed as one array operation
+    and all face crops go to the model in one batch.
+
+    Args:
+        image: BGR image from OpenCV
+        decode_factor: Reduction the image was decoded at
+        max_faces: Analyze at most this many of the largest faces
+
+    Returns:
+        Dictionary with `faces`, ordered left to right, each with its
+        `face_index`, `face_box` in original-image pixels, `face_shape` and
+        `symmetry` results, and the `face_count`
+    """
+    try:
+        detections = get_face_detector().detect_all(image, decode_factor, max_faces)
+
+        if not detections:
+            return {
+                'success': False,
+                'message': NO_FACE_MESSAGE
+            }
+
+        shape_results = get_face_analyzer().analyze_faces([image] * len(detections), detections)
+        symmetry_analyzer = get_symmetry_analyzer()
+
+        faces = []
+        for index, (detection, shape_result) in enumerate(zip(detections, shape_results)):
+            face = {
+                'face_index': index,
+                'face_box': [v * decode_factor for v in detection['face_box']]
+            }
+            symmetry_result = symmetry_analyzer.analyze_face_symmetry(image, detection=detection)
+            if not shape_result['success'] or not symmetry_result['success']:
+                face['success'] = False
+                face['message'] = (shape_result if not shape_result['success'] else symmetry_result)['message']
+            else:
+                face['success'] = True
+                face['face_shape'] = shape_result['data']
+                face['symmetry'] = symmetry_result['data']
+            faces.append(face)
+
+        return {
+            'success': True,
+            'data': {
+                'faces': faces,
+                'face_count': len(faces)
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"Error in multi-face analysis: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'message': f'Error analyzing faces: {str(e)}'
+        }
+
+
+def analyze_face_shape_batch(images_bytes: List[bytes]) -> List[Dict]:
+    """
+    Analyze face shape for several uploaded images
+
+    Images are decoded and detected in parallel on a bounded thread pool;
+    measurements and rule-based classification run once for the batch.
+    A failing image produces an error entry without failing the batch.
+
+    Args:
+        images_bytes: Raw uploaded file contents
+
+    Returns:
+        List of analysis results in input order
+    """
+    executor = _get_batch_executor()
+    # Run in copies of the request context so stage timings are recorded
+    futures = [
+        executor.submit(contextvars.copy_context().run, _decode_and_detect, data)
+        for data in images_bytes
+    ]
+
+    results = [None] * len(images_bytes)
+    images = []
+    detections = []
+    indices = []
+
+    for i, future in enumerate(futures):
+        try:
+            image, detection = future.result()
+        except Exception as e:
+            logger.error(f"Error decoding batch image {i}: {str(e)}", exc_info=True)
+            results[i] = {
+                'success': False,
+                'message': f'Error analyzing face: {str(e)}'
+            }
+            continue
+
+        if image is None:
+            results[i] = {
+                'success': False,
+                'message': 'Invalid image file'
+            }
+            continue
+
+        images.append(image)
+        detections.append(detection)
+        indices.append(i)
+
+    analyzed = get_face_analyzer().analyze_faces(images, detections)
+    for i, result in zip(indices, analyzed):
+        results[i] = result
+
+    return results
@@ -0,0 +1,275 @@
+"""
+Shared Face Detector using OpenCV
+Runs the Haar cascades once per image so the face shape and face symmetry
+analyzers can reuse the same face box and eye detections
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+from request_timing import stage
+
+logger = logging.getLogger(__name__)
+
+# Longest image side used for face detection; 0 disables downscaling
+DEFAULT_DETECTION_MAX_DIM = int(os.environ.get('FACE_DETECTION_MAX_DIM', '640'))
+
+# Minimum face size in original-upload pixels, and the cascade's native window size
+MIN_FACE_SIZE = 100
+CASCADE_WINDOW_SIZE = 24
+
+
+class FaceDetector:
+    """
+    Detects the primary face and its eyes using OpenCV Haar cascades
+
+    cv2.CascadeClassifier is not safe to use from several threads at once,
+    so every thread gets its own pair of classifiers. Checkout is a
+    thread-local lookup and takes no lock, so one detector can be shared
+    by all request threads.
+    """
+
+    def __init__(self, detection_max_dim: int = DEFAULT_DETECTION_MAX_DIM):
+        """
+        Load Haar Cascade classifiers
+
+        Args:
+            detection_max_dim: Longest side of the working image used for face
+                detection. Larger images are downscaled before detection.
+                0 runs detection at full resolution.
+        """
+        cascade_path = cv2.data.haarcascades
+        self.face_cascade_path = os.path.join(cascade_path, 'haarcascade_frontalface_default.xml')
+        self.eye_cascade_path = os.path.join(cascade_path, 'haarcascade_eye.xml')
+        self._local = threading.local()
+
+        self.detection_max_dim = detection_max_dim
+
+        # Load the calling thread's classifiers now so a bad install fails early
+        self._get_cascades()
+
+        logger.info("Face Detector initialized with OpenCV (detection max dim: %s)", detection_max_dim or 'full')
+
+    def _get_cascades(self) -> Tuple[cv2.CascadeClassifier, cv2.CascadeClassifier]:
+        """Get the face and eye classifiers owned by the current thread"""
+        cascades = getattr(self._local, 'cascades', None)
+        if cascades is None:
+            face_cascade = cv2.CascadeClassifier(self.face_cascade_path)
+            eye_cascade = cv2.CascadeClassifier(self.eye_cascade_path)
+            if face_cascade.empty() or eye_cascade.empty():
+                raise RuntimeError(f'Unable to load Haar cascades from {os.path.dirname(self.face_cascade_path)}')
+            cascades = (face_cascade, eye_cascade)
+            self._local.cascades = cascades
+        return cascades
+
+    @property
+    def face_cascade(self) -> cv2.CascadeClassifier:
+        """Frontal face classifier for the current thread"""
+        return self._get_cascades()[0]
+
+    @property
+    def eye_cascade(self) -> cv2.CascadeClassifier:
+        """Eye classifier for the current thread"""
+        return self._get_cascades()[1]
+
+    def get_detection_scale(self, image_shape: Tuple[int, ...]) -> float:
+        """
+        Get the working scale used for face detection on an image
+
+        Args:
+            image_shape: Shape of the full-resolution image
+
+        Returns:
+            Scale factor in (0, 1]; 1.0 means full resolution
+        """
+        longest_side = max(image_shape[:2])
+        if not self.detection_max_dim or longest_side <= self.detection_max_dim:
+            return 1.0
+        return self.detection_max_dim / float(longest_side)
+
+    def detect_face_boxes(self, gray: np.ndarray, max_faces: Optional[int] = None,
+                          decode_factor: int = 1) -> Tuple[List[Tuple[int, int, int, int]], float]:
+        """
+        Run the face cascade at the working resolution
+
+        Args:
+            gray: Full-resolution grayscale image
+            max_faces: Keep at most this many of the largest faces; None keeps all
+            decode_factor: Reduction the image was decoded at, so MIN_FACE_SIZE
+                still refers to the original upload
+
+        Returns:
+            Tuple of (face boxes (x, y, w, h) in full-resolution image space,
+            largest first, working scale the cascade ran at)
+        """
+        img_h, img_w = gray.shape[:2]
+
+        # Downscale to the working resolution and scale minSize to match
+        scale = self.get_detection_scale(gray.shape)
+        if scale < 1.0:
+            working_gray = cv2.resize(
+                gray,
+                (max(1, int(round(img_w * scale))), max(1, int(round(img_h * scale)))),
+                interpolation=cv2.INTER_AREA
+            )
+        else:
+            working_gray = gray
+        min_size = max(CASCADE_WINDOW_SIZE, int(round(MIN_FACE_SIZE * scale / decode_factor)))
+
+        # Detect faces
+        faces = self.face_cascade.detectMultiScale(
+            working_gray,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(min_size, min_size)
+        )
+
+        if len(faces) == 0:
+            return [], scale
+
+        # Largest faces (closest to camera) first, mapped back to full resolution
+        faces = np.asarray(faces, dtype=np.float64)
+        faces = faces[np.argsort(-(faces[:, 2] * faces[:, 3]), kind='stable')]
+        boxes = np.rint(faces / scale).astype(int)
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, img_w - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, img_h - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], img_w - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], img_h - boxes[:, 1])
+
+        # Drop detections centred inside a larger face, e.g. a cheek detected as a face
+        centers = boxes[:, :2] + boxes[:, 2:] / 2.0
+        kept = []
+        for i in range(len(boxes)):
+            inside = any(
+                boxes[j, 0] <= centers[i, 0] <= boxes[j, 0] + boxes[j, 2]
+                and boxes[j, 1] <= centers[i, 1] <= boxes[j, 1] + boxes[j, 3]
+                for j in kept
+            )
+            if not inside:
+                kept.append(i)
+                if max_faces is not None and len(kept) >= max_faces:
+                    break
+        return [tuple(int(v) for v in boxes[i]) for i in kept], scale
+
+    def detect_face_box(self, gray: np.ndarray,
+                        decode_factor: int = 1) -> Tuple[Optional[Tuple[int, int, int, int]], float]:
+        """
+        Run the face cascade and keep the largest face
+
+        Args:
+            gray: Full-resolution grayscale image
+            decode_factor: Reduction the image was decoded at
+
+        Returns:
+            Tuple of (largest face box (x, y, w, h) in full-resolution image
+            space or None, working scale the cascade ran at)
+        """
+        boxes, scale = self.detect_face_boxes(gray, max_faces=1, decode_factor=decode_factor)
+        return (boxes[0] if boxes else None), scale
+
+    def detect_eyes(self, gray: np.ndarray, face_box: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int]]:
+        """
+        Run the eye cascade inside a face box at full resolution
+
+        Args:
+            gray: Full-resolution grayscale image
+            face_box: Face box (x, y, w, h)
+
+        Returns:
+            Eye boxes relative to the face box
+        """
+        x, y, w, h = face_box
+        eyes = self.eye_cascade.detectMultiScale(gray[y:y+h, x:x+w])
+        return [tuple(int(v) for v in eye) for eye in eyes]
+
+    def detect(self, image: np.ndarray, decode_factor: int = 1) -> Optional[Dict]:
+        """
+        Detect the largest face and the eyes inside it
+
+        Args:
+            image: BGR image from OpenCV
+            decode_factor: Reduction the image was decoded at (see image_decoding);
+                scales the minimum face size and is recorded so results can be
+                reported in original-image space
+
+        Returns:
+            Dictionary with the grayscale image, face box (x, y, w, h) and eye
+            boxes relative to the face box, or None if no face was detected.
+            Coordinates are in full-resolution image space; `scale` is the
+            working scale the face cascade ran at.
+        """
+        # Convert to grayscale for detection
+        with stage('grayscale'):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        with stage('face_cascade'):
+            face_box, scale = self.detect_face_box(gray, decode_factor)
+        if face_box is None:
+            logger.warning("No face detected in image")
+            return None
+
+        with stage('eye_cascade'):
+            eyes = self.detect_eyes(gray, face_box)
+
+        return {
+            'gray': gray,
+            'face_box': face_box,
+            'eyes': eyes,
+            'scale': scale,
+            'decode_factor': decode_factor
+        }
+
+
+    def detect_all(self, image: np.ndarray, decode_factor: int = 1,
+                   max_faces: Optional[int] = None) -> List[Dict]:
+        """
+        Detect every face and the eyes inside each
+
+        Args:
+            image: BGR image from OpenCV
+            decode_factor: Reduction the image was decoded at
+            max_faces: Keep at most this many of the largest faces; None keeps all
+
+        Returns:
+            One detection per face, in the format of detect(), ordered left to
+            right; the grayscale image is shared between them
+        """
+        with stage('grayscale'):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        with stage('face_cascade'):
+            face_boxes, scale = self.detect_face_boxes(gray, max_faces, decode_factor)
+
+        detections = []
+        with stage('eye_cascade'):
+            for face_box in sorted(face_boxes, key=lambda box: box[0]):
+                detections.append({
+                    'gray': gray,
+                    'face_box': face_box,
+                    'eyes': self.detect_eyes(gray, face_box),
+                    'scale': scale,
+                    'decode_factor': decode_factor
+                })
+        return detections
+
+
+# Singleton instance
+_face_detector = None
+_face_detector_lock = threading.Lock()
+
+def get_face_detector() -> FaceDetector:
+    """
+    Get singleton instance of FaceDetector
+
+    Returns:
+        FaceDetector instance
+    """
+    global _face_detector
+    if _face_detector is None:
+        with _face_detector_lock:
+            if _face_detector is None:
+                _face_detector = FaceDetector()
+    return _face_detector
@@ -0,0 +1,396 @@
+"""
+Face Analysis Process Pool
+Runs face analyses in warm worker processes so they scale across cores
+
+Model inference and parts of the symmetry scoring hold the GIL, so threads
+of one worker cannot analyze images in parallel. With FACE_PROCESS_WORKERS
+set, decoded frames are copied into a shared memory block and only its
+name, shape and dtype are sent to a worker process, instead of pickling
+the pixels. Each worker process loads its own detector, analyzers and
+model once at startup and keeps them for its lifetime; the parent does
+not load the model for them, and reports their state instead.
+"""
+
+import atexit
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from face_analysis import analyze_all_faces, analyze_face_combined, analyze_face_shape_batch
+from face_detection import get_face_detector
+from face_shape_analyzer import get_face_analyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+from request_timing import current_timings, stage, start_timing, stop_timing
+
+logger = logging.getLogger(__name__)
+
+# Number of analysis processes; 0 analyzes in the request thread
+FACE_PROCESS_WORKERS = int(os.environ.get('FACE_PROCESS_WORKERS', '0'))
+# Longest wait for one analysis before the request fails
+FACE_PROCESS_TIMEOUT_SECONDS = float(os.environ.get('FACE_PROCESS_TIMEOUT_SECONDS', '30'))
+# Longest wait for the face shape model while a worker process starts
+FACE_PROCESS_MODEL_TIMEOUT_SECONDS = float(os.environ.get('FACE_PROCESS_MODEL_TIMEOUT_SECONDS', '120'))
+# Seconds between status checks while a worker process is still loading the model
+FACE_PROCESS_STATUS_INTERVAL_SECONDS = float(os.environ.get('FACE_PROCESS_STATUS_INTERVAL_SECONDS', '5'))
+
+
+class FaceProcessUnavailable(RuntimeError):
+    """Raised when no worker process answered an analysis in time, or one died"""
+
+
+def _analyze_face_shape(image, decode_factor):
+    return get_face_analyzer().analyze_face(image, decode_factor=decode_factor)
+
+
+def _analyze_face_symmetry(image, decode_factor):
+    return get_symmetry_analyzer().analyze_face_symmetry(image, decode_factor=decode_factor)
+
+
+# Analyses a worker process can run, by the analysis type used for caching
+ANALYSES = {
+    'face_shape': _analyze_face_shape,
+    'face_symmetry': _analyze_face_symmetry,
+    'face': analyze_face_combined,
+    'face_multi': analyze_all_faces,
+}
+
+
+def _init_worker() -> None:
+    """Load the detector, analyzers and model once per worker process"""
+    logging.basicConfig(level=logging.INFO)
+    get_face_detector()
+    get_symmetry_analyzer()
+    get_face_analyzer().wait_for_model(timeout=FACE_PROCESS_MODEL_TIMEOUT_SECONDS)
+    logger.info(f"Face analysis worker process {os.getpid()} ready")
+
+
+def _worker_status() -> Dict:
+    """
+    Report the face shape model state of a worker process; also starts the
+    worker processes ahead of the first request
+
+    Returns:
+        FaceShapeAnalyzer.get_model_status() plus the process id and cache version
+    """
+    analyzer = get_face_analyzer()
+    status = analyzer.get_model_status()
+    status['pid'] = os.getpid()
+    status['cache_version'] = analyzer.cache_version
+    return status
+
+
+def _run_analysis(analysis_type: str, block_name: str, shape: Tuple[int, ...], dtype: str,
+                  decode_factor: int) -> Tuple[Dict, Dict[str, float], float]:
+    """
+    Run one analysis on a frame in shared memory, inside a worker process
+
+    Returns:
+        Tuple of (result, stage timings in ms, milliseconds spent in the worker)
+    """
+    start = time.perf_counter()
+    block = shared_memory.SharedMemory(name=block_name)
+    token = start_timing()
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        result = ANALYSES[analysis_type](image, decode_factor)
+        # The block cannot be closed while an array still points into it
+        del image
+        timings = current_timings().stages
+    finally:
+        stop_timing(token)
+        block.close()
+    return result, timings, (time.perf_counter() - start) * 1000.0
+
+
+def _run_batch(images_bytes: List[bytes]) -> Tuple[List[Dict], Dict[str, float], float]:
+    """
+    Decode and analyze a batch of uploads, inside a worker process
+
+    Returns:
+        Tuple of (results, stage timings in ms, milliseconds spent in the worker)
+    """
+    start = time.perf_counter()
+    token = start_timing()
+    try:
+        results = analyze_face_shape_batch(images_bytes)
+        timings = current_timings().stages
+    finally:
+        stop_timing(token)
+    return results, timings, (time.perf_counter() - start) * 1000.0
+
+
+class FaceProcessPool:
+    """
+    Pool of warm processes running face analyses
+
+    The parent owns every shared memory block: it creates one per frame,
+    and unlinks it once the task is finished or cancelled, so a crashed or
+    timed-out worker cannot leak it. Stage timings recorded in the worker are added
+    to the request's Server-Timing, next to `handoff` (copying the frame
+    into shared memory) and `process_queue` (waiting for a free worker and
+    the round trip to it).
+    """
+
+    def __init__(self, workers: int = FACE_PROCESS_WORKERS,
+                 timeout: float = FACE_PROCESS_TIMEOUT_SECONDS,
+                 status_interval: float = FACE_PROCESS_STATUS_INTERVAL_SECONDS):
+        """
+        Initialize the pool; processes start with start()
+
+        Args:
+            workers: Number of worker processes
+            timeout: Seconds to wait for one analysis
+            status_interval: Seconds between status checks while a worker
+                process is still loading the model
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.status_interval = status_interval
+        self._executor = None
+        self._lock = threading.Lock()
+        # Latest status reported by each worker process, by pid
+        self._worker_status = {}
+        self._status_timer = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent already runs model loading and asset threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    def start(self) -> None:
+        """Start and warm every worker process in the background"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+                atexit.register(self.shutdown)
+            executor = self._executor
+        self._check_status(executor)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            timer, self._status_timer = self._status_timer, None
+        if timer is not None:
+            timer.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace an executor whose worker process died"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = executor = self._create_executor()
+            self._worker_status.clear()
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._check_status(executor)
+
+    def _check_status(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Ask the worker processes for their model state, without waiting for the answers"""
+        executor = executor or self._executor
+        if executor is None:
+            return
+        for _ in range(self.workers):
+            try:
+                future = executor.submit(_worker_status)
+            except RuntimeError:
+                # Shut down or broken; a restart checks the new processes
+                return
+            future.add_done_callback(functools.partial(self._record_status, executor))
+
+    def _record_status(self, executor: ProcessPoolExecutor, future: Future) -> None:
+        """Keep a worker process's reported state, and check again while any is loading"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        status = future.result()
+        with self._lock:
+            if executor is not self._executor:
+                return
+            self._worker_status[status['pid']] = status
+            timer = self._status_timer
+            if self.model_status()['state'] == 'loading' and (timer is None or not timer.is_alive()):
+                self._status_timer = threading.Timer(self.status_interval, self._check_status)
+                self._status_timer.daemon = True
+                self._status_timer.start()
+
+    def model_status(self) -> Dict:
+        """
+        Get the face shape model state across the worker processes
+
+        Returns:
+            Status in the format of FaceShapeAnalyzer.get_model_status(). The
+            state is `loading` until every worker process has reported and
+            finished loading, and `ready` only once the model is ready in all
+            of them. `cache_version` keys results the workers compute, and is
+            None before the first report.
+        """
+        statuses = list(self._worker_status.values())
+        states = {status['state'] for status in statuses}
+        if len(statuses) < self.workers or states & {'not_loaded', 'loading'}:
+            state = 'loading'
+        elif states == {'ready'}:
+            state = 'ready'
+        else:
+            state = 'failed' if 'failed' in states else 'unavailable'
+
+        # Every worker loads the same model file, so one reporting the overall state describes it
+        reference = next((status for status in statuses if status['state'] == state), {})
+        return {
+            'state': state,
+            'ready': state == 'ready',
+            'prediction_source': reference.get('prediction_source', 'rule_based'),
+            'backend': reference.get('backend'),
+            'model_version': reference.get('model_version', 'rule_based'),
+            'loaded_at': reference.get('loaded_at'),
+            'error': reference.get('error'),
+            # Workers still loading give rule-based results, so a mix gets its own version
+            'cache_version': '|'.join(sorted({status['cache_version'] for status in statuses})) or None,
+            'workers': self.workers,
+            'workers_reported': len(statuses)
+        }
+
+    def _wait(self, executor: ProcessPoolExecutor, future: Future):
+        """
+        Wait for a task, restarting the pool if its worker process died
+
+        A task that is still queued when the timeout expires is cancelled so
+        it does not run for a client that has gone.
+
+        Raises:
+            FaceProcessUnavailable: The task timed out or its worker process died
+        """
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            logger.error(f'Face analysis did not finish within {self.timeout:g}s')
+            raise FaceProcessUnavailable(f'Face analysis did not finish within {self.timeout:g}s') from e
+        except BrokenProcessPool as e:
+            logger.error('Face analysis worker process died; restarting the pool', exc_info=True)
+            self._restart(executor)
+            raise FaceProcessUnavailable('Face analysis worker process died') from e
+
+    def _add_timings(self, worker_timings: Dict[str, float], waited_ms: float, worker_ms: float) -> None:
+        """Add stages timed in the worker, and the time spent waiting for it, to the request's timings"""
+        timings = current_timings()
+        if timings is not None:
+            for name, duration in worker_timings.items():
+                timings.add(name, duration)
+            timings.add('process_queue', max(0.0, waited_ms - worker_ms))
+
+    def analyze(self, analysis_type: str, image: np.ndarray, decode_factor: int = 1) -> Dict:
+        """
+        Run an analysis on a decoded frame in a worker process
+
+        If a worker process dies, the pool is restarted and the request
+        fails; the parent does not load the model to analyze it itself.
+
+        Args:
+            analysis_type: Key of ANALYSES
+            image: Decoded BGR image
+            decode_factor: Reduction the image was decoded at
+
+        Returns:
+            The analysis result, as the in-process analysis returns it
+
+        Raises:
+            FaceProcessUnavailable: The analysis timed out or its worker process died
+        """
+        if self._executor is None:
+            self.start()
+        executor = self._executor
+
+        with stage('handoff'):
+            image = np.ascontiguousarray(image)
+            block = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        future = None
+        try:
+            with stage('handoff'):
+                np.ndarray(image.shape, dtype=image.dtype, buffer=block.buf)[...] = image
+
+            submitted = time.perf_counter()
+            try:
+                future = executor.submit(
+                    _run_analysis, analysis_type, block.name, image.shape, image.dtype.str, decode_factor
+                )
+            except BrokenProcessPool as e:
+                self._restart(executor)
+                raise FaceProcessUnavailable('Face analysis worker process died') from e
+            result, worker_timings, worker_ms = self._wait(executor, future)
+            waited_ms = (time.perf_counter() - submitted) * 1000.0
+        finally:
+            block.close()
+            if future is not None and not future.done():
+                # Already handed to a worker, which opens the block by name; unlink it once the task ends
+                future.add_done_callback(lambda _: block.unlink())
+            else:
+                block.unlink()
+
+        self._add_timings(worker_timings, waited_ms, worker_ms)
+        return result
+
+    def analyze_batch(self, images_bytes: List[bytes]) -> List[Dict]:
+        """
+        Decode and analyze a batch of uploads in a worker process
+
+        The uploads are sent as they are; they are far smaller than the
+        decoded frames.
+
+        Args:
+            images_bytes: Raw uploaded file contents
+
+        Returns:
+            List of analysis results in input order, as analyze_face_shape_batch returns them
+
+        Raises:
+            FaceProcessUnavailable: The batch timed out or its worker process died
+        """
+        if self._executor is None:
+            self.start()
+        executor = self._executor
+
+        submitted = time.perf_counter()
+        try:
+            future = executor.submit(_run_batch, images_bytes)
+        except BrokenProcessPool as e:
+            self._restart(executor)
+            raise FaceProcessUnavailable('Face analysis worker process died') from e
+        results, worker_timings, worker_ms = self._wait(executor, future)
+        self._add_timings(worker_timings, (time.perf_counter() - submitted) * 1000.0, worker_ms)
+        return results
+
+
+# Singleton instance; None when the pool is disabled
+_face_process_pool = None
+_face_process_pool_lock = threading.Lock()
+
+def get_face_process_pool() -> Optional[FaceProcessPool]:
+    """
+    Get singleton instance of FaceProcessPool
+
+    Returns:
+        FaceProcessPool instance, or None when FACE_PROCESS_WORKERS is 0 or
+        when called inside a worker process
+    """
+    global _face_process_pool
+    # Spawned workers re-import the main module; they must not start pools of their own
+    if FACE_PROCESS_WORKERS <= 0 or multiprocessing.parent_process() is not None:
+        return None
+    if _face_process_pool is None:
+        with _face_process_pool_lock:
+            if _face_process_pool is None:
+                _face_process_pool = FaceProcessPool()
+    return _face_process_pool
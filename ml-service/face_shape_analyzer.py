@@ -7,32 +7,46 @@ import cv2
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import logging
-import os
-import importlib
+import threading
+from datetime import datetime
+from face_detection import get_face_detector
+from analysis_cache import get_analysis_cache
+from model_batcher import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+from face_shape_backends import create_face_shape_backend, DEFAULT_BACKEND, KERAS_MODEL_PATH
+from image_decoding import DEFAULT_DECODE_TARGET_DIM
+from hairstyle_payloads import HairstylePayloads
+from request_timing import stage
+from service_metrics import time_model_inference
 
 logger = logging.getLogger(__name__)
 
 BASE_IMAGE_URL = '/static/hairstyles/'
 
+# Bump when the analysis output changes so cached results are not reused
+ANALYZER_VERSION = '1.0'
+
 class FaceShapeAnalyzer:
     """
     Analyzes face shape using OpenCV face and eye detection
     """
     
-    def __init__(self):
-        """Initialize OpenCV face detectors"""
-        # Load Haar Cascade classifiers
-        cascade_path = cv2.data.haarcascades
-        self.face_cascade = cv2.CascadeClassifier(
-            os.path.join(cascade_path, 'haarcascade_frontalface_default.xml')
-        )
-        self.eye_cascade = cv2.CascadeClassifier(
-            os.path.join(cascade_path, 'haarcascade_eye.xml')
-        )
+    def __init__(self, backend_name: str = DEFAULT_BACKEND):
+        """
+        Initialize OpenCV face detectors
+        
+        Args:
+            backend_name: Face shape model inference backend ('auto', 'keras' or 'opencv_dnn')
+        """
+        # Haar cascades are shared with the symmetry analyzer
+        self.detector = get_face_detector()
 
-        self.model_path = os.path.join(os.path.dirname(__file__), 'model', 'face_shape_model.h5')
+        self.backend_name = backend_name
+        self.model_path = KERAS_MODEL_PATH
         self.face_shape_labels = ['Round', 'Oval', 'Square', 'Heart', 'Oblong']
+        # Loaded inference backend (see face_shape_backends), None until ready
         self.face_shape_model = None
+        self.model_version = 'rule_based'
+        self.model_batcher = None
         
         logger.info("Face Shape Analyzer initialized with OpenCV")
         
@@ -282,66 +296,188 @@ class FaceShapeAnalyzer:
             'Square': 'Soften angles with layers and waves. Side parts work better than center.',
             'Heart': 'Balance your wider forehead with volume at the chin level.'
         }
+        
+        # The catalog is static, so its response fields are serialized once here
+        self.payloads = HairstylePayloads(self.hairstyle_recommendations, self.styling_tips)
 
-        self._load_face_shape_model()
+        # The model is loaded in the background by start_model_loading();
+        # requests are served by the rule-based path until it is ready.
+        self._model_lock = threading.Lock()
+        self._model_loader = None
+        self.model_state = 'not_loaded'
+        self.model_load_error = None
+        self.model_loaded_at = None
+
+    def start_model_loading(self) -> threading.Thread:
+        """Start loading and warming up the face shape model in a background thread."""
+        with self._model_lock:
+            if self._model_loader is None:
+                self.model_state = 'loading'
+                self._model_loader = threading.Thread(
+                    target=self._load_face_shape_model,
+                    name='face-shape-model-loader',
+                    daemon=True
+                )
+                self._model_loader.start()
+            return self._model_loader
+
+    def wait_for_model(self, timeout: Optional[float] = None) -> bool:
+        """Wait for background model loading to finish. Returns True when the model is ready."""
+        self.start_model_loading().join(timeout)
+        return self.model_state == 'ready'
 
     def _load_face_shape_model(self) -> None:
-        """Load trained .h5 face shape model if available."""
-        if not os.path.exists(self.model_path):
-            logger.warning('Face shape model not found at %s. Using rule-based fallback.', self.model_path)
-            return
+        """Load the face shape model through the configured backend, then warm it up."""
+        self.model_state = 'loading'
+        self.model_load_error = None
 
         try:
-            keras_models = importlib.import_module('tensorflow.keras.models')
-            load_model = getattr(keras_models, 'load_model')
-            self.face_shape_model = load_model(self.model_path)
-            logger.info('Loaded face shape model from %s', self.model_path)
+            backend = create_face_shape_backend(self.backend_name)
+            if backend is None:
+                logger.warning('Face shape model not found for backend %s. Using rule-based fallback.', self.backend_name)
+                self.face_shape_model = None
+                self.model_version = 'rule_based'
+                self.model_state = 'unavailable'
+                return
+
+            self.model_path = backend.model_path
+            backend.load()
+
+            # Warm-up inference on a synthetic crop so the first request does not pay for graph setup
+            backend.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))
+
+            self.face_shape_model = backend
+            self.model_version = backend.version
+            self.model_loaded_at = datetime.now().isoformat()
+            logger.info('Loaded face shape model from %s with %s backend', self.model_path, backend.name)
+
+            # Merge crops from concurrent requests into shared predict calls
+            if self.model_batcher is None and DEFAULT_MAX_BATCH_SIZE > 1:
+                self.model_batcher = MicroBatcher(
+                    self._predict_model_batch,
+                    max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                    max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                    name='face_shape_model'
+                )
+            self.model_state = 'ready'
         except Exception as e:
             logger.warning('Unable to load face shape model (%s). Using rule-based fallback.', str(e))
             self.face_shape_model = None
+            self.model_version = 'rule_based'
+            self.model_load_error = str(e)
+            self.model_state = 'failed'
+        finally:
+            # Results cached under the previous model version can never be served again
+            get_analysis_cache().invalidate(['face_shape'])
 
-    def predict_face_shape_with_model(self, image: np.ndarray, landmarks: Dict) -> Optional[str]:
+    def reload_face_shape_model(self) -> None:
+        """Reload the face shape model synchronously and drop results cached for the old one."""
+        self._load_face_shape_model()
+
+    def get_model_status(self) -> Dict:
+        """Get the face shape model's loading state."""
+        return {
+            'state': self.model_state,
+            'ready': self.model_state == 'ready',
+            'prediction_source': 'model' if self.face_shape_model is not None else 'rule_based',
+            'backend': self.face_shape_model.name if self.face_shape_model is not None else None,
+            'model_version': self.model_version,
+            'loaded_at': self.model_loaded_at,
+            'error': self.model_load_error
+        }
+
+    @property
+    def cache_version(self) -> str:
+        """Version string used to key cached analysis results."""
+        return f'{ANALYZER_VERSION}:{DEFAULT_DECODE_TARGET_DIM}:{self.detector.detection_max_dim}:{self.model_version}'
+
+    def _prepare_model_input(self, image: np.ndarray, landmarks: Dict) -> Optional[np.ndarray]:
         """
-        Predict face shape using the trained .h5 model.
+        Crop the face and preprocess it for the face shape model.
 
-        Returns None when model is unavailable or prediction fails.
+        Returns a 224x224x3 float32 array, or None when the crop is empty.
         """
-        if self.face_shape_model is None:
+        x, y, w, h = landmarks['face_box']
+        img_h, img_w = image.shape[:2]
+
+        x = max(0, x)
+        y = max(0, y)
+        w = min(w, img_w - x)
+        h = min(h, img_h - y)
+
+        if w <= 0 or h <= 0:
             return None
 
-        try:
-            x, y, w, h = landmarks['face_box']
-            img_h, img_w = image.shape[:2]
+        face_crop = image[y:y + h, x:x + w]
+        if face_crop.size == 0:
+            return None
 
-            x = max(0, x)
-            y = max(0, y)
-            w = min(w, img_w - x)
-            h = min(h, img_h - y)
+        # Match common classifier preprocessing: RGB, resized, normalized [0, 1].
+        face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+        face_resized = cv2.resize(face_rgb, (224, 224), interpolation=cv2.INTER_AREA)
+        return face_resized.astype(np.float32) / 255.0
 
-            if w <= 0 or h <= 0:
-                return None
+    def _predict_model_batch(self, model_inputs: np.ndarray) -> np.ndarray:
+        """Run the face shape model on a stacked batch of preprocessed crops."""
+        with time_model_inference('face_shape'):
+            return self.face_shape_model.predict(model_inputs)
 
-            face_crop = image[y:y + h, x:x + w]
-            if face_crop.size == 0:
-                return None
+    def _label_from_prediction(self, prediction: np.ndarray) -> Optional[str]:
+        """Map one row of model output to a face shape label."""
+        prediction = np.asarray(prediction)
+        if prediction.ndim == 1 and prediction.shape[0] >= len(self.face_shape_labels):
+            class_idx = int(np.argmax(prediction[:len(self.face_shape_labels)]))
+            return self.face_shape_labels[class_idx]
+        return None
 
-            # Match common classifier preprocessing: RGB, resized, normalized [0, 1].
-            face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-            face_resized = cv2.resize(face_rgb, (224, 224), interpolation=cv2.INTER_AREA)
-            model_input = face_resized.astype(np.float32) / 255.0
-            model_input = np.expand_dims(model_input, axis=0)
+    def predict_face_shapes_with_model(self, faces: List[Tuple[np.ndarray, Dict]]) -> List[Optional[str]]:
+        """
+        Predict face shapes for several faces using the trained model.
 
-            prediction = self.face_shape_model.predict(model_input, verbose=0)
-            prediction = np.asarray(prediction)
+        Several crops, e.g. the faces of one group photo, go to the model as
+        one stacked predict call. A single crop goes through the micro-batcher,
+        which merges it with single-face requests from other threads.
+        Entries are None when the model is unavailable or prediction fails.
+        """
+        labels = [None] * len(faces)
+        if self.face_shape_model is None or not faces:
+            # A deferred load (see get_face_analyzer) starts once an analysis here needs the model
+            if self.model_state == 'not_loaded' and faces:
+                self.start_model_loading()
+            return labels
 
-            if prediction.ndim == 2 and prediction.shape[1] >= len(self.face_shape_labels):
-                class_idx = int(np.argmax(prediction[0][:len(self.face_shape_labels)]))
-                return self.face_shape_labels[class_idx]
+        try:
+            model_inputs = [self._prepare_model_input(image, landmarks) for image, landmarks in faces]
+            indices = [i for i, model_input in enumerate(model_inputs) if model_input is not None]
+            if not indices:
+                return labels
 
-            return None
+            if self.model_batcher is not None and len(indices) == 1:
+                # Single crops from concurrent requests are merged into shared batches
+                predictions = [self.model_batcher.predict(model_inputs[indices[0]])]
+            else:
+                predictions = self._predict_model_batch(np.stack([model_inputs[i] for i in indices]))
+
+            for i, prediction in zip(indices, predictions):
+                labels[i] = self._label_from_prediction(prediction)
+            return labels
         except Exception as e:
             logger.warning('Model prediction failed (%s). Falling back to rule-based classification.', str(e))
+            return [None] * len(faces)
+
+    def predict_face_shape_with_model(self, image: np.ndarray, landmarks: Dict) -> Optional[str]:
+        """
+        Predict face shape using the trained model.
+
+        Returns None when model is unavailable or prediction fails.
+        """
+        return self.predict_face_shapes_with_model([(image, landmarks)])[0]
+
+    def get_model_batching_stats(self) -> Optional[Dict]:
+        """Get micro-batching settings and achieved batch sizes, if enabled."""
+        if self.model_batcher is None:
             return None
+        return self.model_batcher.stats()
     
     def calculate_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
         """
@@ -356,40 +492,27 @@ class FaceShapeAnalyzer:
         """
         return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
     
-    def extract_face_landmarks(self, image: np.ndarray) -> Optional[Dict]:
+    def extract_face_landmarks(self, image: np.ndarray, detection: Optional[Dict] = None,
+                               decode_factor: int = 1) -> Optional[Dict]:
         """
         Extract key facial landmarks from image using OpenCV face detection
         
         Args:
             image: BGR image from OpenCV
+            detection: Optional result of FaceDetector.detect to reuse
+            decode_factor: Reduction the image was decoded at
             
         Returns:
             Dictionary with landmark coordinates or None if face not detected
         """
-        # Convert to grayscale for detection
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
+        if detection is None:
+            detection = self.detector.detect(image, decode_factor)
         
-        if len(faces) == 0:
-            logger.warning("No face detected in image")
+        if detection is None:
             return None
         
-        # Get the largest face (closest to camera)
-        face = max(faces, key=lambda rect: rect[2] * rect[3])
-        x, y, w, h = face
-        
-        # Extract face region
-        face_roi = gray[y:y+h, x:x+w]
-        
-        # Detect eyes within face region
-        eyes = self.eye_cascade.detectMultiScale(face_roi)
+        x, y, w, h = detection['face_box']
+        eyes = detection['eyes']
         
         # Calculate landmarks based on face bounding box and eyes
         # These are approximate landmarks for face shape analysis
@@ -425,7 +548,9 @@ class FaceShapeAnalyzer:
             'right_cheek': right_cheek,
             'left_forehead': left_forehead,
             'right_forehead': right_forehead,
-            'face_box': (x, y, w, h)  # Store original face box for reference
+            'face_box': (x, y, w, h),  # Store original face box for reference
+            'detection_scale': detection['scale'],
+            'decode_factor': detection.get('decode_factor', 1)
         }
         
         return landmarks
@@ -495,6 +620,63 @@ class FaceShapeAnalyzer:
         
         return 'Oval'  # Default to oval
     
+    def calculate_face_measurements_batch(self, landmarks_list: List[Dict]) -> List[Dict]:
+        """
+        Calculate face length, width, and ratio for many faces at once
+        
+        Vectorized equivalent of calculate_face_measurements.
+        
+        Args:
+            landmarks_list: List of facial landmark dictionaries
+            
+        Returns:
+            List of measurement dictionaries in input order
+        """
+        if not landmarks_list:
+            return []
+        
+        def points(name: str) -> np.ndarray:
+            return np.array([landmarks[name] for landmarks in landmarks_list], dtype=np.float64)
+        
+        def distances(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+            return np.sqrt(np.sum((start - end) ** 2, axis=1))
+        
+        face_length = distances(points('forehead_top'), points('chin_bottom'))
+        face_width = distances(points('left_cheek'), points('right_cheek'))
+        forehead_width = distances(points('left_forehead'), points('right_forehead'))
+        
+        avg_width = (face_width + forehead_width) / 2
+        ratio = np.divide(face_length, avg_width, out=np.zeros_like(face_length), where=avg_width > 0)
+        
+        return [
+            {
+                'face_length': float(length),
+                'face_width': float(width),
+                'ratio': float(r)
+            }
+            for length, width, r in zip(face_length, avg_width, ratio)
+        ]
+    
+    def classify_face_shapes(self, ratios: np.ndarray) -> List[str]:
+        """
+        Classify many faces from their length to width ratios
+        
+        Vectorized equivalent of classify_face_shape.
+        
+        Args:
+            ratios: Array of face length to width ratios
+            
+        Returns:
+            List of face shape classifications
+        """
+        ratios = np.asarray(ratios, dtype=np.float64)
+        shapes = np.select(
+            [ratios < 1.1, ratios < 1.3, ratios >= 1.3],
+            ['Round', 'Oval', 'Oblong'],
+            default='Oval'
+        )
+        return [str(shape) for shape in shapes]
+    
     def get_hairstyle_recommendations(self, face_shape: str) -> Dict[str, List[Dict[str, str]]]:
         """
         Get hairstyle recommendations for given face shape
@@ -519,31 +701,79 @@ class FaceShapeAnalyzer:
         """
         return self.styling_tips.get(face_shape, self.styling_tips['Oval'])
     
-    def analyze_face(self, image: np.ndarray) -> Dict:
+    def build_analysis_result(self, face_shape: str, prediction_source: str,
+                              measurements: Dict, landmarks: Dict) -> Dict:
+        """
+        Build the analysis response for a classified face
+        
+        Only the per-request fields are included. The hairstyle
+        recommendations and tips depend on the face shape alone and are
+        spliced in when the result is serialized (see HairstylePayloads).
+        
+        Args:
+            face_shape: Classified face shape
+            prediction_source: 'model' or 'rule_based'
+            measurements: Dictionary with face measurements in decoded-image pixels
+            landmarks: Dictionary of facial landmarks
+            
+        Returns:
+            Dictionary with analysis results
+        """
+        # Report lengths in original-image pixels when the upload was decoded at reduced size
+        decode_factor = landmarks.get('decode_factor', 1)
+        if decode_factor != 1:
+            measurements = dict(
+                measurements,
+                face_length=measurements['face_length'] * decode_factor,
+                face_width=measurements['face_width'] * decode_factor
+            )
+        
+        return {
+            'success': True,
+            'data': {
+                'face_shape': face_shape,
+                'prediction_source': prediction_source,
+                'face_measurements': measurements,
+                'detection_scale': landmarks['detection_scale'],
+                'decode_factor': decode_factor
+            }
+        }
+    
+    def analyze_face(self, image: np.ndarray, detection: Optional[Dict] = None, decode_factor: int = 1) -> Dict:
         """
         Complete face shape analysis pipeline
         
         Args:
             image: BGR image from OpenCV
+            detection: Optional result of FaceDetector.detect to reuse
+            decode_factor: Reduction the image was decoded at; lengths are reported
+                in original-image pixels
             
         Returns:
             Dictionary with analysis results
         """
         try:
-            # Extract landmarks
-            landmarks = self.extract_face_landmarks(image)
+            # Detect outside the measurement stage so the two are timed separately
+            if detection is None:
+                detection = self.detector.detect(image, decode_factor)
             
-            if landmarks is None:
+            if detection is None:
                 return {
                     'success': False,
                     'message': 'No face detected in the image. Please ensure your face is clearly visible and well-lit.'
                 }
             
-            # Calculate measurements
-            measurements = self.calculate_face_measurements(landmarks)
+            # Extract landmarks and calculate measurements
+            with stage('measurements'):
+                landmarks = self.extract_face_landmarks(image, detection, decode_factor)
+                measurements = self.calculate_face_measurements(landmarks)
             
             # Prefer trained model prediction, fallback to rule-based classification.
-            model_face_shape = self.predict_face_shape_with_model(image, landmarks)
+            if self.face_shape_model is not None:
+                with stage('model'):
+                    model_face_shape = self.predict_face_shape_with_model(image, landmarks)
+            else:
+                model_face_shape = None
             if model_face_shape is not None:
                 face_shape = model_face_shape
                 prediction_source = 'model'
@@ -551,27 +781,8 @@ class FaceShapeAnalyzer:
                 face_shape = self.classify_face_shape(measurements)
                 prediction_source = 'rule_based'
             
-            # Get recommendations
-            hairstyle_recommendations = self.get_hairstyle_recommendations(face_shape)
-            tips = self.get_styling_tips(face_shape)
-
-            # Backward-compatible flat list for older clients (string-only names).
-            flat_recommendations = [
-                item.get('name', 'Recommended Style')
-                for item in (hairstyle_recommendations['primary'] + hairstyle_recommendations['secondary'])
-            ]
-            
-            return {
-                'success': True,
-                'data': {
-                    'face_shape': face_shape,
-                    'prediction_source': prediction_source,
-                    'face_measurements': measurements,
-                    'recommended_hairstyles': flat_recommendations,
-                    'hairstyle_recommendations': hairstyle_recommendations,
-                    'tips': tips
-                }
-            }
+            with stage('result'):
+                return self.build_analysis_result(face_shape, prediction_source, measurements, landmarks)
             
         except Exception as e:
             logger.error(f"Error analyzing face: {str(e)}", exc_info=True)
@@ -580,6 +791,63 @@ class FaceShapeAnalyzer:
                 'message': f'Error analyzing face: {str(e)}'
             }
     
+    def analyze_faces(self, images: List[np.ndarray], detections: List[Optional[Dict]]) -> List[Dict]:
+        """
+        Face shape analysis for a batch of already-detected images
+        
+        Measurements and rule-based classification are computed for the
+        whole batch at once.
+        
+        Args:
+            images: BGR images from OpenCV
+            detections: Result of FaceDetector.detect for each image (None when no face)
+            
+        Returns:
+            List of analysis result dictionaries in input order
+        """
+        results = [None] * len(images)
+        landmarks_list = []
+        indices = []
+        
+        with stage('measurements'):
+            for i, (image, detection) in enumerate(zip(images, detections)):
+                landmarks = self.extract_face_landmarks(image, detection) if detection is not None else None
+                if landmarks is None:
+                    results[i] = {
+                        'success': False,
+                        'message': 'No face detected in the image. Please ensure your face is clearly visible and well-lit.'
+                    }
+                else:
+                    landmarks_list.append(landmarks)
+                    indices.append(i)
+            
+            measurements_list = self.calculate_face_measurements_batch(landmarks_list)
+            rule_based_shapes = self.classify_face_shapes([m['ratio'] for m in measurements_list])
+        
+        if self.face_shape_model is not None:
+            with stage('model'):
+                model_face_shapes = self.predict_face_shapes_with_model(
+                    [(images[i], landmarks) for i, landmarks in zip(indices, landmarks_list)]
+                )
+        else:
+            model_face_shapes = [None] * len(indices)
+        
+        for i, landmarks, measurements, rule_based_shape, model_face_shape in zip(
+                indices, landmarks_list, measurements_list, rule_based_shapes, model_face_shapes):
+            try:
+                if model_face_shape is not None:
+                    results[i] = self.build_analysis_result(model_face_shape, 'model', measurements, landmarks)
+                else:
+                    results[i] = self.build_analysis_result(rule_based_shape, 'rule_based', measurements, landmarks)
+            except Exception as e:
+                logger.error(f"Error analyzing face: {str(e)}", exc_info=True)
+                results[i] = {
+                    'success': False,
+                    'message': f'Error analyzing face: {str(e)}'
+                }
+        
+        return results
+    
     def __del__(self):
         """Cleanup resources"""
         # OpenCV classifiers don't need explicit cleanup
@@ -588,15 +856,26 @@ class FaceShapeAnalyzer:
 
 # Singleton instance
 _face_analyzer = None
+_face_analyzer_lock = threading.Lock()
 
-def get_face_analyzer() -> FaceShapeAnalyzer:
+def get_face_analyzer(load_model: bool = True) -> FaceShapeAnalyzer:
     """
     Get singleton instance of FaceShapeAnalyzer
     
+    Args:
+        load_model: Start loading the face shape model when the instance is
+            created. Otherwise it is loaded the first time an analysis in
+            this process needs it.
+    
     Returns:
         FaceShapeAnalyzer instance
     """
     global _face_analyzer
     if _face_analyzer is None:
-        _face_analyzer = FaceShapeAnalyzer()
+        with _face_analyzer_lock:
+            if _face_analyzer is None:
+                analyzer = FaceShapeAnalyzer()
+                if load_model:
+                    analyzer.start_model_loading()
+                _face_analyzer = analyzer
     return _face_analyzer
@@ -0,0 +1,130 @@
+"""
+Face Shape Model Inference Backends
+Runs the face shape classifier with Keras or with OpenCV's DNN module
+"""
+
+import cv2
+import numpy as np
+import importlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model')
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, 'face_shape_model.h5')
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, 'face_shape_model.onnx')
+
+# 'auto' prefers the OpenCV DNN export when present and falls back to Keras
+DEFAULT_BACKEND = os.environ.get('FACE_SHAPE_BACKEND', 'auto')
+
+
+class KerasFaceShapeBackend:
+    """
+    Runs the original .h5 model through TensorFlow Keras
+    """
+
+    name = 'keras'
+
+    def __init__(self, model_path: str = KERAS_MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+
+    def load(self) -> None:
+        """Import TensorFlow and load the .h5 model"""
+        keras_models = importlib.import_module('tensorflow.keras.models')
+        load_model = getattr(keras_models, 'load_model')
+        self.model = load_model(self.model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Classify a batch of preprocessed crops
+
+        Args:
+            batch: float32 array of shape (N, 224, 224, 3) in RGB, scaled to [0, 1]
+
+        Returns:
+            Array of shape (N, num_classes)
+        """
+        return np.asarray(self.model.predict(batch, verbose=0))
+
+    @property
+    def version(self) -> str:
+        """Version string derived from the model artifact"""
+        return f'{self.name}-{int(os.path.getmtime(self.model_path))}'
+
+
+class OpenCVDnnFaceShapeBackend:
+    """
+    Runs an exported ONNX graph of the face shape model through cv2.dnn
+
+    The graph is produced from the .h5 model by convert_face_shape_model.py
+    and keeps the Keras NHWC input layout, so inputs are identical to the
+    Keras backend.
+    """
+
+    name = 'opencv_dnn'
+
+    def __init__(self, model_path: str = ONNX_MODEL_PATH):
+        self.model_path = model_path
+        self.net = None
+        # cv2.dnn.Net is not safe to run from several threads at once
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Read the exported graph with OpenCV"""
+        self.net = cv2.dnn.readNetFromONNX(self.model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Classify a batch of preprocessed crops
+
+        Args:
+            batch: float32 array of shape (N, 224, 224, 3) in RGB, scaled to [0, 1]
+
+        Returns:
+            Array of shape (N, num_classes)
+        """
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            self.net.setInput(batch)
+            output = self.net.forward()
+        return np.asarray(output).reshape(len(batch), -1)
+
+    @property
+    def version(self) -> str:
+        """Version string derived from the model artifact"""
+        return f'{self.name}-{int(os.path.getmtime(self.model_path))}'
+
+
+BACKENDS = {
+    KerasFaceShapeBackend.name: (KerasFaceShapeBackend, KERAS_MODEL_PATH),
+    OpenCVDnnFaceShapeBackend.name: (OpenCVDnnFaceShapeBackend, ONNX_MODEL_PATH),
+}
+
+
+def create_face_shape_backend(backend_name: str = DEFAULT_BACKEND):
+    """
+    Create the configured face shape inference backend
+
+    Args:
+        backend_name: 'keras', 'opencv_dnn' or 'auto'
+
+    Returns:
+        Unloaded backend instance, or None when its model artifact is missing
+    """
+    if backend_name == 'auto':
+        candidates = [OpenCVDnnFaceShapeBackend.name, KerasFaceShapeBackend.name]
+    elif backend_name in BACKENDS:
+        candidates = [backend_name]
+    else:
+        raise ValueError(f"Unknown face shape backend '{backend_name}'. Expected one of: auto, {', '.join(BACKENDS)}")
+
+    for name in candidates:
+        backend_class, model_path = BACKENDS[name]
+        if os.path.exists(model_path):
+            return backend_class(model_path)
+
+    return None
+
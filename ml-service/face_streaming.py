@@ -0,0 +1,386 @@
+"""
+Streaming Face Analysis
+Analyzes a live sequence of camera frames, running full face detection only
+on keyframes and tracking the face box between them
+"""
+
+import cv2
+import numpy as np
+from collections import deque
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+import logging
+import os
+import struct
+import time
+from face_detection import get_face_detector
+from face_shape_analyzer import get_face_analyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+from image_decoding import decode_image
+from image_admission import check_image_header
+from service_metrics import observe_image
+from werkzeug.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Run the Haar cascades on every Nth frame; frames in between are tracked
+DEFAULT_KEYFRAME_INTERVAL = int(os.environ.get('FACE_STREAM_KEYFRAME_INTERVAL', '10'))
+# Number of recent frames averaged into the reported measurements and scores
+DEFAULT_SMOOTHING_WINDOW = int(os.environ.get('FACE_STREAM_SMOOTHING_WINDOW', '8'))
+# Largest accepted frame in a streamed request body
+STREAM_MAX_FRAME_BYTES = int(os.environ.get('FACE_STREAM_MAX_FRAME_BYTES', str(2 * 1024 * 1024)))
+
+# Template match score below which the tracker reports the face as lost
+TRACKER_MIN_SCORE = 0.6
+# Search area around the last box, as a fraction of the face size
+TRACKER_SEARCH_MARGIN = 0.5
+# Longest side of the face template; matching runs at this reduced scale
+TRACKER_TEMPLATE_DIM = 64
+
+FRAME_LENGTH_PREFIX = struct.Struct('>I')
+
+
+class FaceTracker:
+    """
+    Follows a face box between keyframes with normalized template matching
+
+    The face patch from the last keyframe is matched inside a window around
+    the previous box. Matching runs on a downscaled copy of the patch and the
+    window, so one update costs well under a millisecond. The box size is
+    kept from the keyframe; only its position is tracked.
+    """
+
+    def __init__(self, min_score: float = TRACKER_MIN_SCORE,
+                 search_margin: float = TRACKER_SEARCH_MARGIN,
+                 template_dim: int = TRACKER_TEMPLATE_DIM):
+        """
+        Initialize the tracker
+
+        Args:
+            min_score: Minimum TM_CCOEFF_NORMED score to accept a match
+            search_margin: Search window padding as a fraction of the face size
+            template_dim: Longest side of the downscaled face template
+        """
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.template_dim = template_dim
+        self.face_box = None
+        self.score = 0.0
+        self._template = None
+        self._template_scale = 1.0
+
+    def reset(self, gray: np.ndarray, face_box: Tuple[int, int, int, int]) -> None:
+        """
+        Start tracking from a detected face box
+
+        Args:
+            gray: Grayscale frame the face was detected in
+            face_box: Detected face box (x, y, w, h)
+        """
+        x, y, w, h = face_box
+        self._template_scale = min(1.0, self.template_dim / float(max(w, h)))
+        self._template = self._resize(gray[y:y+h, x:x+w])
+        self.face_box = face_box
+        self.score = 1.0
+
+    def clear(self) -> None:
+        """Stop tracking"""
+        self.face_box = None
+        self._template = None
+
+    def _resize(self, patch: np.ndarray) -> np.ndarray:
+        """Downscale a patch to the template scale"""
+        if self._template_scale >= 1.0:
+            return patch
+        height, width = patch.shape[:2]
+        return cv2.resize(
+            patch,
+            (max(1, int(round(width * self._template_scale))), max(1, int(round(height * self._template_scale)))),
+            interpolation=cv2.INTER_AREA
+        )
+
+    def update(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Locate the tracked face in a new frame
+
+        Args:
+            gray: Grayscale frame
+
+        Returns:
+            New face box (x, y, w, h), or None if the face was lost
+        """
+        if self._template is None:
+            return None
+
+        img_h, img_w = gray.shape[:2]
+        x, y, w, h = self.face_box
+        pad_x = int(w * self.search_margin)
+        pad_y = int(h * self.search_margin)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(img_w, x + w + pad_x), min(img_h, y + h + pad_y)
+
+        search = self._resize(gray[y0:y1, x0:x1])
+        template_h, template_w = self._template.shape[:2]
+        if search.shape[0] < template_h or search.shape[1] < template_w:
+            self.clear()
+            return None
+
+        scores = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, self.score, _, location = cv2.minMaxLoc(scores)
+        if self.score < self.min_score:
+            self.clear()
+            return None
+
+        new_x = min(max(0, x0 + int(round(location[0] / self._template_scale))), img_w - w)
+        new_y = min(max(0, y0 + int(round(location[1] / self._template_scale))), img_h - h)
+        self.face_box = (new_x, new_y, w, h)
+        return self.face_box
+
+
+class FaceStreamSession:
+    """
+    Per-stream state for live face shape and symmetry analysis
+
+    Full detection runs on keyframes and whenever tracking is lost. Between
+    keyframes the tracked box is reused with the eye positions from the
+    last keyframe. Measurements and asymmetry scores are averaged over a
+    sliding window of recent frames so the overlay does not flicker.
+    """
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 smoothing_window: int = DEFAULT_SMOOTHING_WINDOW):
+        """
+        Initialize the session
+
+        Args:
+            keyframe_interval: Run full detection on every Nth frame; 1 detects every frame
+            smoothing_window: Number of recent frames averaged into the results
+        """
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.smoothing_window = max(1, smoothing_window)
+        self.detector = get_face_detector()
+        self.shape_analyzer = get_face_analyzer()
+        self.symmetry_analyzer = get_symmetry_analyzer()
+        self.tracker = FaceTracker()
+
+        self.frame_count = 0
+        self.keyframe_count = 0
+        self.tracking_lost_count = 0
+        self.started_at = None
+
+        self._keyframe = None
+        self._frames_since_keyframe = 0
+        self._model_face_shape = None
+        self._measurements = deque(maxlen=self.smoothing_window)
+        self._asymmetry_scores = deque(maxlen=self.smoothing_window)
+
+    def _reset_face(self) -> None:
+        """Forget the tracked face and its smoothing history"""
+        self.tracker.clear()
+        self._keyframe = None
+        self._model_face_shape = None
+        self._measurements.clear()
+        self._asymmetry_scores.clear()
+
+    def _detect_or_track(self, image: np.ndarray, decode_factor: int) -> Tuple[Optional[Dict], bool]:
+        """
+        Get the face detection for a frame
+
+        Returns:
+            Tuple of (detection or None, whether full detection ran)
+        """
+        if self._keyframe is not None and self._frames_since_keyframe < self.keyframe_interval:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            face_box = self.tracker.update(gray)
+            if face_box is not None:
+                self._frames_since_keyframe += 1
+                return dict(self._keyframe, gray=gray, face_box=face_box, decode_factor=decode_factor), False
+            self.tracking_lost_count += 1
+
+        detection = self.detector.detect(image, decode_factor)
+        self.keyframe_count += 1
+        if detection is None:
+            self._reset_face()
+            return None, True
+
+        self._keyframe = detection
+        self._frames_since_keyframe = 1
+        self.tracker.reset(detection['gray'], detection['face_box'])
+        return detection, True
+
+    def _smoothed_measurements(self) -> Dict:
+        """Average face length and width over the window"""
+        face_length = float(np.mean([m['face_length'] for m in self._measurements]))
+        face_width = float(np.mean([m['face_width'] for m in self._measurements]))
+        return {
+            'face_length': face_length,
+            'face_width': face_width,
+            'ratio': face_length / face_width if face_width > 0 else 0
+        }
+
+    def _smoothed_asymmetry_scores(self) -> Dict[str, float]:
+        """Average each region's asymmetry score over the frames that measured it"""
+        regions = {}
+        for scores in self._asymmetry_scores:
+            for region, score in scores.items():
+                regions.setdefault(region, []).append(score)
+        return {region: float(np.mean(values)) for region, values in regions.items()}
+
+    def process_frame(self, image: np.ndarray, decode_factor: int = 1) -> Dict:
+        """
+        Analyze one frame of the stream
+
+        Args:
+            image: BGR frame from OpenCV
+            decode_factor: Reduction the frame was decoded at
+
+        Returns:
+            Dictionary with the frame index, face box and smoothed face shape
+            and symmetry results
+        """
+        start = time.perf_counter()
+        if self.started_at is None:
+            self.started_at = start
+        frame_index = self.frame_count
+        self.frame_count += 1
+
+        detection, keyframe = self._detect_or_track(image, decode_factor)
+        if detection is None:
+            return {
+                'frame': frame_index,
+                'success': False,
+                'keyframe': keyframe,
+                'message': 'No face detected in the frame',
+                'processing_ms': round((time.perf_counter() - start) * 1000.0, 2)
+            }
+
+        shape_landmarks = self.shape_analyzer.extract_face_landmarks(image, detection)
+        symmetry_landmarks = self.symmetry_analyzer.detect_face_landmarks(image, detection)
+        self._measurements.append(self.shape_analyzer.calculate_face_measurements(shape_landmarks))
+        self._asymmetry_scores.append(
+            self.symmetry_analyzer.calculate_asymmetry_score(symmetry_landmarks)['asymmetry_scores']
+        )
+
+        # The model is only consulted on keyframes; tracked frames keep its label
+        if keyframe:
+            self._model_face_shape = self.shape_analyzer.predict_face_shape_with_model(image, shape_landmarks)
+
+        measurements = self._smoothed_measurements()
+        asymmetry_scores = self._smoothed_asymmetry_scores()
+        if self._model_face_shape is not None:
+            face_shape, prediction_source = self._model_face_shape, 'model'
+        else:
+            face_shape, prediction_source = self.shape_analyzer.classify_face_shape(measurements), 'rule_based'
+
+        x, y, w, h = detection['face_box']
+        return {
+            'frame': frame_index,
+            'success': True,
+            'keyframe': keyframe,
+            'face_box': [v * decode_factor for v in (x, y, w, h)],
+            'tracking_score': round(float(self.tracker.score), 3),
+            'face_shape': face_shape,
+            'prediction_source': prediction_source,
+            'face_measurements': {
+                'face_length': measurements['face_length'] * decode_factor,
+                'face_width': measurements['face_width'] * decode_factor,
+                'ratio': measurements['ratio']
+            },
+            'primary_issue': self.symmetry_analyzer.determine_primary_issue(asymmetry_scores),
+            'asymmetry_scores': asymmetry_scores,
+            'smoothed_frames': len(self._measurements),
+            'processing_ms': round((time.perf_counter() - start) * 1000.0, 2)
+        }
+
+    def stats(self) -> Dict:
+        """
+        Get session statistics
+
+        Returns:
+            Dictionary with frame, keyframe and tracking-loss counts and the
+            sustained frames per second since the first frame
+        """
+        elapsed = time.perf_counter() - self.started_at if self.started_at is not None else 0.0
+        return {
+            'frames': self.frame_count,
+            'keyframes': self.keyframe_count,
+            'tracking_lost': self.tracking_lost_count,
+            'fps': round(self.frame_count / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+def iter_length_prefixed_frames(stream: BinaryIO, max_frame_bytes: int = STREAM_MAX_FRAME_BYTES) -> Iterator[bytes]:
+    """
+    Split a request body into frames
+
+    Each frame is a 4-byte big-endian length followed by that many bytes of
+    encoded image data (JPEG, PNG or WebP).
+
+    Args:
+        stream: Readable binary stream, e.g. Flask's request.stream
+        max_frame_bytes: Largest accepted frame
+
+    Yields:
+        Encoded frame bytes
+
+    Raises:
+        ValueError: If a frame is too large or the stream ends mid-frame
+    """
+    while True:
+        prefix = _read_exactly(stream, FRAME_LENGTH_PREFIX.size)
+        if not prefix:
+            return
+        if len(prefix) < FRAME_LENGTH_PREFIX.size:
+            raise ValueError('Stream ended inside a frame length prefix')
+
+        (length,) = FRAME_LENGTH_PREFIX.unpack(prefix)
+        if length > max_frame_bytes:
+            raise ValueError(f'Frame of {length} bytes exceeds the {max_frame_bytes} byte limit')
+
+        frame = _read_exactly(stream, length)
+        if len(frame) < length:
+            raise ValueError('Stream ended inside a frame')
+        yield frame
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    """Read up to `size` bytes, looping over short reads"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def analyze_frame_stream(frames: Iterable[bytes], session: Optional[FaceStreamSession] = None) -> Iterator[Dict]:
+    """
+    Analyze a sequence of encoded frames
+
+    Args:
+        frames: Encoded frame bytes in capture order
+        session: Session to use; a new one is created by default
+
+    Yields:
+        One result dictionary per frame
+    """
+    session = session or FaceStreamSession()
+    for frame_bytes in frames:
+        try:
+            check_image_header(frame_bytes)
+        except HTTPException as e:
+            frame_index = session.frame_count
+            session.frame_count += 1
+            yield {'frame': frame_index, 'success': False, 'message': e.description}
+            continue
+        
+        image, decode_factor = decode_image(frame_bytes)
+        observe_image('stream', len(frame_bytes), image)
+        if image is None:
+            frame_index = session.frame_count
+            session.frame_count += 1
+            yield {'frame': frame_index, 'success': False, 'message': 'Invalid image file'}
+            continue
+        yield session.process_frame(image, decode_factor)
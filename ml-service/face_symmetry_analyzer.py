@@ -3,13 +3,28 @@ Face Symmetry Analyzer using OpenCV and MediaPipe
 Analyzes facial symmetry and recommends appropriate exercises
 """
 
-import cv2
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Optional
 import logging
+import os
+import threading
+from face_detection import get_face_detector
+from image_decoding import DEFAULT_DECODE_TARGET_DIM
+from symmetry_engine import MirrorSymmetryEngine
+from request_timing import stage
 
 logger = logging.getLogger(__name__)
 
+# Bump when the analysis output changes so cached results are not reused
+ANALYZER_VERSION = '1.1'
+# 'landmarks' uses the box-fraction landmark distances; 'mirror' scores pixels
+# of the eye-aligned face against its mirror image
+SYMMETRY_METHOD = os.environ.get('FACE_SYMMETRY_METHOD', 'landmarks')
+# Smallest region score reported as an issue, per scoring method. The mirror
+# threshold has not been validated against labelled faces yet, so mirror
+# scoring stays opt-in
+ISSUE_THRESHOLDS = {'landmarks': 5.0, 'mirror': 30.0}
+
 class FaceSymmetryAnalyzer:
     """
     Analyzes facial symmetry and detects imbalances
@@ -17,16 +32,12 @@ class FaceSymmetryAnalyzer:
     
     def __init__(self):
         """Initialize OpenCV face and eye detectors"""
-        # Load Haar Cascade classifiers
-        cascade_path = cv2.data.haarcascades
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
-        self.eye_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_eye.xml'
-        )
+        # Haar cascades are shared with the face shape analyzer
+        self.detector = get_face_detector()
+        self.method = SYMMETRY_METHOD if SYMMETRY_METHOD in ISSUE_THRESHOLDS else 'landmarks'
+        self.engine = MirrorSymmetryEngine() if self.method == 'mirror' else None
         
-        logger.info("Face Symmetry Analyzer initialized with OpenCV")
+        logger.info(f"Face Symmetry Analyzer initialized with OpenCV ({self.method} scoring)")
         
         # Exercise recommendations mapping
         self.exercise_recommendations = {
@@ -87,46 +98,41 @@ class FaceSymmetryAnalyzer:
             }
         }
     
-    def detect_face_landmarks(self, image: np.ndarray) -> Optional[Dict]:
+    @property
+    def cache_version(self) -> str:
+        """Version string used to key cached analysis results"""
+        method = self.engine.version if self.method == 'mirror' else self.method
+        return f'{ANALYZER_VERSION}:{DEFAULT_DECODE_TARGET_DIM}:{self.detector.detection_max_dim}:{method}'
+    
+    def detect_face_landmarks(self, image: np.ndarray, detection: Optional[Dict] = None,
+                              decode_factor: int = 1) -> Optional[Dict]:
         """
         Detect facial features and key landmarks
         
         Args:
             image: BGR image from OpenCV
+            detection: Optional result of FaceDetector.detect to reuse
+            decode_factor: Reduction the image was decoded at
             
         Returns:
             Dictionary with landmark coordinates or None if face not detected
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
+        if detection is None:
+            detection = self.detector.detect(image, decode_factor)
         
-        if len(faces) == 0:
-            logger.warning("No face detected in image")
+        if detection is None:
             return None
         
-        # Get the largest face
-        face = max(faces, key=lambda rect: rect[2] * rect[3])
-        x, y, w, h = face
-        
-        # Extract face region for eye detection
-        face_roi_gray = gray[y:y+h, x:x+w]
-        face_roi_color = image[y:y+h, x:x+w]
-        
-        # Detect eyes within face region
-        eyes = self.eye_cascade.detectMultiScale(face_roi_gray)
+        x, y, w, h = detection['face_box']
+        eyes = detection['eyes']
         
         landmarks = {
             'face_box': (x, y, w, h),
             'face_center': (x + w//2, y + h//2),
-            'eyes': []
+            'eyes': [],
+            'detection_scale': detection['scale'],
+            'decode_factor': detection.get('decode_factor', 1),
+            'gray': detection['gray']
         }
         
         # Process detected eyes
@@ -179,6 +185,43 @@ class FaceSymmetryAnalyzer:
         """
         Calculate asymmetry scores for different facial regions
         
+        Args:
+            landmarks: Dictionary of facial landmarks
+            
+        Returns:
+            Dictionary with asymmetry scores and detected issues
+        """
+        if self.method == 'mirror' and landmarks.get('gray') is not None:
+            return self.calculate_mirror_asymmetry(landmarks)
+        return self.calculate_landmark_asymmetry(landmarks)
+    
+    def calculate_mirror_asymmetry(self, landmarks: Dict) -> Dict:
+        """
+        Score each region by comparing the eye-aligned face with its mirror image
+        
+        Args:
+            landmarks: Dictionary of facial landmarks including the grayscale image
+            
+        Returns:
+            Dictionary with asymmetry scores and detected issues
+        """
+        eye_centers = [eye['center'] for eye in landmarks.get('eyes', [])]
+        result = self.engine.analyze(landmarks['gray'], landmarks['face_box'], eye_centers)
+        asymmetry_scores = result['asymmetry_scores']
+        
+        return {
+            'primary_issue': self.determine_primary_issue(asymmetry_scores),
+            'asymmetry_scores': asymmetry_scores,
+            # Without an eye axis the crop is only box-centred, so small offsets read as asymmetry
+            'confidence': 'high' if result['eye_aligned'] else 'medium',
+            'method': 'mirror',
+            'pyramid_levels': result['levels_used']
+        }
+    
+    def calculate_landmark_asymmetry(self, landmarks: Dict) -> Dict:
+        """
+        Calculate asymmetry scores from landmark positions
+        
         Args:
             landmarks: Dictionary of facial landmarks
             
@@ -190,7 +233,8 @@ class FaceSymmetryAnalyzer:
             return {
                 'primary_issue': 'Full Face Toning Routine (General Recommendation)',
                 'asymmetry_scores': {},
-                'confidence': 'low'
+                'confidence': 'low',
+                'method': 'landmarks'
             }
         
         asymmetry_scores = {}
@@ -235,6 +279,29 @@ class FaceSymmetryAnalyzer:
             forehead_asymmetry = abs(left_distance - right_distance) / landmarks['face_box'][2] * 100
             asymmetry_scores['forehead'] = forehead_asymmetry
         
+        return {
+            'primary_issue': self.determine_primary_issue(asymmetry_scores, ISSUE_THRESHOLDS['landmarks']),
+            'asymmetry_scores': asymmetry_scores,
+            'confidence': 'high' if asymmetry_scores else 'low',
+            'method': 'landmarks'
+        }
+    
+    def determine_primary_issue(self, asymmetry_scores: Dict[str, float],
+                                threshold: Optional[float] = None) -> str:
+        """
+        Pick the exercise category for the most asymmetric region
+        
+        Args:
+            asymmetry_scores: Asymmetry score per facial region
+            threshold: Smallest score reported as an issue; defaults to the
+                threshold of the configured scoring method
+            
+        Returns:
+            Primary issue name
+        """
+        if threshold is None:
+            threshold = ISSUE_THRESHOLDS[self.method]
+        
         # Determine primary issue based on highest asymmetry score
         if not asymmetry_scores:
             primary_issue = 'Full Face Toning Routine (General Recommendation)'
@@ -243,7 +310,7 @@ class FaceSymmetryAnalyzer:
             region, score = max_asymmetry_region
             
             # Map region to exercise category with threshold
-            if score > 5:  # Threshold for significant asymmetry
+            if score > threshold:  # Threshold for significant asymmetry
                 if region == 'jaw':
                     primary_issue = 'Jaw Asymmetry'
                 elif region == 'cheek':
@@ -258,34 +325,38 @@ class FaceSymmetryAnalyzer:
                 # Low asymmetry - general recommendation
                 primary_issue = 'Full Face Toning Routine (General Recommendation)'
         
-        return {
-            'primary_issue': primary_issue,
-            'asymmetry_scores': asymmetry_scores,
-            'confidence': 'high' if asymmetry_scores else 'low'
-        }
+        return primary_issue
     
-    def analyze_face_symmetry(self, image: np.ndarray) -> Dict:
+    def analyze_face_symmetry(self, image: np.ndarray, detection: Optional[Dict] = None,
+                              decode_factor: int = 1) -> Dict:
         """
         Main analysis function - analyzes facial symmetry and returns recommendations
         
         Args:
             image: BGR image from OpenCV
+            detection: Optional result of FaceDetector.detect to reuse
+            decode_factor: Reduction the image was decoded at
             
         Returns:
             Dictionary with analysis results and exercise recommendations
         """
         try:
-            # Detect facial landmarks
-            landmarks = self.detect_face_landmarks(image)
+            # Detect outside the scoring stage so the two are timed separately
+            if detection is None:
+                detection = self.detector.detect(image, decode_factor)
             
-            if landmarks is None:
+            if detection is None:
                 return {
                     'success': False,
                     'message': 'No face detected in the image. Please ensure your face is clearly visible and well-lit.'
                 }
             
-            # Calculate asymmetry
-            asymmetry_analysis = self.calculate_asymmetry_score(landmarks)
+            with stage('symmetry'):
+                # Detect facial landmarks
+                landmarks = self.detect_face_landmarks(image, detection, decode_factor)
+                
+                # Calculate asymmetry
+                asymmetry_analysis = self.calculate_asymmetry_score(landmarks)
             
             # Get exercise recommendations
             primary_issue = asymmetry_analysis['primary_issue']
@@ -302,7 +373,10 @@ class FaceSymmetryAnalyzer:
                     'video_file': recommendations['video'],
                     'exercises': recommendations['exercises'],
                     'asymmetry_scores': asymmetry_analysis['asymmetry_scores'],
-                    'confidence': asymmetry_analysis['confidence']
+                    'confidence': asymmetry_analysis['confidence'],
+                    'symmetry_method': asymmetry_analysis['method'],
+                    'detection_scale': landmarks['detection_scale'],
+                    'decode_factor': landmarks['decode_factor']
                 }
             }
             
@@ -316,6 +390,7 @@ class FaceSymmetryAnalyzer:
 
 # Global instance
 _analyzer_instance = None
+_analyzer_instance_lock = threading.Lock()
 
 def get_symmetry_analyzer():
     """
@@ -326,5 +401,7 @@ def get_symmetry_analyzer():
     """
     global _analyzer_instance
     if _analyzer_instance is None:
-        _analyzer_instance = FaceSymmetryAnalyzer()
+        with _analyzer_instance_lock:
+            if _analyzer_instance is None:
+                _analyzer_instance = FaceSymmetryAnalyzer()
     return _analyzer_instance
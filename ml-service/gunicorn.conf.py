@@ -0,0 +1,28 @@
+"""
+Gunicorn settings
+Loaded automatically when gunicorn starts from this directory; command
+line flags (see Procfile) still take precedence
+"""
+
+import os
+import shutil
+import tempfile
+
+# Every worker writes its Prometheus samples here so /metrics can aggregate
+# them. It must be set before the workers import prometheus_client.
+prometheus_multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'ml-service-prometheus')
+)
+
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's counters
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Imported here, and not through service_metrics, whose module-level
+    # gauges would give the master sample files of its own
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
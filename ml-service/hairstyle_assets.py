@@ -0,0 +1,280 @@
+"""
+Hairstyle Image Variants
+Generates resized JPEG and WebP versions of the hairstyle images into a
+derived cache directory and picks the variant to serve for a request
+"""
+
+import atexit
+import cv2
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+HAIRSTYLE_IMAGE_DIR = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles')
+ASSET_CACHE_DIR = os.environ.get(
+    'HAIRSTYLE_ASSET_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.asset_cache', 'hairstyles')
+)
+# Widths generated for every image; images are never upscaled
+VARIANT_WIDTHS = tuple(int(w) for w in os.environ.get('HAIRSTYLE_VARIANT_WIDTHS', '160,320,640').split(','))
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Output format -> OpenCV encode parameters
+VARIANT_FORMATS = {
+    'jpg': [cv2.IMWRITE_JPEG_QUALITY, 82, cv2.IMWRITE_JPEG_OPTIMIZE, 1],
+    'webp': [cv2.IMWRITE_WEBP_QUALITY, 80],
+}
+# Directory name for full-size variants (WebP at the original width)
+FULL_SIZE = 'full'
+MANIFEST_FILE = 'manifest.json'
+
+
+class HairstyleAssetPipeline:
+    """
+    Builds and resolves responsive variants of the hairstyle images
+
+    Variants are written to `<cache_dir>/<width>/<shape>/<name>.<format>`.
+    A manifest records the size and modification time of each source and
+    the settings it was built with. A rebuild only re-encodes sources that
+    changed and removes variants whose source is gone.
+    """
+
+    def __init__(self, source_dir: str = HAIRSTYLE_IMAGE_DIR, cache_dir: str = ASSET_CACHE_DIR,
+                 widths: Tuple[int, ...] = VARIANT_WIDTHS):
+        """
+        Initialize the pipeline
+
+        Args:
+            source_dir: Directory holding the original hairstyle images
+            cache_dir: Directory for derived variants
+            widths: Variant widths in pixels
+        """
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(set(widths)))
+        self.state = 'not_built'
+        self.last_build = None
+        self._build_lock = threading.Lock()
+        self._builder = None
+        self._stop = threading.Event()
+        self._exit_hook_registered = False
+
+    @property
+    def settings(self) -> Dict:
+        """Settings that invalidate every variant when changed"""
+        return {
+            'widths': list(self.widths),
+            'formats': {fmt: params for fmt, params in VARIANT_FORMATS.items()}
+        }
+
+    def _list_sources(self) -> List[str]:
+        """Relative paths of all source images"""
+        sources = []
+        for root, _, files in os.walk(self.source_dir):
+            for name in files:
+                if name.lower().endswith(SOURCE_EXTENSIONS):
+                    sources.append(os.path.relpath(os.path.join(root, name), self.source_dir).replace(os.sep, '/'))
+        return sorted(sources)
+
+    def _variant_paths(self, source: str) -> List[Tuple[Optional[int], str, str]]:
+        """(width, format, path) for every variant of a source"""
+        stem = os.path.splitext(source)[0]
+        variants = [
+            (width, fmt, os.path.join(self.cache_dir, str(width), f'{stem}.{fmt}'))
+            for width in self.widths
+            for fmt in VARIANT_FORMATS
+        ]
+        variants.append((None, 'webp', os.path.join(self.cache_dir, FULL_SIZE, f'{stem}.webp')))
+        return variants
+
+    def _read_manifest(self) -> Dict:
+        """Load the manifest, or an empty one if missing or unreadable"""
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {'settings': None, 'sources': {}}
+        return manifest
+
+    def _write_file(self, path: str, data: bytes) -> None:
+        """Write atomically so concurrent workers never serve a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _build_source(self, source: str) -> int:
+        """Encode every variant of one source image; returns the number written"""
+        image = cv2.imread(os.path.join(self.source_dir, source), cv2.IMREAD_COLOR)
+        if image is None:
+            logger.warning(f"Skipping unreadable hairstyle image: {source}")
+            return 0
+
+        height, width = image.shape[:2]
+        written = 0
+        for variant_width, fmt, path in self._variant_paths(source):
+            if variant_width is not None and variant_width < width:
+                target_height = max(1, int(round(height * variant_width / width)))
+                variant = cv2.resize(image, (variant_width, target_height), interpolation=cv2.INTER_AREA)
+            else:
+                variant = image
+            ok, buffer = cv2.imencode(f'.{fmt}', variant, VARIANT_FORMATS[fmt])
+            if not ok:
+                logger.warning(f"Could not encode {source} as {fmt}")
+                continue
+            self._write_file(path, buffer.tobytes())
+            written += 1
+        return written
+
+    def build(self, force: bool = False) -> Dict:
+        """
+        Generate missing or outdated variants and remove orphaned ones
+
+        Args:
+            force: Rebuild every variant regardless of the manifest
+
+        Returns:
+            Dictionary with counts of rebuilt, unchanged and removed sources
+        """
+        with self._build_lock:
+            start = time.perf_counter()
+            self.state = 'building'
+            manifest = self._read_manifest()
+            if force or manifest.get('settings') != self.settings:
+                manifest = {'settings': self.settings, 'sources': {}}
+
+            previous = manifest['sources']
+            current = {}
+            rebuilt = unchanged = 0
+
+            for source in self._list_sources():
+                if self._stop.is_set():
+                    # Leave the manifest untouched; the next build picks up from here
+                    self.state = 'stopped'
+                    return {'rebuilt': rebuilt, 'unchanged': unchanged, 'removed': 0, 'stopped': True}
+
+                stat = os.stat(os.path.join(self.source_dir, source))
+                signature = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+                outputs_present = all(os.path.exists(path) for _, _, path in self._variant_paths(source))
+
+                if previous.get(source) == signature and outputs_present:
+                    unchanged += 1
+                elif self._build_source(source):
+                    rebuilt += 1
+                else:
+                    continue
+                current[source] = signature
+
+            removed = 0
+            for source in set(previous) - set(current):
+                for _, _, path in self._variant_paths(source):
+                    if os.path.exists(path):
+                        os.remove(path)
+                removed += 1
+
+            manifest['sources'] = current
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write_file(os.path.join(self.cache_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode())
+
+            self.last_build = {
+                'rebuilt': rebuilt,
+                'unchanged': unchanged,
+                'removed': removed,
+                'seconds': round(time.perf_counter() - start, 3)
+            }
+            self.state = 'ready'
+            logger.info(f"Hairstyle image variants built: {self.last_build}")
+            return self.last_build
+
+    def start_build(self) -> threading.Thread:
+        """
+        Build variants in a background thread; originals are served until it finishes
+
+        Returns:
+            The builder thread
+        """
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                self.state = 'failed'
+                logger.error(f"Building hairstyle image variants failed: {str(e)}", exc_info=True)
+
+        if self._builder is None or not self._builder.is_alive():
+            self._stop.clear()
+            self._builder = threading.Thread(target=run, name='hairstyle-assets', daemon=True)
+            self._builder.start()
+            if not self._exit_hook_registered:
+                atexit.register(self.stop)
+                self._exit_hook_registered = True
+        return self._builder
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop a background build between images
+
+        Called at interpreter exit so OpenCV is never torn down mid-encode.
+
+        Args:
+            timeout: Seconds to wait for the builder thread
+        """
+        self._stop.set()
+        if self._builder is not None and self._builder.is_alive():
+            self._builder.join(timeout)
+
+    def resolve(self, source: str, width: Optional[int] = None, accept_webp: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Pick the variant to serve for a request
+
+        Args:
+            source: Image path relative to the source directory, e.g. 'heart/braids.jpg'
+            width: Requested display width in pixels, if any
+            accept_webp: Whether the client accepts image/webp
+
+        Returns:
+            (directory, filename) of the variant, or None to serve the original
+        """
+        stem = os.path.splitext(source)[0]
+        if width is None:
+            if not accept_webp:
+                return None
+            variant_dir, fmt = FULL_SIZE, 'webp'
+        else:
+            # Smallest generated width that covers the request
+            covering = [w for w in self.widths if w >= width]
+            if covering:
+                variant_dir, fmt = str(covering[0]), 'webp' if accept_webp else 'jpg'
+            elif accept_webp:
+                variant_dir, fmt = FULL_SIZE, 'webp'
+            else:
+                return None
+
+        path = safe_join(self.cache_dir, variant_dir, f'{stem}.{fmt}')
+        if path is None or not os.path.isfile(path):
+            return None
+        return os.path.dirname(path), os.path.basename(path)
+
+
+# Singleton instance
+_asset_pipeline = None
+_asset_pipeline_lock = threading.Lock()
+
+def get_hairstyle_asset_pipeline() -> HairstyleAssetPipeline:
+    """
+    Get singleton instance of HairstyleAssetPipeline
+
+    Returns:
+        HairstyleAssetPipeline instance
+    """
+    global _asset_pipeline
+    if _asset_pipeline is None:
+        with _asset_pipeline_lock:
+            if _asset_pipeline is None:
+                _asset_pipeline = HairstyleAssetPipeline()
+    return _asset_pipeline
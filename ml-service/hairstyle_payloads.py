@@ -0,0 +1,162 @@
+"""
+Pre-serialized Hairstyle Recommendation Payloads
+Serializes the static hairstyle catalog once per face shape so face shape
+responses only need the per-request measurements encoded
+"""
+
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 'full' carries both the flat name list and the structured catalog;
+# 'legacy' carries only the flat name list expected by older clients
+RECOMMENDATION_VARIANTS = ('full', 'legacy')
+DEFAULT_RECOMMENDATION_VARIANT = 'full'
+
+# Response fields that depend only on the face shape
+STATIC_FIELDS = ('recommended_hairstyles', 'hairstyle_recommendations', 'tips')
+
+
+def _extend_object(obj: Dict, members: str) -> str:
+    """Serialize a dict and append pre-serialized members to it"""
+    if not obj:
+        return '{' + members + '}'
+    return json.dumps(obj)[:-1] + ', ' + members + '}'
+
+
+class HairstylePayloads:
+    """
+    Static part of the face shape response, precomputed per face shape
+
+    For every face shape and response variant the recommendation fields are
+    serialized to a JSON fragment at startup. Serializing a result then
+    encodes only the small per-request fields and splices the fragment in.
+    """
+
+    def __init__(self, recommendations: Dict[str, Dict[str, List[Dict[str, str]]]],
+                 tips: Dict[str, str], default_shape: str = 'Oval'):
+        """
+        Precompute flat name lists and JSON fragments
+
+        Args:
+            recommendations: Primary and secondary hairstyles per face shape
+            tips: Styling tips per face shape
+            default_shape: Shape whose payload is used for unknown shapes
+        """
+        self.default_shape = default_shape
+        self.flat_names = {}
+        self._fragments = {}
+
+        for face_shape, catalog in recommendations.items():
+            flat_names = [
+                item.get('name', 'Recommended Style') if isinstance(item, dict) else str(item)
+                for item in catalog.get('primary', []) + catalog.get('secondary', [])
+            ]
+            self.flat_names[face_shape] = flat_names
+
+            full = {
+                'recommended_hairstyles': flat_names,
+                'hairstyle_recommendations': catalog,
+                'tips': tips.get(face_shape, tips[default_shape])
+            }
+            legacy = {key: full[key] for key in ('recommended_hairstyles', 'tips')}
+            # Drop the surrounding braces so the fragment can be spliced into an object
+            self._fragments[(face_shape, 'full')] = json.dumps(full)[1:-1]
+            self._fragments[(face_shape, 'legacy')] = json.dumps(legacy)[1:-1]
+
+        logger.info(f"Pre-serialized hairstyle payloads for {len(self.flat_names)} face shapes")
+
+    def get_flat_names(self, face_shape: str) -> List[str]:
+        """
+        Get the legacy flat list of hairstyle names
+
+        Args:
+            face_shape: Classified face shape
+
+        Returns:
+            New list of hairstyle names
+        """
+        return list(self.flat_names.get(face_shape, self.flat_names[self.default_shape]))
+
+    def fragment(self, face_shape: str, variant: str = DEFAULT_RECOMMENDATION_VARIANT) -> str:
+        """
+        Get the pre-serialized recommendation fields
+
+        Args:
+            face_shape: Classified face shape
+            variant: 'full' or 'legacy'
+
+        Returns:
+            JSON object members without the surrounding braces
+        """
+        if variant not in RECOMMENDATION_VARIANTS:
+            raise ValueError(f"Unknown recommendation variant '{variant}'. Expected one of: {', '.join(RECOMMENDATION_VARIANTS)}")
+        fragment = self._fragments.get((face_shape, variant))
+        if fragment is None:
+            fragment = self._fragments[(self.default_shape, variant)]
+        return fragment
+
+    def recommendation_fields(self, face_shape: str, variant: str = DEFAULT_RECOMMENDATION_VARIANT) -> Dict:
+        """
+        Get the recommendation fields as a new dict
+
+        For callers that need the complete response as Python objects rather
+        than JSON; responses are serialized with serialize_result instead.
+
+        Args:
+            face_shape: Classified face shape
+            variant: 'full' or 'legacy'
+
+        Returns:
+            Dictionary with the static recommendation fields
+        """
+        return json.loads('{' + self.fragment(face_shape, variant) + '}')
+
+    def with_recommendations(self, data: Dict, variant: str = DEFAULT_RECOMMENDATION_VARIANT) -> Dict:
+        """
+        Add the recommendation fields to the `data` object of a face shape result
+
+        Args:
+            data: Face shape analysis data
+            variant: 'full' or 'legacy'
+
+        Returns:
+            New dictionary with the per-request and recommendation fields
+        """
+        return dict(data, **self.recommendation_fields(data.get('face_shape'), variant))
+
+    def serialize_data(self, data: Dict, variant: str = DEFAULT_RECOMMENDATION_VARIANT) -> str:
+        """
+        Serialize the `data` object of a face shape result
+
+        The precomputed fragment for its face shape is appended; any static
+        recommendation fields already in `data` are replaced by it.
+
+        Args:
+            data: Face shape analysis data
+            variant: 'full' or 'legacy'
+
+        Returns:
+            JSON object string
+        """
+        dynamic = {key: value for key, value in data.items() if key not in STATIC_FIELDS}
+        return _extend_object(dynamic, self.fragment(data.get('face_shape'), variant))
+
+    def serialize_result(self, result: Dict, variant: str = DEFAULT_RECOMMENDATION_VARIANT) -> str:
+        """
+        Serialize a face shape analysis result
+
+        Args:
+            result: Result from FaceShapeAnalyzer.analyze_face
+            variant: 'full' or 'legacy'
+
+        Returns:
+            JSON string
+        """
+        if not result.get('success') or not isinstance(result.get('data'), dict):
+            return json.dumps(result)
+
+        envelope = {key: value for key, value in result.items() if key != 'data'}
+        return _extend_object(envelope, '"data": ' + self.serialize_data(result['data'], variant))
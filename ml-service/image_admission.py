@@ -0,0 +1,337 @@
+"""
+Image Upload Admission
+Checks the container header of uploaded images while the request body is
+being parsed, so unsupported or oversized images are rejected before the
+rest of the upload is read or any pixels are decoded
+"""
+
+import logging
+import os
+import struct
+from typing import Dict, Optional
+from flask import Request
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+from image_decoding import JPEG_SOF_MARKERS, JPEG_STANDALONE_MARKERS, read_image_header
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted request body on the image endpoints; enforced before parsing
+MAX_UPLOAD_BYTES = int(os.environ.get('FACE_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+# Largest accepted image by decoded pixel count (width * height)
+MAX_IMAGE_PIXELS = int(os.environ.get('FACE_MAX_IMAGE_PIXELS', str(25_000_000)))
+
+SUPPORTED_FORMATS = ('jpeg', 'png', 'webp')
+# Leading bytes holding the PNG IHDR chunk and every WebP chunk header
+SIGNATURE_BYTES = 30
+# Allowance per file for multipart boundaries and part headers in a batch body
+MULTIPART_PART_OVERHEAD = 4096
+
+
+def check_dimensions(header: Dict, max_pixels: int = MAX_IMAGE_PIXELS) -> Dict:
+    """
+    Admit or reject an image by the dimensions in its header
+
+    Args:
+        header: Header dictionary from read_image_header
+        max_pixels: Largest accepted width * height
+
+    Returns:
+        The header, when admitted
+
+    Raises:
+        UnsupportedMediaType: The header reports empty dimensions (415)
+        RequestEntityTooLarge: Image dimensions exceed the pixel limit (413)
+    """
+    pixels = header['width'] * header['height']
+    if header['width'] == 0 or header['height'] == 0:
+        raise UnsupportedMediaType('Image header reports empty dimensions')
+    if pixels > max_pixels:
+        raise RequestEntityTooLarge(
+            f"Image is {header['width']}x{header['height']} "
+            f"({pixels / 1e6:.1f} MP); the maximum is {max_pixels / 1e6:.1f} MP"
+        )
+    return header
+
+
+def check_image_header(data: bytes, complete: bool = True,
+                       max_pixels: int = MAX_IMAGE_PIXELS) -> Optional[Dict]:
+    """
+    Admit or reject an image from its leading bytes
+
+    Args:
+        data: Leading bytes of the image
+        complete: Whether `data` holds the whole file; when False, a missing
+            header means "need more data"
+        max_pixels: Largest accepted width * height
+
+    Returns:
+        Header dictionary from read_image_header when admitted, or None when
+        more data is needed to decide
+
+    Raises:
+        UnsupportedMediaType: Not a readable JPEG, PNG or WebP image (415)
+        RequestEntityTooLarge: Image dimensions exceed the pixel limit (413)
+    """
+    header = read_image_header(data)
+    if header is None:
+        if not complete:
+            return None
+        raise UnsupportedMediaType('Unsupported image format. Upload a JPEG, PNG or WebP image')
+    return check_dimensions(header, max_pixels)
+
+
+class HeaderScanner:
+    """
+    Finds the image header in upload data as it arrives
+
+    JPEG metadata segments (EXIF, XMP, ICC profiles) can precede the frame
+    header by hundreds of kilobytes. The scanner walks the segment lengths
+    and skips their payloads as they stream past, so each chunk is looked
+    at once and only the bytes of an unfinished marker are kept.
+
+    A file with a JPEG, PNG or WebP signature whose dimensions cannot be
+    read this way is left to the decoder rather than rejected.
+    """
+
+    def __init__(self):
+        self.format = None
+        self.header = None
+        self.done = False
+        self._buffer = b''
+        self._skip = 0
+
+    def feed(self, data: bytes) -> bool:
+        """
+        Scan the next chunk of the file
+
+        Args:
+            data: Bytes following those already fed
+
+        Returns:
+            True once scanning is finished
+
+        Raises:
+            UnsupportedMediaType: The signature is not JPEG, PNG or WebP (415)
+        """
+        if self.done:
+            return True
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+        self._buffer += data
+
+        if self.format is None:
+            self._identify(complete=False)
+        if self.format == 'jpeg' and not self.done:
+            self._walk_jpeg()
+        return self.done
+
+    def finish(self) -> None:
+        """
+        Stop scanning at the end of the file
+
+        Raises:
+            UnsupportedMediaType: The file is not a JPEG, PNG or WebP image (415)
+        """
+        if self.format is None:
+            self._identify(complete=True)
+        # A JPEG that ends before its frame header is left to the decoder
+        self._stop(None)
+
+    def _stop(self, header: Optional[Dict]) -> None:
+        if not self.done:
+            self.header = header
+            self.done = True
+            self._buffer = b''
+
+    def _identify(self, complete: bool) -> None:
+        """Recognize the format from the file signature"""
+        data = self._buffer
+        if data[:3] == b'\xff\xd8\xff':
+            self.format = 'jpeg'
+            # Marker segments start after the SOI marker
+            self._buffer = data[2:]
+            return
+        if len(data) < SIGNATURE_BYTES and not complete:
+            return
+
+        header = read_image_header(data)
+        if header is not None:
+            self.format = header['format']
+            self._stop(header)
+        elif data[:8] == b'\x89PNG\r\n\x1a\n' or (data[:4] == b'RIFF' and data[8:12] == b'WEBP'):
+            self.format = 'png' if data[:1] == b'\x89' else 'webp'
+            self._stop(None)
+        else:
+            raise UnsupportedMediaType('Unsupported image format. Upload a JPEG, PNG or WebP image')
+
+    def _walk_jpeg(self) -> None:
+        """Walk the buffered marker segments up to the first start-of-frame"""
+        data = self._buffer
+        offset = 0
+        while len(data) - offset >= 2:
+            if data[offset] != 0xFF:
+                self._stop(None)
+                return
+            marker = data[offset + 1]
+            if marker == 0xFF:
+                # Fill byte before a marker
+                offset += 1
+                continue
+            if marker in JPEG_STANDALONE_MARKERS:
+                offset += 2
+                continue
+            if marker == 0xDA:
+                # Start of scan without a frame header
+                self._stop(None)
+                return
+            if len(data) - offset < 4:
+                break
+
+            if marker in JPEG_SOF_MARKERS:
+                if len(data) - offset < 9:
+                    break
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                self._stop({'format': 'jpeg', 'width': width, 'height': height})
+                return
+
+            end = offset + 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            if end > len(data):
+                # Skip the rest of the payload as it arrives
+                self._skip = end - len(data)
+                offset = len(data)
+                break
+            offset = end
+        self._buffer = data[offset:]
+
+
+class AdmissionFileStream:
+    """
+    File stream that checks the image header as upload data is written
+
+    Wraps the temporary file Werkzeug's form parser writes an upload into.
+    The check runs as soon as the header has been read. If it fails, an
+    HTTP error is raised from inside the parser, so the remaining body is
+    never read.
+
+    For a batch, where one bad image must not fail the others, the error
+    is kept in `rejection` instead (see upload_rejection). The part's
+    remaining bytes are then discarded as the parser reads past them,
+    and so is a part larger than `max_bytes`.
+    """
+
+    def __init__(self, stream, filename: Optional[str] = None, max_pixels: int = MAX_IMAGE_PIXELS,
+                 max_bytes: Optional[int] = None, defer_errors: bool = False):
+        self._stream = stream
+        self._filename = filename
+        self._max_pixels = max_pixels
+        self._max_bytes = max_bytes
+        self._defer_errors = defer_errors
+        self._scanner = HeaderScanner()
+        self._written = 0
+        self.image_header = None
+        self.rejection = None
+
+    def _check(self, data: Optional[bytes]) -> None:
+        """Feed the scanner, or finish it when `data` is None, and check the header once found"""
+        try:
+            if data is None:
+                self._scanner.finish()
+            elif not self._scanner.feed(data):
+                return
+            if self._scanner.header is not None:
+                self.image_header = check_dimensions(self._scanner.header, self._max_pixels)
+        except HTTPException as e:
+            self._reject(e)
+
+    def _reject(self, error: HTTPException) -> None:
+        """Raise an admission error, or keep it and drop the part's data for a batch"""
+        if self._filename:
+            error.description = f'{self._filename}: {error.description}'
+        logger.info(f'Rejected upload before decoding: {error.description}')
+        if not self._defer_errors:
+            raise error
+        self.rejection = error
+        self._stream.seek(0)
+        self._stream.truncate()
+
+    def write(self, data: bytes) -> int:
+        if self.rejection is not None:
+            return len(data)
+        self._written += len(data)
+        if self._max_bytes is not None and self._written > self._max_bytes:
+            self._reject(RequestEntityTooLarge(f'Image is larger than the {self._max_bytes} byte limit'))
+            return len(data)
+        if not self._scanner.done:
+            self._check(data)
+            if self.rejection is not None:
+                return len(data)
+        return self._stream.write(data)
+
+    def seek(self, *args):
+        # The parser rewinds the stream once the part is complete
+        if not self._scanner.done and self.rejection is None:
+            self._check(None)
+        return self._stream.seek(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+
+def upload_rejection(file) -> Optional[HTTPException]:
+    """
+    Get the admission error of one file of a batch upload
+
+    Args:
+        file: FileStorage from request.files
+
+    Returns:
+        The 413 or 415 error the file was rejected with, or None if it was admitted
+    """
+    return getattr(file.stream, 'rejection', None)
+
+
+class ImageAdmissionRequest(Request):
+    """
+    Request class that admits uploads to the image endpoints by their header
+
+    Only endpoints named in `image_endpoints` are held to the upload size
+    limit and have their files checked; other routes, e.g. training
+    endpoints taking JSON, keep the application's own limit, if any.
+
+    Endpoints in `batch_endpoints` take up to `max_batch_files` images.
+    Each file is held to the upload limit on its own, the body to that
+    limit per file, and a rejected file is reported by upload_rejection
+    instead of failing the request.
+    """
+
+    image_endpoints = frozenset()
+    batch_endpoints = frozenset()
+    max_upload_bytes = MAX_UPLOAD_BYTES
+    max_batch_files = 1
+
+    def _is_image_endpoint(self) -> bool:
+        return self.url_rule is not None and self.url_rule.endpoint in self.image_endpoints
+
+    def _is_batch_endpoint(self) -> bool:
+        return self.url_rule is not None and self.url_rule.endpoint in self.batch_endpoints
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        if self._is_batch_endpoint():
+            return (self.max_upload_bytes + MULTIPART_PART_OVERHEAD) * self.max_batch_files
+        if self._is_image_endpoint():
+            return self.max_upload_bytes
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if self._is_batch_endpoint():
+            return AdmissionFileStream(stream, filename, max_bytes=self.max_upload_bytes, defer_errors=True)
+        if not self._is_image_endpoint():
+            return stream
+        return AdmissionFileStream(stream, filename)
@@ -0,0 +1,158 @@
+"""
+Image Decoding Helpers
+Reads image dimensions from container headers and decodes JPEG uploads at
+a reduced resolution when full resolution is not needed
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Longest side the decoded image should stay at or above; 0 always decodes at full resolution
+DEFAULT_DECODE_TARGET_DIM = int(os.environ.get('FACE_DECODE_TARGET_DIM', '1024'))
+
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# JPEG start-of-frame markers carrying the image dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers that are not followed by a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def _read_jpeg_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """Walk JPEG marker segments up to the first SOF and return (width, height)"""
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        if marker == 0xDA:
+            # Start of scan without a frame header
+            return None
+
+        segment_length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + segment_length
+
+    return None
+
+
+def _read_png_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from the PNG IHDR chunk"""
+    if len(data) < 24 or data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def _read_webp_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a VP8, VP8L or VP8X WebP chunk"""
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def read_image_header(data: bytes) -> Optional[Dict]:
+    """
+    Identify an image and read its dimensions without decoding pixels
+
+    Args:
+        data: Leading bytes of the image file (the full file is not required)
+
+    Returns:
+        Dictionary with `format`, `width` and `height`, or None when the
+        container is not a recognised JPEG, PNG or WebP header
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        image_format, size = 'jpeg', _read_jpeg_header(data)
+    elif data[:8] == b'\x89PNG\r\n\x1a\n':
+        image_format, size = 'png', _read_png_header(data)
+    elif data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        image_format, size = 'webp', _read_webp_header(data)
+    else:
+        return None
+
+    if size is None:
+        return None
+
+    return {
+        'format': image_format,
+        'width': int(size[0]),
+        'height': int(size[1])
+    }
+
+
+def choose_reduction_factor(width: int, height: int, target_max_dim: int = DEFAULT_DECODE_TARGET_DIM) -> int:
+    """
+    Pick the largest JPEG decode reduction that keeps the image at or above the target size
+
+    Args:
+        width: Full-resolution width
+        height: Full-resolution height
+        target_max_dim: Desired minimum for the decoded longest side; 0 disables reduction
+
+    Returns:
+        Reduction factor: 1, 2, 4 or 8
+    """
+    if not target_max_dim:
+        return 1
+
+    longest_side = max(width, height)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if longest_side // candidate >= target_max_dim:
+            factor = candidate
+    return factor
+
+
+def decode_image(data: bytes, target_max_dim: int = DEFAULT_DECODE_TARGET_DIM) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Decode an uploaded image, using libjpeg's reduced-size decoding for large JPEGs
+
+    Args:
+        data: Raw uploaded file contents
+        target_max_dim: Desired minimum for the decoded longest side
+
+    Returns:
+        Tuple of (BGR image or None, reduction factor). Multiply decoded
+        pixel coordinates by the factor to get original-image coordinates.
+    """
+    header = read_image_header(data)
+    factor = 1
+    if header is not None and header['format'] == 'jpeg':
+        factor = choose_reduction_factor(header['width'], header['height'], target_max_dim)
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_DECODE_FLAGS[factor])
+    if image is not None and factor > 1:
+        logger.info(f"Decoded {header['width']}x{header['height']} JPEG at 1/{factor} resolution")
+
+    return image, factor
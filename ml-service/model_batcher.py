@@ -0,0 +1,145 @@
+"""
+Dynamic Micro-Batching
+Gathers concurrent single-item model inputs into one batched predict call
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('FACE_MODEL_MAX_BATCH_SIZE', '8'))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('FACE_MODEL_MAX_WAIT_MS', '5'))
+
+
+class MicroBatcher:
+    """
+    Collects inputs submitted from many threads and runs them as one batch
+
+    A background thread waits for the first input, then keeps collecting
+    until either `max_batch_size` inputs are queued or `max_wait_ms` has
+    passed, stacks them into one tensor and calls `predict_fn` once. Each
+    caller receives its own row of the output.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 name: str = 'model'):
+        """
+        Initialize the batcher
+
+        Args:
+            predict_fn: Function mapping a batch array to an output array with
+                one row per input
+            max_batch_size: Maximum number of inputs per predict call
+            max_wait_ms: Maximum time to wait for more inputs after the first
+            name: Name used for the worker thread and log messages
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self.batch_size_histogram = Counter()
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f'{name}-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item: np.ndarray) -> Future:
+        """
+        Queue one model input
+
+        Args:
+            item: Single input without the batch dimension
+
+        Returns:
+            Future resolving to the matching output row
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item: np.ndarray) -> np.ndarray:
+        """
+        Run one model input through the batcher and wait for its output
+
+        Args:
+            item: Single input without the batch dimension
+
+        Returns:
+            Output row for the input
+        """
+        return self.submit(item).result()
+
+    def _collect_batch(self):
+        """Block for the first input, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        """Worker loop running batched predictions"""
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            with self._stats_lock:
+                self.batch_size_histogram[len(batch)] += 1
+
+            try:
+                outputs = np.asarray(self.predict_fn(np.stack(items)))
+                if len(outputs) != len(futures):
+                    raise ValueError(
+                        f'{self.name} returned {len(outputs)} outputs for a batch of {len(futures)}'
+                    )
+            except Exception as e:
+                logger.warning(f'Batched {self.name} prediction failed: {str(e)}')
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
+
+    def stats(self) -> Dict:
+        """
+        Get batching settings and the histogram of achieved batch sizes
+
+        Returns:
+            Dictionary with settings, totals and histogram
+        """
+        with self._stats_lock:
+            histogram = dict(sorted(self.batch_size_histogram.items()))
+
+        batches = sum(histogram.values())
+        items = sum(size * count for size, count in histogram.items())
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'batches': batches,
+            'items': items,
+            'mean_batch_size': round(items / batches, 2) if batches else 0.0,
+            'batch_size_histogram': {str(size): count for size, count in histogram.items()}
+        }
@@ -0,0 +1,284 @@
+"""
+Model Registry
+Loads each trained model artifact from disk once and serves it from memory
+
+Health and readiness probes read the registry's cached status instead of
+touching the pickle files. An artifact that is missing or fails to load
+is remembered as such and only retried after a backoff, so requests for
+an untrained model do not hit the disk every time. A loaded artifact is
+checked for newer files by get() at most once per check interval, so a
+model retrained by another process is picked up without a restart.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry of a missing artifact; doubles on every failure
+MODEL_RETRY_BACKOFF_SECONDS = float(os.environ.get('MODEL_RETRY_BACKOFF_SECONDS', '30'))
+MODEL_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get('MODEL_RETRY_BACKOFF_MAX_SECONDS', '600'))
+# Seconds between checks of a loaded artifact's file times; 0 disables the check
+MODEL_CHECK_INTERVAL_SECONDS = float(os.environ.get('MODEL_CHECK_INTERVAL_SECONDS', '10'))
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    """UTC ISO 8601 time of a Unix timestamp"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds')
+
+
+class ModelArtifact:
+    """
+    One model made of one or more pickle files
+
+    States are `not_loaded`, `loaded`, `missing` (a file does not exist)
+    and `failed` (a file exists but could not be loaded).
+    """
+
+    def __init__(self, name: str, paths: Sequence[str], build: Optional[Callable[..., Any]] = None,
+                 optional_paths: Sequence[str] = ()):
+        """
+        Describe an artifact; nothing is loaded yet
+
+        Args:
+            name: Registry name, e.g. 'revenue'
+            paths: Pickle files, loaded in order
+            build: Called with the loaded objects to build the served value;
+                by default the value is the tuple of loaded objects, or the
+                object itself for a single file
+            optional_paths: Pickle files loaded after `paths` if they exist;
+                None is passed in place of a missing one
+        """
+        self.name = name
+        self.paths = tuple(paths)
+        self.optional_paths = tuple(optional_paths)
+        self.build = build
+        self.state = 'not_loaded'
+        self.value = None
+        self.version = None
+        self.loaded_at = None
+        self.file_mtimes = {}
+        self.error = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.checked_at = 0.0
+
+    def _read(self) -> Tuple[Any, str, Dict[str, float]]:
+        """Load the files and build the value; raises if a file is missing or broken"""
+        digest = hashlib.sha256()
+        objects = []
+        mtimes = {}
+        for path in self.paths:
+            mtimes[path] = os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            objects.append(joblib.load(path))
+        for path in self.optional_paths:
+            if not os.path.exists(path):
+                objects.append(None)
+                continue
+            mtimes[path] = os.path.getmtime(path)
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            objects.append(joblib.load(path))
+        value = self.build(*objects) if self.build else (objects[0] if len(objects) == 1 else tuple(objects))
+        return value, digest.hexdigest()[:12], mtimes
+
+    def load(self) -> None:
+        """Load the files and build the value, recording the outcome"""
+        try:
+            value, version, mtimes = self._read()
+        except FileNotFoundError as e:
+            self._fail('missing', e)
+            return
+        except Exception as e:
+            self._fail('failed', e)
+            return
+
+        self.store(value, version, mtimes)
+        logger.info(f"Loaded {self.name} model, version {self.version}")
+
+    def files_changed(self) -> bool:
+        """Whether a file was replaced, added or removed since the value was loaded; one stat per file"""
+        for path in self.paths + self.optional_paths:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self.file_mtimes.get(path):
+                return True
+        return False
+
+    def refresh(self) -> bool:
+        """
+        Load the files again if they changed since the value was loaded
+
+        The current value keeps being served if the new files cannot be
+        loaded, e.g. while training is still writing them; they are tried
+        again at the next check.
+
+        Returns:
+            True if a new value was loaded
+        """
+        self.checked_at = time.monotonic()
+        if not self.files_changed():
+            return False
+        try:
+            value, version, mtimes = self._read()
+        except Exception as e:
+            logger.warning(f"Keeping {self.name} model version {self.version}; its new files did not load: {e}")
+            return False
+
+        self.store(value, version, mtimes)
+        logger.info(f"Reloaded {self.name} model after its files changed, version {self.version}")
+        return True
+
+    def store(self, value: Any, version: str, file_mtimes: Dict[str, float]) -> None:
+        """Serve a value, e.g. one just trained and saved"""
+        self.value = value
+        self.version = version
+        self.file_mtimes = file_mtimes
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+        self.state = 'loaded'
+        self.error = None
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def _fail(self, state: str, error: Exception) -> None:
+        self.state = state
+        self.value = None
+        self.error = str(error)
+        self.failures += 1
+        backoff = min(MODEL_RETRY_BACKOFF_SECONDS * 2 ** (self.failures - 1), MODEL_RETRY_BACKOFF_MAX_SECONDS)
+        self.retry_at = time.monotonic() + backoff
+        log = logger.warning if state == 'missing' else logger.error
+        log(f"{self.name} model {state}: {error}. Retrying in {backoff:.0f}s")
+
+    def status(self) -> Dict:
+        """Cached load status; does not touch the files"""
+        retry_in = None
+        if self.state in ('missing', 'failed'):
+            retry_in = round(max(0.0, self.retry_at - time.monotonic()), 1)
+        return {
+            'state': self.state,
+            'version': self.version,
+            'loaded_at': _isoformat(self.loaded_at),
+            'file_mtimes': {os.path.basename(path): _isoformat(mtime) for path, mtime in self.file_mtimes.items()},
+            'error': self.error,
+            'retry_in_seconds': retry_in
+        }
+
+
+class ModelRegistry:
+    """
+    Trained models shared by all requests of a worker process
+
+    get() returns the in-memory model, checking its file times at most
+    once per check interval and reloading it when they changed. A missing
+    or broken artifact is retried by get() at most once per backoff
+    period, which doubles after every failure.
+    """
+
+    def __init__(self, check_interval: float = MODEL_CHECK_INTERVAL_SECONDS):
+        """
+        Initialize an empty registry
+
+        Args:
+            check_interval: Seconds between file time checks of a loaded
+                artifact; 0 never checks, so new files need reload()
+        """
+        self.check_interval = check_interval
+        self._artifacts: Dict[str, ModelArtifact] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, paths: Sequence[str], build: Optional[Callable[..., Any]] = None,
+                 optional_paths: Sequence[str] = ()) -> None:
+        """
+        Register an artifact and load it
+
+        Args:
+            name: Registry name
+            paths: Pickle files making up the model
+            build: Builds the served value from the loaded objects
+            optional_paths: Pickle files passed as None when missing
+        """
+        artifact = ModelArtifact(name, paths, build, optional_paths)
+        artifact.load()
+        with self._lock:
+            self._artifacts[name] = artifact
+
+    def get(self, name: str) -> Any:
+        """
+        Get a loaded model
+
+        Args:
+            name: Registry name
+
+        Returns:
+            The model, or None if it is not available
+        """
+        artifact = self._artifacts[name]
+        if artifact.state == 'loaded':
+            if self.check_interval and time.monotonic() - artifact.checked_at >= self.check_interval:
+                with self._lock:
+                    # Another request may have checked while this one waited
+                    if time.monotonic() - artifact.checked_at >= self.check_interval:
+                        artifact.refresh()
+            return artifact.value
+        if time.monotonic() < artifact.retry_at:
+            return None
+        with self._lock:
+            # Another request may have retried while this one waited
+            if artifact.state != 'loaded' and time.monotonic() >= artifact.retry_at:
+                artifact.load()
+        return artifact.value
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether a model is loaded, without retrying a missing one"""
+        return self._artifacts[name].state == 'loaded'
+
+    def reload(self, name: str) -> bool:
+        """
+        Load an artifact from disk again, e.g. after training saved new files
+
+        Returns:
+            True if the model is now loaded
+        """
+        artifact = self._artifacts[name]
+        with self._lock:
+            artifact.load()
+        return artifact.state == 'loaded'
+
+    def status(self) -> Dict[str, Dict]:
+        """Cached status of every artifact"""
+        with self._lock:
+            return {name: artifact.status() for name, artifact in self._artifacts.items()}
+
+
+# Singleton instance
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get singleton instance of ModelRegistry
+
+    Returns:
+        ModelRegistry instance
+    """
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+    return _model_registry
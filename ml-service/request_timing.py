@@ -0,0 +1,136 @@
+"""
+Request Stage Timing
+Records how long each stage of a face analysis request takes, for the
+Server-Timing response header and the optional debug timing in the body
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+
+# Emit the Server-Timing header on face analysis responses
+SERVER_TIMING_ENABLED = os.environ.get('FACE_SERVER_TIMING', '1') == '1'
+
+# Shared no-op returned by stage() when the request is not being timed
+_NO_STAGE = contextlib.nullcontext()
+
+
+class StageTimings:
+    """
+    Durations of the named stages of one request
+
+    A stage that runs more than once, e.g. detection for every image of a
+    batch, accumulates into one entry. Stages may be recorded from worker
+    threads that run in a copy of the request's context.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration_ms: float) -> None:
+        """Add time to a stage"""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+
+    def total_ms(self) -> float:
+        """Milliseconds since timing started"""
+        return (time.perf_counter() - self.started_at) * 1000.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, in the order they first ran, plus the total"""
+        with self._lock:
+            timings = {name: round(duration, 3) for name, duration in self.stages.items()}
+        timings['total'] = round(self.total_ms(), 3)
+        return timings
+
+    def server_timing_header(self) -> str:
+        """Format the durations as a Server-Timing header value"""
+        return ', '.join(f'{name};dur={duration:.2f}' for name, duration in self.as_dict().items())
+
+
+class _Stage:
+    """Context manager adding its elapsed time to a stage"""
+
+    __slots__ = ('_timings', '_name', '_start')
+
+    def __init__(self, timings: StageTimings, name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._timings.add(self._name, (time.perf_counter() - self._start) * 1000.0)
+        return False
+
+
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar('face_request_timings', default=None)
+
+
+def stage(name: str):
+    """
+    Time a block as a named stage of the current request
+
+    Usage:
+        with stage('decode'):
+            ...
+
+    Outside a timed request this returns a shared no-op context manager,
+    so instrumented code costs one context variable lookup.
+
+    Args:
+        name: Stage name; a Server-Timing metric name, so no spaces
+
+    Returns:
+        Context manager
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, name)
+
+
+def start_timing() -> Token:
+    """
+    Start timing stages in the current context
+
+    Returns:
+        Token to pass to stop_timing
+    """
+    return _current_timings.set(StageTimings())
+
+
+def stop_timing(token: Token) -> None:
+    """Stop timing stages in the current context"""
+    _current_timings.reset(token)
+
+
+def current_timings() -> Optional[StageTimings]:
+    """Timings of the current request, or None when it is not being timed"""
+    return _current_timings.get()
+
+
+def append_timing(body: str, timings: StageTimings) -> str:
+    """
+    Add a `timing` member to a serialized JSON object
+
+    Args:
+        body: Serialized JSON object
+        timings: Timings to add
+
+    Returns:
+        JSON string
+    """
+    body = body.rstrip()
+    if not body.endswith('}'):
+        return body
+    separator = '' if body[:-1].rstrip().endswith('{') else ', '
+    return body[:-1] + separator + '"timing": ' + json.dumps(timings.as_dict()) + '}'
@@ -0,0 +1,157 @@
+"""
+Service Metrics
+Prometheus metrics for the ML service: HTTP traffic, processed images,
+model inference latency, cache hit rates and process memory
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so
+every worker writes its samples to shared files and /metrics aggregates
+all workers, whichever one serves the scrape.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, multiprocess
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+# Minimum seconds between RSS samples of one process
+RSS_SAMPLE_INTERVAL_SECONDS = 5.0
+
+# Request latency buckets in seconds, from cached responses to 12 MP uploads
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Model latency buckets in seconds, from small sklearn models to CNN batches
+MODEL_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUESTS = Counter(
+    'ml_service_http_requests_total', 'HTTP requests handled', ['route', 'method', 'status']
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'ml_service_http_request_duration_seconds', 'Time to produce an HTTP response', ['route', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'ml_service_http_requests_in_flight', 'HTTP requests being handled', ['route'],
+    multiprocess_mode='livesum'
+)
+IMAGE_BYTES = Counter(
+    'ml_service_image_bytes_processed_total', 'Encoded image bytes decoded for analysis', ['source']
+)
+IMAGE_PIXELS = Counter(
+    'ml_service_image_pixels_processed_total', 'Decoded image pixels analyzed', ['source']
+)
+MODEL_INFERENCE_DURATION = Histogram(
+    'ml_service_model_inference_seconds', 'Model inference latency', ['model'],
+    buckets=MODEL_LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'ml_service_cache_requests_total', 'Cache lookups by outcome', ['cache', 'result']
+)
+COALESCED_REQUESTS = Counter(
+    'ml_service_coalesced_requests_total', 'Requests that shared a computation already in progress', ['group']
+)
+PROCESS_RSS = Gauge(
+    'ml_service_process_resident_memory_bytes', 'Resident set size of each worker process',
+    multiprocess_mode='liveall'
+)
+
+_last_rss_sample = 0.0
+
+
+def observe_image(source: str, num_bytes: int, image) -> None:
+    """
+    Count an image decoded for analysis
+
+    Args:
+        source: Where the image came from, e.g. 'upload', 'batch' or 'stream'
+        num_bytes: Size of the encoded image
+        image: Decoded image array, or None if decoding failed
+    """
+    IMAGE_BYTES.labels(source=source).inc(num_bytes)
+    if image is not None:
+        IMAGE_PIXELS.labels(source=source).inc(image.shape[0] * image.shape[1])
+
+
+def time_model_inference(model: str):
+    """
+    Time a model call
+
+    Usage:
+        with time_model_inference('revenue'):
+            model.predict(X)
+
+    Args:
+        model: Model name: 'revenue', 'addon', 'expense' or 'face_shape'
+
+    Returns:
+        Context manager
+    """
+    return MODEL_INFERENCE_DURATION.labels(model=model).time()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """
+    Count a cache lookup
+
+    Args:
+        cache: Cache name
+        hit: Whether the lookup was served from the cache
+    """
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_coalesced_request(group: str) -> None:
+    """
+    Count a request that waited on an identical computation instead of running its own
+
+    Args:
+        group: Coalescing group name
+    """
+    COALESCED_REQUESTS.labels(group=group).inc()
+
+
+def _read_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def sample_process_rss(force: bool = False) -> None:
+    """
+    Update this process's RSS gauge, at most every RSS_SAMPLE_INTERVAL_SECONDS
+
+    Args:
+        force: Sample even if the interval has not passed
+    """
+    global _last_rss_sample
+    now = time.monotonic()
+    if not force and now - _last_rss_sample < RSS_SAMPLE_INTERVAL_SECONDS:
+        return
+    _last_rss_sample = now
+    rss = _read_rss_bytes()
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text format
+
+    Returns:
+        Tuple of (body bytes, content type)
+    """
+    sample_process_rss(force=True)
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        # The default registry also has the client's process and platform collectors
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
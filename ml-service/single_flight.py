@@ -0,0 +1,91 @@
+"""
+Request Coalescing
+Lets concurrent requests for the same work wait on one computation and
+share its result, so client retries of a slow analysis cost no extra CPU
+"""
+
+import copy
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+from service_metrics import record_coalesced_request
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One computation in progress and the requests waiting on it"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time
+
+    The first request for a key computes; requests arriving while it runs
+    wait for it and get a copy of its result, or its exception. Nothing is
+    kept once the computation finishes, so later requests compute again,
+    or hit the analysis cache.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the group
+
+        Args:
+            name: Name used in logs and metrics, e.g. 'analysis'
+        """
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Compute the value for a key, or wait for the computation already running
+
+        Args:
+            key: Identifies the work, e.g. an analysis cache key
+            compute: Function producing the value
+
+        Returns:
+            Tuple of (value, whether it was shared from another request)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            record_coalesced_request(self.name)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result), True
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            if flight.waiters:
+                logger.info(f"Shared one {self.name} computation with {flight.waiters} waiting request(s)")
+        return flight.result, False
+
+    def in_flight(self) -> int:
+        """Number of computations running"""
+        with self._lock:
+            return len(self._flights)
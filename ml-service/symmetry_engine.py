@@ -0,0 +1,215 @@
+"""
+Mirror Symmetry Engine
+Scores facial asymmetry per region by aligning the face on its eye axis,
+mirroring it and comparing the two halves pixel by pixel
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Side of the square, eye-aligned face crop at the finest pyramid level
+ALIGNED_FACE_SIZE = 128
+# Number of pyramid levels, each half the size of the previous one; pick it
+# against the latency budget with benchmark_symmetry_engine.py
+DEFAULT_PYRAMID_LEVELS = int(os.environ.get('FACE_SYMMETRY_PYRAMID_LEVELS', '3'))
+
+# Horizontal bands of the aligned crop as fractions of its height
+REGIONS = (
+    ('forehead', 0.05, 0.30),
+    ('eye', 0.30, 0.48),
+    ('cheek', 0.48, 0.72),
+    ('jaw', 0.72, 0.95),
+)
+# Eye line and inter-eye distance in the aligned crop, as fractions of its size
+ALIGNED_EYE_Y = 0.39
+ALIGNED_EYE_DISTANCE = 0.42
+# Blur sigma, as a fraction of the crop size, of the illumination removed before comparing
+ILLUMINATION_SIGMA = 0.08
+# Eye pairs tilted more than this are treated as false detections and ignored
+MAX_EYE_TILT_DEGREES = 20.0
+
+
+class MirrorSymmetryEngine:
+    """
+    Pixel-level mirror symmetry scoring
+
+    The face is warped into a small canonical crop with the eyes level and
+    the midline centred, using one affine warp. Slow illumination changes
+    are removed with a high-pass filter so side lighting is not reported as
+    asymmetry. Each pyramid level compares the crop with its mirror image.
+    Per-region scores are row-band means of the normalized difference map,
+    computed for all regions at once, and averaged over the pyramid levels.
+
+    The number of levels is a fixed setting rather than measured at
+    startup, so every process, whatever its load when it started, gives
+    an image the same scores.
+    """
+
+    def __init__(self, levels: int = DEFAULT_PYRAMID_LEVELS, face_size: int = ALIGNED_FACE_SIZE):
+        """
+        Initialize the engine
+
+        Args:
+            levels: Number of pyramid levels
+            face_size: Side of the aligned crop at the finest level
+        """
+        self.levels = max(1, levels)
+        self.face_size = face_size
+        self.region_names = [name for name, _, _ in REGIONS]
+        self._band_starts = {}
+        logger.info(f"Mirror symmetry engine using {self.levels} pyramid levels")
+
+    @property
+    def version(self) -> str:
+        """Settings that change the scores"""
+        return f'mirror-{self.face_size}-{self.levels}'
+
+    @staticmethod
+    def eyes_usable(eye_centers: Optional[Sequence[Tuple[float, float]]],
+                    face_box: Tuple[int, int, int, int]) -> bool:
+        """Whether an eye pair is plausible enough to align on"""
+        if eye_centers is None or len(eye_centers) != 2:
+            return False
+        (lx, ly), (rx, ry) = eye_centers
+        dx, dy = rx - lx, ry - ly
+        if dx <= 0 or abs(np.degrees(np.arctan2(dy, dx))) > MAX_EYE_TILT_DEGREES:
+            return False
+        # Haar eye pairs are roughly a third to two thirds of the face width apart
+        return 0.2 * face_box[2] <= np.hypot(dx, dy) <= 0.8 * face_box[2]
+
+    def align_face(self, gray: np.ndarray, face_box: Tuple[int, int, int, int],
+                   eye_centers: Optional[Sequence[Tuple[float, float]]] = None) -> Tuple[np.ndarray, float]:
+        """
+        Warp the face into the canonical crop
+
+        Args:
+            gray: Grayscale image
+            face_box: Face box (x, y, w, h)
+            eye_centers: Left and right eye centers in image coordinates, if
+                detected; implausible pairs fall back to the face box
+
+        Returns:
+            Tuple of (float32 crop of size face_size, eye axis angle in degrees)
+        """
+        size = self.face_size
+        x, y, w, h = face_box
+
+        if self.eyes_usable(eye_centers, face_box):
+            (lx, ly), (rx, ry) = eye_centers
+            dx, dy = rx - lx, ry - ly
+            angle = float(np.degrees(np.arctan2(dy, dx)))
+            eye_distance = float(np.hypot(dx, dy))
+            scale = ALIGNED_EYE_DISTANCE * size / eye_distance
+            center = ((lx + rx) / 2.0, (ly + ry) / 2.0)
+            target = ((size - 1) / 2.0, ALIGNED_EYE_Y * size)
+        else:
+            angle = 0.0
+            scale = size / float(max(w, h))
+            center = (x + (w - 1) / 2.0, y + (h - 1) / 2.0)
+            target = ((size - 1) / 2.0, (size - 1) / 2.0)
+
+        # Shrink a padded face region with area averaging first, so the warp
+        # itself never downsamples by more than the rounding error
+        pad = int(0.25 * max(w, h))
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(gray.shape[1], x + w + pad), min(gray.shape[0], y + h + pad)
+        region = gray[y0:y1, x0:x1]
+        center = (center[0] - x0, center[1] - y0)
+        if scale < 1.0:
+            region = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            center = ((center[0] + 0.5) * scale - 0.5, (center[1] + 0.5) * scale - 0.5)
+            scale = 1.0
+
+        # Rotate about the eye midpoint, scale, then move it to its canonical spot;
+        # pixel centres are used so the midline lands exactly on the mirror axis
+        matrix = cv2.getRotationMatrix2D(center, angle, scale)
+        matrix[0, 2] += target[0] - center[0]
+        matrix[1, 2] += target[1] - center[1]
+        crop = cv2.warpAffine(region, matrix, (size, size), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return crop.astype(np.float32), angle
+
+    def _band_bounds(self, height: int) -> np.ndarray:
+        """Row index where each region starts and ends for a crop height"""
+        bounds = self._band_starts.get(height)
+        if bounds is None:
+            bounds = np.array([[int(round(top * height)), max(int(round(bottom * height)), int(round(top * height)) + 1)]
+                               for _, top, bottom in REGIONS])
+            self._band_starts[height] = bounds
+        return bounds
+
+    def score_level(self, crop: np.ndarray) -> np.ndarray:
+        """
+        Region scores for one pyramid level
+
+        Args:
+            crop: float32 aligned face crop
+
+        Returns:
+            Array with one score per region; 0 is perfectly symmetric
+        """
+        size = crop.shape[0]
+        sigma = max(1.0, ILLUMINATION_SIGMA * size)
+        detail = crop - cv2.GaussianBlur(crop, (0, 0), sigma)
+        mirrored = detail[:, ::-1]
+
+        # Only one half is needed: the other half is the same difference mirrored
+        half = size // 2
+        difference = np.abs(detail[:, :half] - mirrored[:, :half])
+        magnitude = np.abs(detail[:, :half]) + np.abs(mirrored[:, :half])
+
+        row_difference = difference.sum(axis=1)
+        row_magnitude = magnitude.sum(axis=1)
+        cumulative_difference = np.concatenate(([0.0], np.cumsum(row_difference)))
+        cumulative_magnitude = np.concatenate(([0.0], np.cumsum(row_magnitude)))
+
+        bounds = self._band_bounds(size)
+        band_difference = cumulative_difference[bounds[:, 1]] - cumulative_difference[bounds[:, 0]]
+        band_magnitude = cumulative_magnitude[bounds[:, 1]] - cumulative_magnitude[bounds[:, 0]]
+        return 100.0 * band_difference / np.maximum(band_magnitude, 1e-6)
+
+    def analyze(self, gray: np.ndarray, face_box: Tuple[int, int, int, int],
+                eye_centers: Optional[Sequence[Tuple[float, float]]] = None) -> Dict:
+        """
+        Score asymmetry for each facial region
+
+        Args:
+            gray: Grayscale image
+            face_box: Face box (x, y, w, h)
+            eye_centers: Left and right eye centers in image coordinates, if detected
+
+        Returns:
+            Dictionary with per-region `asymmetry_scores`, whether the crop was
+            `eye_aligned`, the `eye_angle` in degrees, the number of pyramid
+            `levels_used` and `elapsed_ms`
+        """
+        start = time.perf_counter()
+        scores, angle = self._score(gray, face_box, eye_centers, self.levels)
+        return {
+            'asymmetry_scores': {name: float(score) for name, score in zip(self.region_names, scores)},
+            'eye_aligned': self.eyes_usable(eye_centers, face_box),
+            'eye_angle': angle,
+            'levels_used': self.levels,
+            'elapsed_ms': (time.perf_counter() - start) * 1000.0
+        }
+
+    def _score(self, gray: np.ndarray, face_box: Tuple[int, int, int, int],
+               eye_centers: Optional[Sequence[Tuple[float, float]]], levels: int) -> Tuple[np.ndarray, float]:
+        """Region scores averaged over `levels` pyramid levels, and the eye axis angle"""
+        crop, angle = self.align_face(gray, face_box, eye_centers)
+
+        pyramid = [crop]
+        for _ in range(levels - 1):
+            # 2x2 area averaging keeps the mirror axis centred; pyrDown samples
+            # even pixels and would shift it by half a pixel
+            pyramid.append(cv2.resize(pyramid[-1], None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
+
+        # Coarse levels are the least sensitive to small misalignment, fine
+        # levels to small features; averaging weighs every scale equally
+        level_scores = np.stack([self.score_level(level) for level in pyramid])
+        return level_scores.mean(axis=0), angle
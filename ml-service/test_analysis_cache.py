@@ -0,0 +1,77 @@
+"""
+Unit tests for the face analysis result cache
+"""
+
+import time
+from analysis_cache import AnalysisCache
+
+RESULT = {'success': True, 'data': {'face_shape': 'Oval'}}
+
+
+def test_cache_hits_and_misses():
+    """Cached results should be returned as copies and counted"""
+    cache = AnalysisCache(max_entries=4, ttl_seconds=60)
+    key = cache.make_key(cache.content_hash(b'image'), 'face_shape', '1.0')
+
+    assert cache.get(key) is None
+    cache.set(key, RESULT)
+
+    cached = cache.get(key)
+    assert cached == RESULT
+    cached['data']['face_shape'] = 'Round'
+    assert cache.get(key) == RESULT
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """The least recently used entry should be evicted when full"""
+    cache = AnalysisCache(max_entries=2, ttl_seconds=60)
+    keys = [cache.make_key(cache.content_hash(bytes([i])), 'face_shape', '1.0') for i in range(3)]
+
+    cache.set(keys[0], RESULT)
+    cache.set(keys[1], RESULT)
+    cache.get(keys[0])
+    cache.set(keys[2], RESULT)
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_cache_expires_entries():
+    """Entries older than the TTL should be treated as misses"""
+    cache = AnalysisCache(max_entries=2, ttl_seconds=0.01)
+    key = cache.make_key(cache.content_hash(b'image'), 'face_shape', '1.0')
+
+    cache.set(key, RESULT)
+    time.sleep(0.02)
+
+    assert cache.get(key) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_invalidates_by_analyzer_and_version():
+    """Invalidation should only drop the requested analyzer, and versions should not collide"""
+    cache = AnalysisCache(max_entries=4, ttl_seconds=60)
+    content_hash = cache.content_hash(b'image')
+    shape_key = cache.make_key(content_hash, 'face_shape', '1.0')
+    symmetry_key = cache.make_key(content_hash, 'face_symmetry', '1.0')
+
+    cache.set(shape_key, RESULT)
+    cache.set(symmetry_key, RESULT)
+
+    assert cache.get(cache.make_key(content_hash, 'face_shape', '2.0')) is None
+    assert cache.invalidate(['face_shape']) == 1
+    assert cache.get(shape_key) is None
+    assert cache.get(symmetry_key) is not None
+
+
+if __name__ == "__main__":
+    test_cache_hits_and_misses()
+    test_cache_evicts_least_recently_used()
+    test_cache_expires_entries()
+    test_cache_invalidates_by_analyzer_and_version()
+    print("All tests passed!")
@@ -0,0 +1,118 @@
+"""
+Tests for the ASGI front end
+"""
+
+import asyncio
+import struct
+import threading
+import zlib
+from flask import Flask, Response, request
+from asgi_adapter import ASGIAdapter
+from image_admission import ImageAdmissionRequest
+
+
+def make_app(max_content_length=1000):
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = max_content_length
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return {'size': len(request.get_data()), 'thread': threading.current_thread().name,
+                'query': request.args.get('q')}
+
+    @app.route('/analyze-face-shape', methods=['POST'])
+    def analyze():
+        return {'thread': threading.current_thread().name}
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{i}\n' for i in range(3)), mimetype='text/plain')
+
+    return app
+
+
+def call(adapter, method, path, chunks=(b'',), query=b'', headers=(), messages=None):
+    """Send a request through the adapter; returns (status, headers, body)"""
+    if messages is None:
+        messages = []
+    messages.extend({'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                    for i, chunk in enumerate(chunks))
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0)
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': list(headers),
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+    asyncio.run(adapter(scope, receive, send))
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return sent[0]['status'], dict(sent[0]['headers']), body
+
+
+def test_body_is_buffered_and_routed_to_pools():
+    """Chunked bodies should arrive whole, on the pool matching the route"""
+    adapter = ASGIAdapter(make_app(), analysis_threads=1, request_threads=1)
+
+    status, _, body = call(adapter, 'POST', '/echo', [b'a' * 100, b'b' * 50, b''], query=b'q=1')
+    assert status == 200
+    assert b'"size":150' in body
+    assert b'asgi-request' in body
+    assert b'"query":"1"' in body
+
+    status, _, body = call(adapter, 'POST', '/analyze-face-shape', [b'x'])
+    assert b'asgi-analysis' in body
+
+
+def test_oversized_body_and_streamed_response():
+    """Bodies over the limit should get Flask's 413; generators should stream"""
+    adapter = ASGIAdapter(make_app(), max_body_bytes=1000)
+
+    status, _, _ = call(adapter, 'POST', '/echo', [b'a' * 600] * 4, headers=[(b'content-length', b'2400')])
+    assert status == 413
+
+    status, headers, body = call(adapter, 'GET', '/stream')
+    assert status == 200
+    assert body == b'0\n1\n2\n'
+
+
+def test_body_past_the_buffer_limit_is_streamed_to_routes_without_a_limit():
+    """A route with no upload limit should get the whole body, not the buffered part"""
+    adapter = ASGIAdapter(make_app(max_content_length=None), max_body_bytes=1000)
+
+    status, _, body = call(adapter, 'POST', '/echo', [b'a' * 600] * 4)
+    assert status == 200
+    assert b'"size":2400' in body
+
+
+def test_rejected_upload_is_received_before_admission():
+    """Known cost of buffering: an image refused by its header is still read up to the limit"""
+    app = Flask(__name__)
+    app.request_class = type('Request', (ImageAdmissionRequest,), {'image_endpoints': frozenset({'upload'})})
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        return {'files': len(request.files)}
+
+    ihdr = struct.pack('>IIBBBBB', 20000, 20000, 8, 2, 0, 0, 0)
+    png = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    head = (b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+            b'Content-Type: image/png\r\n\r\n' + png)
+    chunks = [head] + [b'\0' * 1000] * 5 + [b'\r\n--b--\r\n']
+    messages = []
+
+    status, _, _ = call(ASGIAdapter(app), 'POST', '/upload', chunks, messages=messages,
+                        headers=[(b'content-type', b'multipart/form-data; boundary=b')])
+    assert status == 413
+    assert messages == []
+
+
+if __name__ == "__main__":
+    test_body_is_buffered_and_routed_to_pools()
+    test_oversized_body_and_streamed_response()
+    test_body_past_the_buffer_limit_is_streamed_to_routes_without_a_limit()
+    test_rejected_upload_is_received_before_admission()
+    print("✓ All ASGI adapter tests passed")
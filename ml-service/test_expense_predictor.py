@@ -178,6 +178,80 @@ def test_prediction():
     # Check that prediction is reasonable (positive)
     assert result['prediction'] >= 0
 
+def test_prediction_interval_from_training_residuals():
+    """Test that the interval comes from saved residual quantiles with a single model call"""
+    predictor = ExpensePredictor()
+    predictor.train(SAMPLE_EXPENSES.to_dict('records'))
+    
+    interval = predictor.metadata['prediction_interval']
+    assert interval['lower_offset'] <= 0 <= interval['upper_offset']
+    assert interval['n_residuals'] > 0
+    assert os.path.exists('expense_model_metadata.pkl')
+    
+    # A reloaded predictor uses the same offsets
+    loaded = ExpensePredictor()
+    assert loaded.load_model() is True
+    assert loaded.metadata['prediction_interval'] == interval
+    
+    calls = []
+    model_predict = loaded.model.predict
+    loaded.model.predict = lambda X: calls.append(X) or model_predict(X)
+    result = loaded.predict_next_month({
+        'total_monthly_expense': 15000,
+        'expense_lag_2': 14000,
+        'expense_lag_3': 13000
+    })
+    
+    assert len(calls) == 1
+    assert result['lower_95'] <= result['prediction'] <= result['upper_95']
+    assert abs(result['upper_95'] - (result['prediction'] + interval['upper_offset'])) < 0.01
+
+def test_prediction_interval_without_metadata():
+    """Test the fallback band for models saved before interval data was recorded"""
+    predictor = ExpensePredictor()
+    lower, upper = predictor._calculate_prediction_interval(10000.0)
+    assert abs(lower - 8040.0) < 1e-6
+    assert abs(upper - 11960.0) < 1e-6
+
+def test_importances_and_metrics_are_saved_with_the_model():
+    """Test that importances and holdout metrics are computed at training time and reloaded"""
+    predictor = ExpensePredictor()
+    metrics = predictor.train(SAMPLE_EXPENSES.to_dict('records'))
+    assert metrics['rmse'] == predictor.metadata['metrics']['rmse']
+    assert predictor.metadata['metrics']['n_holdout'] > 0
+    
+    importances = predictor.metadata['feature_importances']
+    assert sorted(item['feature'] for item in importances) == sorted(predictor.feature_names)
+    assert abs(sum(item['importance'] for item in importances) - 1.0) < 1e-6
+    assert importances[0]['importance'] >= importances[-1]['importance']
+    
+    loaded = ExpensePredictor()
+    assert loaded.load_model() is True
+    result = loaded.predict_next_month({
+        'total_monthly_expense': 15000,
+        'expense_lag_2': 14000,
+        'expense_lag_3': 13000
+    })
+    assert result['feature_importances'] == importances
+    assert result['metrics'] == predictor.metadata['metrics']
+    assert 'explanation' not in result
+
+def test_explanation():
+    """Test that ?explain=1 contributions cover every feature"""
+    predictor = ExpensePredictor()
+    predictor.train(SAMPLE_EXPENSES.to_dict('records'))
+    result = predictor.predict_next_month({
+        'total_monthly_expense': 15000,
+        'expense_lag_2': 14000,
+        'expense_lag_3': 13000
+    }, explain=True)
+    
+    explanation = result['explanation']
+    assert len(explanation['contributions']) == len(predictor.feature_names)
+    assert isinstance(explanation['baseline_prediction'], float)
+    magnitudes = [abs(item['contribution']) for item in explanation['contributions']]
+    assert magnitudes == sorted(magnitudes, reverse=True)
+
 def test_pydantic_models():
     """Test Pydantic models"""
     # Test LastMonthData model
@@ -206,5 +280,9 @@ if __name__ == "__main__":
     test_model_training()
     test_model_persistence()
     test_prediction()
+    test_prediction_interval_from_training_residuals()
+    test_prediction_interval_without_metadata()
+    test_importances_and_metrics_are_saved_with_the_model()
+    test_explanation()
     test_pydantic_models()
     print("All tests passed!")
\ No newline at end of file
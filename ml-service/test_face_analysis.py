@@ -0,0 +1,128 @@
+"""
+Tests for the combined face analysis entry point
+"""
+
+import io
+import os
+import cv2
+import numpy as np
+from face_analysis import analyze_all_faces, analyze_face_combined, analyze_face_shape_batch
+from face_shape_analyzer import get_face_analyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+
+FIXTURE_IMAGE = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', 'heart', 'curly_fringe.jpg')
+
+
+def test_combined_matches_separate_analyses():
+    """Combined analysis should return the same results as the separate analyzers"""
+    image = cv2.imread(FIXTURE_IMAGE)
+
+    combined = analyze_face_combined(image)
+    shape = get_face_analyzer().analyze_face(image)
+    symmetry = get_symmetry_analyzer().analyze_face_symmetry(image)
+
+    assert combined['success'] is True
+    assert combined['data']['face_shape'] == shape['data']
+    assert combined['data']['symmetry'] == symmetry['data']
+
+
+def test_combined_without_face():
+    """Blank images should fail once without running either analyzer"""
+    result = analyze_face_combined(np.zeros((480, 640, 3), dtype=np.uint8))
+
+    assert result['success'] is False
+    assert 'No face detected' in result['message']
+
+
+def test_batch_preserves_order_and_isolates_errors():
+    """Batch results should match single analyses in input order, with per-image errors"""
+    with open(FIXTURE_IMAGE, 'rb') as f:
+        image_bytes = f.read()
+    blank_bytes = cv2.imencode('.jpg', np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+
+    results = analyze_face_shape_batch([image_bytes, b'not an image', blank_bytes, image_bytes])
+    single = get_face_analyzer().analyze_face(cv2.imread(FIXTURE_IMAGE))
+
+    assert len(results) == 4
+    assert results[0] == single
+    assert results[1] == {'success': False, 'message': 'Invalid image file'}
+    assert results[2]['success'] is False
+    assert results[3] == single
+
+
+def test_batch_route_reports_bad_images_per_item(monkeypatch):
+    """The batch route should answer 200 with an entry per image, in order, whatever each image holds"""
+    import app as service
+
+    with open(FIXTURE_IMAGE, 'rb') as f:
+        image_bytes = f.read()
+    blank_bytes = cv2.imencode('.jpg', np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+    monkeypatch.setattr(service.FaceServiceRequest, 'max_upload_bytes', len(image_bytes) + 1024)
+
+    response = service.app.test_client().post('/analyze-face-shape/batch', data={'images': [
+        (io.BytesIO(image_bytes), 'face.jpg'),
+        (io.BytesIO(blank_bytes), 'blank.jpg'),
+        (io.BytesIO(b'name,price\nkeratin,120\n'), 'prices.csv'),
+        (io.BytesIO(image_bytes + b'\0' * 4096), 'oversized.jpg'),
+    ]})
+
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    results = data['results']
+    assert [result['filename'] for result in results] == ['face.jpg', 'blank.jpg', 'prices.csv', 'oversized.jpg']
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert data['count'] == 4 and data['succeeded'] == 1
+
+    face, blank, csv, oversized = results
+    assert face['success'] is True
+    assert face['data']['face_shape'] == get_face_analyzer().analyze_face(cv2.imread(FIXTURE_IMAGE))['data']['face_shape']
+    assert blank['success'] is False and 'No face detected' in blank['message']
+    assert csv['success'] is False and csv['message'].startswith('prices.csv: Unsupported image format')
+    assert oversized['success'] is False and 'byte limit' in oversized['message']
+
+
+def test_vectorized_classification_matches_rules():
+    """Vectorized classification should agree with classify_face_shape"""
+    analyzer = get_face_analyzer()
+    ratios = [0.0, 1.0, 1.1, 1.2, 1.3, 1.8, float('nan')]
+
+    expected = [analyzer.classify_face_shape({'ratio': ratio}) for ratio in ratios]
+
+    assert analyzer.classify_face_shapes(ratios) == expected
+
+
+def test_all_faces_in_group_photo():
+    """Every face of a group photo should be analyzed, left to right"""
+    portrait = cv2.imread(FIXTURE_IMAGE)
+    group = np.hstack([portrait, cv2.flip(portrait, 1)])
+
+    result = analyze_all_faces(group)
+    single = get_face_analyzer().analyze_face(portrait)
+
+    assert result['success'] is True
+    assert result['data']['face_count'] == 2
+    faces = result['data']['faces']
+    assert [face['face_index'] for face in faces] == [0, 1]
+    assert faces[0]['face_box'][0] < faces[1]['face_box'][0]
+    assert all(face['success'] for face in faces)
+    assert faces[0]['face_shape']['face_shape'] == single['data']['face_shape']
+
+
+def test_all_faces_respects_limit_and_blank_images():
+    """max_faces should cap the results; images without faces should fail"""
+    portrait = cv2.imread(FIXTURE_IMAGE)
+    group = np.hstack([portrait, cv2.flip(portrait, 1)])
+
+    assert analyze_all_faces(group, max_faces=1)['data']['face_count'] == 1
+    assert analyze_all_faces(np.zeros((480, 640, 3), dtype=np.uint8))['success'] is False
+
+
+if __name__ == "__main__":
+    test_combined_matches_separate_analyses()
+    test_combined_without_face()
+    test_batch_preserves_order_and_isolates_errors()
+    # test_batch_route_reports_bad_images_per_item needs pytest's monkeypatch fixture
+    test_vectorized_classification_matches_rules()
+    test_all_faces_in_group_photo()
+    test_all_faces_respects_limit_and_blank_images()
+    print("All tests passed!")
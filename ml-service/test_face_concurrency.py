@@ -0,0 +1,65 @@
+"""
+Stress test: face analyzers used from many threads at once
+"""
+
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from face_analysis import analyze_face_combined
+from face_shape_analyzer import get_face_analyzer
+from face_symmetry_analyzer import get_symmetry_analyzer
+
+FIXTURE_IMAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', '*', '*.jpg')))[:6]
+THREADS = 16
+ROUNDS = 2
+
+
+def test_analyzers_are_deterministic_under_concurrency():
+    """Hammering both analyzers from many threads should give the serial results every time"""
+    images = [cv2.imread(path) for path in FIXTURE_IMAGES]
+    shape_analyzer = get_face_analyzer()
+    symmetry_analyzer = get_symmetry_analyzer()
+
+    expected = [
+        (shape_analyzer.analyze_face(image), symmetry_analyzer.analyze_face_symmetry(image))
+        for image in images
+    ]
+
+    def analyze(task):
+        index, kind = task
+        if kind == 'shape':
+            return task, shape_analyzer.analyze_face(images[index])
+        if kind == 'symmetry':
+            return task, symmetry_analyzer.analyze_face_symmetry(images[index])
+        return task, analyze_face_combined(images[index])
+
+    tasks = [
+        (index, kind)
+        for _ in range(ROUNDS)
+        for index in range(len(images))
+        for kind in ('shape', 'symmetry', 'combined')
+    ]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(analyze, tasks))
+
+    assert len(results) == len(tasks)
+    for (index, kind), result in results:
+        shape_expected, symmetry_expected = expected[index]
+        if kind == 'shape':
+            assert result == shape_expected
+        elif kind == 'symmetry':
+            assert result == symmetry_expected
+        elif shape_expected['success']:
+            assert result['data']['face_shape'] == shape_expected['data']
+            assert result['data']['symmetry'] == symmetry_expected['data']
+        else:
+            assert result['success'] is False
+
+
+if __name__ == "__main__":
+    test_analyzers_are_deterministic_under_concurrency()
+    print("All tests passed!")
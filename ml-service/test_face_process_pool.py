@@ -0,0 +1,104 @@
+"""
+Tests for running face analyses in worker processes
+"""
+
+import os
+import time
+
+import cv2
+import pytest
+from face_analysis import analyze_face_shape_batch
+from face_process_pool import ANALYSES, FaceProcessPool, FaceProcessUnavailable
+from request_timing import current_timings, start_timing, stop_timing
+
+FIXTURE_IMAGE = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', 'heart', 'curly_fringe.jpg')
+
+
+def test_process_results_match_in_process_results():
+    """Analyses in a worker process should return what the request thread would"""
+    image = cv2.imread(FIXTURE_IMAGE)
+    pool = FaceProcessPool(workers=1)
+    try:
+        for analysis_type in ('face_shape', 'face_symmetry', 'face'):
+            assert pool.analyze(analysis_type, image) == ANALYSES[analysis_type](image, 1)
+
+        with open(FIXTURE_IMAGE, 'rb') as f:
+            uploads = [f.read(), b'not an image']
+        assert pool.analyze_batch(uploads) == analyze_face_shape_batch(uploads)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_stage_timings_are_reported():
+    """Stages timed in the worker should be added to the request's timings"""
+    image = cv2.imread(FIXTURE_IMAGE)
+    pool = FaceProcessPool(workers=1)
+    token = start_timing()
+    try:
+        pool.analyze('face_shape', image)
+        stages = current_timings().as_dict()
+    finally:
+        stop_timing(token)
+        pool.shutdown()
+
+    for name in ('handoff', 'process_queue', 'face_cascade', 'measurements'):
+        assert name in stages
+
+
+def test_timed_out_analysis_keeps_its_block_until_the_task_ends():
+    """A timeout should fail fast without unlinking the frame a worker is about to read"""
+    image = cv2.imread(FIXTURE_IMAGE)
+    pool = FaceProcessPool(workers=1, timeout=0.001)
+    futures = []
+    wait = pool._wait
+    pool._wait = lambda executor, future: futures.append(future) or wait(executor, future)
+    try:
+        # The worker is still starting, so the analysis cannot finish in time
+        with pytest.raises(FaceProcessUnavailable):
+            pool.analyze('face_shape', image)
+        future, = futures
+        if not future.cancelled():
+            assert future.exception(timeout=120) is None
+    finally:
+        pool.shutdown()
+
+
+def test_model_status_waits_for_every_worker():
+    """The pool is ready only once every worker process reports a loaded model"""
+    pool = FaceProcessPool(workers=2)
+    loading = {'state': 'loading', 'model_version': 'rule_based', 'cache_version': 'v:rule_based'}
+    ready = {'state': 'ready', 'model_version': 'm1', 'backend': 'keras', 'cache_version': 'v:m1'}
+
+    assert pool.model_status()['state'] == 'loading'
+    assert pool.model_status()['cache_version'] is None
+    pool._worker_status = {1: dict(ready)}
+    assert pool.model_status()['state'] == 'loading'
+    pool._worker_status = {1: dict(ready), 2: dict(loading)}
+    assert pool.model_status()['cache_version'] == 'v:m1|v:rule_based'
+    pool._worker_status = {1: dict(ready), 2: dict(ready)}
+    status = pool.model_status()
+    assert status['ready'] and status['model_version'] == 'm1' and status['cache_version'] == 'v:m1'
+
+
+def test_worker_processes_report_their_model_state():
+    """Started workers should report their state without any request"""
+    pool = FaceProcessPool(workers=1, status_interval=0.1)
+    try:
+        pool.start()
+        deadline = time.monotonic() + 120
+        while pool.model_status()['workers_reported'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        status = pool.model_status()
+        assert status['workers_reported'] == 1
+        assert status['cache_version'] is not None
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    test_process_results_match_in_process_results()
+    test_worker_stage_timings_are_reported()
+    test_timed_out_analysis_keeps_its_block_until_the_task_ends()
+    test_model_status_waits_for_every_worker()
+    test_worker_processes_report_their_model_state()
+    print("✓ All process pool tests passed")
@@ -0,0 +1,201 @@
+"""
+Parity tests for the face shape inference backends
+
+The Keras/OpenCV parity tests require model/face_shape_model.h5, its ONNX
+export from convert_face_shape_model.py and TensorFlow, and are skipped
+otherwise. The OpenCV DNN backend's input layout, batching and label
+mapping are also checked against a tiny generated ONNX graph, which only
+needs the onnx package.
+"""
+
+import glob
+import importlib.util
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from face_detection import get_face_detector
+from face_shape_analyzer import FaceShapeAnalyzer
+from face_shape_backends import (
+    KERAS_MODEL_PATH, ONNX_MODEL_PATH, KerasFaceShapeBackend, OpenCVDnnFaceShapeBackend
+)
+from model_batcher import MicroBatcher
+
+FIXTURE_IMAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', '*', '*.jpg')))
+
+requires_both_backends = pytest.mark.skipif(
+    not (os.path.exists(KERAS_MODEL_PATH) and os.path.exists(ONNX_MODEL_PATH)
+         and importlib.util.find_spec('tensorflow') is not None),
+    reason='Keras model, ONNX export and TensorFlow are required for backend parity'
+)
+
+
+def load_fixture_crops():
+    """Preprocessed face crops for every fixture image with a detected face"""
+    analyzer = FaceShapeAnalyzer()
+    crops = []
+    for path in FIXTURE_IMAGES:
+        image = cv2.imread(path)
+        landmarks = analyzer.extract_face_landmarks(image, get_face_detector().detect(image))
+        if landmarks is not None:
+            crops.append(analyzer._prepare_model_input(image, landmarks))
+    return np.stack(crops)
+
+
+@requires_both_backends
+def test_backends_predict_identical_labels():
+    """Keras and OpenCV DNN should pick the same face shape for every fixture face"""
+    crops = load_fixture_crops()
+
+    keras_backend = KerasFaceShapeBackend()
+    dnn_backend = OpenCVDnnFaceShapeBackend()
+    keras_backend.load()
+    dnn_backend.load()
+
+    keras_labels = np.argmax(keras_backend.predict(crops), axis=1)
+    dnn_labels = np.argmax(dnn_backend.predict(crops), axis=1)
+
+    assert len(crops) > 0
+    assert keras_labels.tolist() == dnn_labels.tolist()
+
+
+@requires_both_backends
+def test_opencv_backend_batches_match_single_predictions():
+    """Batched OpenCV DNN output should match one-at-a-time predictions"""
+    crops = load_fixture_crops()[:4]
+
+    backend = OpenCVDnnFaceShapeBackend()
+    backend.load()
+
+    batched = backend.predict(crops)
+    single = np.concatenate([backend.predict(crop[np.newaxis]) for crop in crops])
+
+    np.testing.assert_allclose(batched, single, rtol=1e-4, atol=1e-5)
+
+
+# Colour-to-logit weights of the tiny graph: red crops score highest for
+# 'Heart', green for 'Oval' and blue for 'Oblong'
+TINY_WEIGHTS = np.array([
+    [0.1, 0.2, 0.0, 2.0, 0.3],
+    [0.0, 1.5, 0.2, 0.1, 0.4],
+    [0.2, 0.1, 0.3, 0.0, 1.8],
+], dtype=np.float32)
+TINY_BIAS = np.array([0.05, -0.05, 0.1, 0.0, -0.1], dtype=np.float32)
+
+
+def write_tiny_onnx_model(path: str) -> None:
+    """
+    Export a stand-in for the face shape model with the same NHWC input layout
+
+    The graph averages each RGB channel and applies a dense softmax layer.
+    """
+    onnx = pytest.importorskip('onnx')
+    helper = onnx.helper
+    nodes = [
+        helper.make_node('Transpose', ['input'], ['nchw'], perm=[0, 3, 1, 2]),
+        helper.make_node('GlobalAveragePool', ['nchw'], ['pooled']),
+        helper.make_node('Flatten', ['pooled'], ['features'], axis=1),
+        helper.make_node('Gemm', ['features', 'weights', 'bias'], ['logits']),
+        helper.make_node('Softmax', ['logits'], ['output'], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes, 'tiny_face_shape',
+        [helper.make_tensor_value_info('input', onnx.TensorProto.FLOAT, ['N', 224, 224, 3])],
+        [helper.make_tensor_value_info('output', onnx.TensorProto.FLOAT, ['N', TINY_WEIGHTS.shape[1]])],
+        initializer=[onnx.numpy_helper.from_array(TINY_WEIGHTS, 'weights'),
+                     onnx.numpy_helper.from_array(TINY_BIAS, 'bias')]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def tiny_reference(batch: np.ndarray) -> np.ndarray:
+    """NumPy forward pass of the tiny graph"""
+    logits = batch.mean(axis=(1, 2)) @ TINY_WEIGHTS + TINY_BIAS
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def colour_faces():
+    """Images with one solid-colour face box each: red, green and blue (BGR order)"""
+    faces = []
+    for bgr in ((0, 0, 255), (0, 255, 0), (255, 0, 0)):
+        image = np.full((300, 400, 3), 128, dtype=np.uint8)
+        image[50:250, 100:300] = bgr
+        faces.append((image, {'face_box': (100, 50, 200, 200)}))
+    return faces
+
+
+def test_opencv_backend_matches_reference_on_tiny_graph(tmp_path):
+    """cv2.dnn should take NHWC RGB crops and return one row per crop, batched or not"""
+    model_path = str(tmp_path / 'tiny_face_shape.onnx')
+    write_tiny_onnx_model(model_path)
+    backend = OpenCVDnnFaceShapeBackend(model_path)
+    backend.load()
+
+    analyzer = FaceShapeAnalyzer()
+    crops = np.stack([analyzer._prepare_model_input(image, landmarks) for image, landmarks in colour_faces()])
+    assert crops.shape == (3, 224, 224, 3) and crops.dtype == np.float32
+    # Preprocessing converts BGR to RGB and scales to [0, 1]
+    np.testing.assert_allclose(crops[0, 112, 112], [1.0, 0.0, 0.0])
+
+    batched = backend.predict(crops)
+    single = np.concatenate([backend.predict(crop[np.newaxis]) for crop in crops])
+    assert batched.shape == (3, TINY_WEIGHTS.shape[1])
+    np.testing.assert_allclose(batched, tiny_reference(crops), rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(batched, single, rtol=1e-4, atol=1e-5)
+
+
+def test_opencv_backend_output_maps_to_labels(tmp_path):
+    """The analyzer should map the backend's output rows to face shape labels"""
+    model_path = str(tmp_path / 'tiny_face_shape.onnx')
+    write_tiny_onnx_model(model_path)
+    backend = OpenCVDnnFaceShapeBackend(model_path)
+    backend.load()
+
+    analyzer = FaceShapeAnalyzer()
+    analyzer.face_shape_model = backend
+    analyzer.model_batcher = None
+
+    assert analyzer.predict_face_shapes_with_model(colour_faces()) == ['Heart', 'Oval', 'Oblong']
+
+
+def test_several_faces_share_one_predict_call():
+    """A photo's crops should reach the backend as one stacked call, whatever the batcher's limit"""
+    class RecordingBackend:
+        name = 'recording'
+
+        def __init__(self):
+            self.batch_sizes = []
+
+        def predict(self, batch):
+            self.batch_sizes.append(len(batch))
+            return np.tile(np.eye(5)[1], (len(batch), 1))
+
+    analyzer = FaceShapeAnalyzer()
+    analyzer.face_shape_model = backend = RecordingBackend()
+    analyzer.model_batcher = MicroBatcher(analyzer._predict_model_batch, max_batch_size=2, max_wait_ms=0,
+                                          name='test_face_shape')
+
+    faces = colour_faces() * 4
+    assert analyzer.predict_face_shapes_with_model(faces) == [analyzer.face_shape_labels[1]] * len(faces)
+    assert backend.batch_sizes == [len(faces)]
+
+    analyzer.predict_face_shape_with_model(*faces[0])
+    assert backend.batch_sizes == [len(faces), 1]
+    assert sum(analyzer.model_batcher.batch_size_histogram.values()) == 1
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        test_opencv_backend_matches_reference_on_tiny_graph(pathlib.Path(tmp))
+        test_opencv_backend_output_maps_to_labels(pathlib.Path(tmp))
+    test_several_faces_share_one_predict_call()
+    if os.path.exists(KERAS_MODEL_PATH) and os.path.exists(ONNX_MODEL_PATH):
+        test_backends_predict_identical_labels()
+        test_opencv_backend_batches_match_single_predictions()
+    print("All tests passed!")
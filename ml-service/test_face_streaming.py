@@ -0,0 +1,75 @@
+"""
+Tests for streaming face analysis with keyframe detection and tracking
+"""
+
+import io
+import os
+import struct
+import cv2
+import numpy as np
+import pytest
+from face_streaming import FaceStreamSession, analyze_frame_stream, iter_length_prefixed_frames
+
+FIXTURE_IMAGE = os.path.join(os.path.dirname(__file__), 'static', 'hairstyles', 'heart', 'curly_fringe.jpg')
+
+
+def _make_clip(frame_count=12):
+    """Slide the fixture portrait a few pixels per frame across a 640x480 canvas"""
+    portrait = cv2.imread(FIXTURE_IMAGE)
+    portrait = cv2.resize(portrait, None, fx=0.35, fy=0.35, interpolation=cv2.INTER_AREA)
+    ph, pw = portrait.shape[:2]
+    frames = []
+    for i in range(frame_count):
+        canvas = np.full((480, 640, 3), 40, dtype=np.uint8)
+        x = 100 + 4 * i
+        canvas[40:40 + ph, x:x + pw] = portrait
+        frames.append(cv2.imencode('.jpg', canvas)[1].tobytes())
+    return frames
+
+
+def test_length_prefixed_frames():
+    """Frames should be split on their length prefixes and truncation rejected"""
+    body = b''.join(struct.pack('>I', len(frame)) + frame for frame in [b'abc', b'', b'defg'])
+    assert list(iter_length_prefixed_frames(io.BytesIO(body))) == [b'abc', b'', b'defg']
+
+    with pytest.raises(ValueError):
+        list(iter_length_prefixed_frames(io.BytesIO(body[:-1])))
+    with pytest.raises(ValueError):
+        list(iter_length_prefixed_frames(io.BytesIO(body), max_frame_bytes=3))
+
+
+def test_stream_tracks_between_keyframes():
+    """Only keyframes should run detection, and tracked boxes should follow the face"""
+    frames = _make_clip()
+    detected = list(analyze_frame_stream(frames, FaceStreamSession(keyframe_interval=1)))
+    session = FaceStreamSession(keyframe_interval=4, smoothing_window=3)
+    tracked = list(analyze_frame_stream(frames, session))
+
+    assert all(result['success'] for result in detected + tracked)
+    assert [result['keyframe'] for result in tracked[:5]] == [True, False, False, False, True]
+    assert session.stats()['keyframes'] == 3
+
+    for full, fast in zip(detected, tracked):
+        offset = np.abs(np.subtract(full['face_box'][:2], fast['face_box'][:2])).max()
+        assert offset <= 0.1 * full['face_box'][2]
+
+    assert tracked[-1]['smoothed_frames'] == 3
+    assert tracked[-1]['face_measurements']['ratio'] > 0
+
+
+def test_stream_reports_invalid_and_faceless_frames():
+    """Undecodable and faceless frames should produce per-frame errors"""
+    blank = cv2.imencode('.jpg', np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+    results = list(analyze_frame_stream([b'not an image', blank]))
+
+    assert [result['frame'] for result in results] == [0, 1]
+    assert not results[0]['success']
+    assert results[0]['message'].startswith('Unsupported image format')
+    assert not results[1]['success']
+
+
+if __name__ == "__main__":
+    test_length_prefixed_frames()
+    test_stream_tracks_between_keyframes()
+    test_stream_reports_invalid_and_faceless_frames()
+    print("All tests passed!")
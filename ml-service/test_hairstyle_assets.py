@@ -0,0 +1,78 @@
+"""
+Tests for the hairstyle image variant pipeline
+"""
+
+import os
+import cv2
+import numpy as np
+from hairstyle_assets import HairstyleAssetPipeline
+
+
+def _write_image(path, width, height):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8))
+
+
+def test_build_is_incremental(tmp_path):
+    """Only new or changed sources should be re-encoded, and orphans removed"""
+    source_dir = tmp_path / 'hairstyles'
+    _write_image(str(source_dir / 'heart' / 'braids.jpg'), 800, 600)
+    _write_image(str(source_dir / 'oval' / 'bob.jpg'), 400, 300)
+    pipeline = HairstyleAssetPipeline(str(source_dir), str(tmp_path / 'cache'), widths=(160, 320))
+
+    result = pipeline.build()
+    assert (result['rebuilt'], result['unchanged'], result['removed']) == (2, 0, 0)
+    assert pipeline.build()['unchanged'] == 2
+
+    _write_image(str(source_dir / 'oval' / 'bob.jpg'), 500, 300)
+    os.remove(source_dir / 'heart' / 'braids.jpg')
+    result = pipeline.build()
+    assert (result['rebuilt'], result['unchanged'], result['removed']) == (1, 0, 1)
+    assert not os.path.exists(tmp_path / 'cache' / '160' / 'heart' / 'braids.webp')
+
+
+def test_resolve_picks_covering_width_and_format(tmp_path):
+    """The smallest covering width should be served, as WebP when accepted"""
+    source_dir = tmp_path / 'hairstyles'
+    _write_image(str(source_dir / 'heart' / 'braids.jpg'), 800, 600)
+    pipeline = HairstyleAssetPipeline(str(source_dir), str(tmp_path / 'cache'), widths=(160, 320))
+
+    assert pipeline.resolve('heart/braids.jpg', 200) is None
+    pipeline.build()
+
+    directory, filename = pipeline.resolve('heart/braids.jpg', 200)
+    assert filename == 'braids.jpg'
+    assert cv2.imread(os.path.join(directory, filename)).shape[1] == 320
+
+    assert pipeline.resolve('heart/braids.jpg', 100, accept_webp=True)[1] == 'braids.webp'
+    assert pipeline.resolve('heart/braids.jpg', None, accept_webp=True)[0].endswith('full' + os.sep + 'heart')
+    assert pipeline.resolve('heart/braids.jpg', None) is None
+    assert pipeline.resolve('heart/braids.jpg', 1000) is None
+    assert pipeline.resolve('../../etc/passwd', 100) is None
+
+
+def test_exit_hook_registered_once(tmp_path):
+    """Repeated builds should not pile up atexit hooks"""
+    import hairstyle_assets
+    source_dir = tmp_path / 'hairstyles'
+    _write_image(str(source_dir / 'oval' / 'bob.jpg'), 400, 300)
+    pipeline = HairstyleAssetPipeline(str(source_dir), str(tmp_path / 'cache'), widths=(160,))
+
+    hooks = []
+    register = hairstyle_assets.atexit.register
+    hairstyle_assets.atexit.register = hooks.append
+    try:
+        for _ in range(3):
+            pipeline.start_build().join()
+    finally:
+        hairstyle_assets.atexit.register = register
+    assert hooks == [pipeline.stop]
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        test_build_is_incremental(pathlib.Path(tmp) / 'a')
+        test_resolve_picks_covering_width_and_format(pathlib.Path(tmp) / 'b')
+        test_exit_hook_registered_once(pathlib.Path(tmp) / 'c')
+    print("All tests passed!")
@@ -0,0 +1,65 @@
+"""
+Tests for pre-serialized hairstyle recommendation payloads
+"""
+
+import json
+import pytest
+from face_shape_analyzer import get_face_analyzer
+from hairstyle_payloads import STATIC_FIELDS
+
+MEASUREMENTS = {'face_length': 321.0, 'face_width': 270.0, 'ratio': 1.1889}
+
+
+def _result(analyzer, face_shape):
+    return analyzer.build_analysis_result(
+        face_shape, 'rule_based', dict(MEASUREMENTS), {'detection_scale': 0.5, 'decode_factor': 1}
+    )
+
+
+def test_serialized_result_matches_full_result():
+    """Splicing the fragment should give the full response for every face shape"""
+    analyzer = get_face_analyzer()
+    for face_shape in analyzer.hairstyle_recommendations:
+        result = _result(analyzer, face_shape)
+        data = json.loads(analyzer.payloads.serialize_result(result))['data']
+
+        assert data['face_measurements'] == MEASUREMENTS
+        assert data['hairstyle_recommendations'] == analyzer.get_hairstyle_recommendations(face_shape)
+        assert data['tips'] == analyzer.get_styling_tips(face_shape)
+        assert data['recommended_hairstyles'] == analyzer.payloads.get_flat_names(face_shape)
+        assert data == analyzer.payloads.with_recommendations(result['data'])
+
+
+def test_analysis_result_carries_only_per_request_fields():
+    """Static recommendation fields should not be copied through caches with every result"""
+    analyzer = get_face_analyzer()
+    data = _result(analyzer, 'Heart')['data']
+    assert not set(STATIC_FIELDS) & set(data)
+    assert set(analyzer.payloads.recommendation_fields('Heart', 'legacy')) == {'recommended_hairstyles', 'tips'}
+
+
+def test_legacy_variant_has_flat_names_only():
+    """The legacy variant should carry string names and no structured catalog"""
+    analyzer = get_face_analyzer()
+    data = json.loads(analyzer.payloads.serialize_result(_result(analyzer, 'Heart'), 'legacy'))['data']
+
+    assert 'hairstyle_recommendations' not in data
+    assert all(isinstance(name, str) for name in data['recommended_hairstyles'])
+    assert data['face_measurements'] == MEASUREMENTS
+
+    with pytest.raises(ValueError):
+        analyzer.payloads.fragment('Heart', 'compact')
+
+
+def test_failed_result_is_serialized_unchanged():
+    """Results without data should be encoded as they are"""
+    failed = {'success': False, 'message': 'No face detected', 'index': 2}
+    assert json.loads(get_face_analyzer().payloads.serialize_result(failed)) == failed
+
+
+if __name__ == "__main__":
+    test_serialized_result_matches_full_result()
+    test_analysis_result_carries_only_per_request_fields()
+    test_legacy_variant_has_flat_names_only()
+    test_failed_result_is_serialized_unchanged()
+    print("All tests passed!")
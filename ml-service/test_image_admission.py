@@ -0,0 +1,199 @@
+"""
+Tests for header-only admission of uploaded images
+"""
+
+import io
+import struct
+import zlib
+import cv2
+import numpy as np
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.test import EnvironBuilder
+from image_admission import HeaderScanner, ImageAdmissionRequest, check_image_header, upload_rejection
+
+
+def _png_header(width, height):
+    """A PNG signature and IHDR chunk without any pixel data"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+
+
+def _jpeg_with_metadata(metadata_bytes, width=64, height=48):
+    """A JPEG with APP1/APP2 segments of `metadata_bytes` in total before the frame header"""
+    jpeg = cv2.imencode('.jpg', np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+    segments = b''
+    while metadata_bytes > 0:
+        size = min(metadata_bytes, 65533)
+        segments += b'\xff\xe1' + struct.pack('>H', size + 2) + b'\0' * size
+        metadata_bytes -= size
+    return jpeg[:2] + segments + jpeg[2:]
+
+
+class UploadRequest(ImageAdmissionRequest):
+    image_endpoints = frozenset({'upload'})
+    batch_endpoints = frozenset({'batch'})
+    max_upload_bytes = 20 * 1024 * 1024
+    max_batch_files = 3
+
+
+def _make_app():
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        try:
+            file = request.files['image']
+        except HTTPException as e:
+            return jsonify({'success': False, 'message': e.description}), e.code
+        return jsonify({'success': True, 'size': len(file.read())})
+
+    @app.route('/batch', methods=['POST'])
+    def batch():
+        results = []
+        for file in request.files.getlist('images'):
+            rejection = upload_rejection(file)
+            results.append({'size': len(file.read())} if rejection is None
+                           else {'code': rejection.code, 'message': rejection.description})
+        return jsonify(results)
+
+    @app.route('/train', methods=['POST'])
+    def train():
+        return jsonify({'success': True, 'size': len(request.get_data())})
+
+    return app
+
+
+def test_check_image_header():
+    """Headers should be admitted, deferred, or rejected with 413/415"""
+    jpeg = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+    assert check_image_header(jpeg) == {'format': 'jpeg', 'width': 64, 'height': 48}
+    assert check_image_header(jpeg[:4], complete=False) is None
+
+    with pytest.raises(UnsupportedMediaType):
+        check_image_header(b'GIF89a' + b'\0' * 100)
+    with pytest.raises(RequestEntityTooLarge):
+        check_image_header(_png_header(10000, 5000), max_pixels=25_000_000)
+
+
+def test_oversized_image_rejected_without_reading_body():
+    """A 50 MP image should get a 413 after only the first chunk of the body is read"""
+    body = _png_header(10000, 5000) + b'\0' * (8 * 1024 * 1024)
+    environ = EnvironBuilder(method='POST', path='/upload', data={'image': (io.BytesIO(body), 'big.png')}).get_environ()
+    stream = environ['wsgi.input']
+
+    statuses = []
+    response = b''.join(_make_app().wsgi_app(environ, lambda status, headers: statuses.append(status)))
+
+    assert statuses[0].startswith('413')
+    assert b'big.png' in response
+    assert stream.tell() < 256 * 1024
+
+
+def test_supported_image_is_admitted():
+    """Small valid uploads should pass through unchanged"""
+    png = cv2.imencode('.png', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+    client = _make_app().test_client()
+
+    response = client.post('/upload', data={'image': (io.BytesIO(png), 'face.png')})
+    assert response.status_code == 200
+    assert response.get_json()['size'] == len(png)
+
+    response = client.post('/upload', data={'image': (io.BytesIO(b'not an image'), 'notes.txt')})
+    assert response.status_code == 415
+
+
+def test_jpeg_metadata_segments_are_skipped_by_length():
+    """A frame header after 1 MB of EXIF/ICC segments should still be found, in any chunking"""
+    jpeg = _jpeg_with_metadata(1024 * 1024)
+    for chunk_size in (1, 7, 4096, len(jpeg)):
+        scanner = HeaderScanner()
+        for offset in range(0, len(jpeg), chunk_size):
+            if scanner.feed(jpeg[offset:offset + chunk_size]):
+                break
+        assert scanner.header == {'format': 'jpeg', 'width': 64, 'height': 48}
+        # Skipped payloads are never buffered
+        assert len(scanner._buffer) == 0
+
+    client = _make_app().test_client()
+    response = client.post('/upload', data={'image': (io.BytesIO(jpeg), 'phone.jpg')})
+    assert response.status_code == 200
+
+
+def test_unreadable_header_is_left_to_the_decoder():
+    """A JPEG whose frame header cannot be found should be admitted, not rejected with 415"""
+    scanner = HeaderScanner()
+    scanner.feed(b'\xff\xd8\xff\xe0\x00\x10JFIF')
+    scanner.finish()
+    assert scanner.done and scanner.format == 'jpeg' and scanner.header is None
+
+    with pytest.raises(UnsupportedMediaType):
+        HeaderScanner().finish()
+
+
+def test_upload_limit_applies_to_image_endpoints_only():
+    """Training routes taking JSON should not be held to the image upload limit"""
+    app = _make_app()
+    UploadRequest.max_upload_bytes, limit = 1024, UploadRequest.max_upload_bytes
+    try:
+        client = app.test_client()
+        payload = b'{"expenses": [' + b'1, ' * 2000 + b'1]}'
+        assert client.post('/train', data=payload, content_type='application/json').status_code == 200
+        response = client.post('/upload', data={'image': (io.BytesIO(_jpeg_with_metadata(4096)), 'big.jpg')})
+        assert response.status_code == 413
+    finally:
+        UploadRequest.max_upload_bytes = limit
+
+
+def test_batch_rejections_are_kept_per_file():
+    """A bad file in a batch should be recorded and dropped without failing the others"""
+    app = _make_app()
+    UploadRequest.max_upload_bytes, limit = 8192, UploadRequest.max_upload_bytes
+    try:
+        jpeg = _jpeg_with_metadata(0)
+        response = app.test_client().post('/batch', data={'images': [
+            (io.BytesIO(jpeg), 'ok.jpg'),
+            (io.BytesIO(b'not an image at all, just some text'), 'notes.txt'),
+            (io.BytesIO(_png_header(20000, 20000) + b'\0' * 100), 'huge.png'),
+            (io.BytesIO(_jpeg_with_metadata(16384)), 'big.jpg'),
+        ]})
+    finally:
+        UploadRequest.max_upload_bytes = limit
+
+    assert response.status_code == 200
+    ok, text, huge, big = response.get_json()
+    assert ok == {'size': len(jpeg)}
+    assert text['code'] == 415 and text['message'].startswith('notes.txt: ')
+    assert huge['code'] == 413
+    assert big['code'] == 413 and 'byte limit' in big['message']
+
+
+def test_batch_body_limit_scales_with_the_batch_size():
+    """Several images each under the limit should fit in one batch body"""
+    app = _make_app()
+    UploadRequest.max_upload_bytes, limit = 8192, UploadRequest.max_upload_bytes
+    try:
+        client = app.test_client()
+        image = _jpeg_with_metadata(6000)
+        response = client.post('/batch', data={'images': [(io.BytesIO(image), f'{i}.jpg') for i in range(3)]})
+        assert response.status_code == 200
+        assert response.get_json() == [{'size': len(image)}] * 3
+
+        response = client.post('/batch', data={'images': [(io.BytesIO(image), f'{i}.jpg') for i in range(8)]})
+        assert response.status_code == 413
+    finally:
+        UploadRequest.max_upload_bytes = limit
+
+
+if __name__ == "__main__":
+    test_check_image_header()
+    test_oversized_image_rejected_without_reading_body()
+    test_supported_image_is_admitted()
+    test_jpeg_metadata_segments_are_skipped_by_length()
+    test_unreadable_header_is_left_to_the_decoder()
+    test_upload_limit_applies_to_image_endpoints_only()
+    test_batch_rejections_are_kept_per_file()
+    test_batch_body_limit_scales_with_the_batch_size()
+    print("All tests passed!")
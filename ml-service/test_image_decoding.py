@@ -0,0 +1,74 @@
+"""
+Unit tests for header parsing and reduced-resolution decoding
+"""
+
+import cv2
+import numpy as np
+from face_detection import FaceDetector
+from image_decoding import read_image_header, choose_reduction_factor, decode_image
+
+
+def _encode(extension, width, height):
+    image = np.full((height, width, 3), 128, dtype=np.uint8)
+    ok, buffer = cv2.imencode(extension, image)
+    assert ok
+    return buffer.tobytes()
+
+
+def test_read_image_header():
+    """JPEG, PNG and WebP dimensions should be read without decoding"""
+    for extension, image_format in (('.jpg', 'jpeg'), ('.png', 'png'), ('.webp', 'webp')):
+        header = read_image_header(_encode(extension, 640, 480))
+        assert header == {'format': image_format, 'width': 640, 'height': 480}
+
+    assert read_image_header(b'not an image') is None
+
+
+def test_choose_reduction_factor():
+    """The largest factor keeping the longest side at or above the target should be chosen"""
+    assert choose_reduction_factor(800, 600, 1024) == 1
+    assert choose_reduction_factor(4032, 3024, 1024) == 2
+    assert choose_reduction_factor(8192, 6144, 1024) == 8
+    assert choose_reduction_factor(8192, 6144, 0) == 1
+
+
+def test_decode_image_reduces_large_jpegs_only():
+    """Large JPEGs should decode at reduced size; other formats at full size"""
+    image, factor = decode_image(_encode('.jpg', 2400, 1600), 1024)
+    assert factor == 2
+    assert image.shape[:2] == (800, 1200)
+
+    image, factor = decode_image(_encode('.png', 2400, 1600), 1024)
+    assert factor == 1
+    assert image.shape[:2] == (1600, 2400)
+
+    image, factor = decode_image(b'not an image', 1024)
+    assert image is None
+
+
+def test_min_face_size_refers_to_original_upload():
+    """A reduced decode should lower the cascade's minimum face size to match"""
+    class RecordingCascade:
+        def __init__(self):
+            self.min_sizes = []
+
+        def detectMultiScale(self, image, scaleFactor, minNeighbors, minSize):
+            self.min_sizes.append(minSize[0])
+            return ()
+
+    detector = FaceDetector(detection_max_dim=0)
+    cascade = RecordingCascade()
+    detector._local.cascades = (cascade, detector.eye_cascade)
+    gray = np.zeros((600, 800), dtype=np.uint8)
+    for factor in (1, 2, 4, 8):
+        detector.detect_face_box(gray, factor)
+    # 100 px in the original, never below the 24 px cascade window
+    assert cascade.min_sizes == [100, 50, 25, 24]
+
+
+if __name__ == "__main__":
+    test_read_image_header()
+    test_choose_reduction_factor()
+    test_decode_image_reduces_large_jpegs_only()
+    test_min_face_size_refers_to_original_upload()
+    print("All tests passed!")
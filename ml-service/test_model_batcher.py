@@ -0,0 +1,56 @@
+"""
+Unit tests for dynamic micro-batching
+"""
+
+import threading
+import numpy as np
+from model_batcher import MicroBatcher
+
+
+def test_concurrent_inputs_are_batched():
+    """Concurrent submissions should share predict calls and get their own rows back"""
+    calls = []
+    release = threading.Event()
+
+    def predict(batch):
+        release.wait(1.0)
+        calls.append(len(batch))
+        return batch.reshape(len(batch), -1).sum(axis=1, keepdims=True)
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=50, name='test')
+    futures = [batcher.submit(np.full((2, 2), i, dtype=np.float32)) for i in range(8)]
+    release.set()
+
+    results = [float(future.result(timeout=5)[0]) for future in futures]
+
+    assert results == [4.0 * i for i in range(8)]
+    assert sum(calls) == 8
+    assert max(calls) <= 4
+    assert len(calls) < 8
+
+    stats = batcher.stats()
+    assert stats['items'] == 8
+    assert stats['batches'] == len(calls)
+    assert sum(int(size) * count for size, count in stats['batch_size_histogram'].items()) == 8
+
+
+def test_prediction_errors_reach_every_caller():
+    """A failing predict call should raise for every input in the batch"""
+    def predict(batch):
+        raise RuntimeError('model failed')
+
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=20, name='test')
+    futures = [batcher.submit(np.zeros(3)) for _ in range(2)]
+
+    for future in futures:
+        try:
+            future.result(timeout=5)
+            assert False, 'expected RuntimeError'
+        except RuntimeError as e:
+            assert str(e) == 'model failed'
+
+
+if __name__ == "__main__":
+    test_concurrent_inputs_are_batched()
+    test_prediction_errors_reach_every_caller()
+    print("All tests passed!")
@@ -0,0 +1,115 @@
+"""
+Tests for the model registry
+"""
+
+import os
+import joblib
+import model_registry
+from model_registry import ModelRegistry
+
+
+def test_models_load_once_and_status_is_cached(tmp_path, monkeypatch):
+    """get() and status() should not touch the files after the first load"""
+    model_path, features_path = str(tmp_path / 'model.pkl'), str(tmp_path / 'features.pkl')
+    joblib.dump({'weights': [1, 2]}, model_path)
+    joblib.dump(['a', 'b'], features_path)
+
+    registry = ModelRegistry()
+    registry.register('revenue', (model_path, features_path))
+
+    loads = []
+    monkeypatch.setattr(model_registry.joblib, 'load', lambda path: loads.append(path))
+    for _ in range(3):
+        assert registry.get('revenue') == ({'weights': [1, 2]}, ['a', 'b'])
+        status = registry.status()['revenue']
+    assert loads == []
+
+    assert status['state'] == 'loaded'
+    assert len(status['version']) == 12
+    assert set(status['file_mtimes']) == {'model.pkl', 'features.pkl'}
+    assert status['loaded_at'] is not None
+
+
+def test_missing_models_are_retried_after_backoff(tmp_path, monkeypatch):
+    """A missing artifact should stay missing until its backoff expires"""
+    monkeypatch.setattr(model_registry, 'MODEL_RETRY_BACKOFF_SECONDS', 60.0)
+    path = str(tmp_path / 'model.pkl')
+
+    registry = ModelRegistry()
+    registry.register('addon', (path,), build=lambda model: {'model': model})
+    assert registry.status()['addon']['state'] == 'missing'
+
+    joblib.dump('trained', path)
+    assert registry.get('addon') is None
+    assert registry.status()['addon']['retry_in_seconds'] > 0
+
+    registry._artifacts['addon'].retry_at = 0.0
+    assert registry.get('addon') == {'model': 'trained'}
+    assert registry.is_loaded('addon')
+
+
+def test_reload_picks_up_new_files(tmp_path):
+    """reload() should serve newly saved files under a new version"""
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump('v1', path)
+    registry = ModelRegistry()
+    registry.register('expense', (path,))
+    version = registry.status()['expense']['version']
+
+    joblib.dump('v2', path)
+    assert registry.get('expense') == 'v1'
+    assert registry.reload('expense') is True
+    assert registry.get('expense') == 'v2'
+    assert registry.status()['expense']['version'] != version
+
+
+
+def test_changed_files_are_picked_up_after_the_check_interval(tmp_path, monkeypatch):
+    """get() should reload retrained files once per interval, keeping the old model if they do not load"""
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump('v1', path)
+    registry = ModelRegistry(check_interval=60)
+    registry.register('revenue', (path,))
+    artifact = registry._artifacts['revenue']
+
+    joblib.dump('v2', path)
+    os.utime(path, (artifact.file_mtimes[path] + 5,) * 2)
+    assert registry.get('revenue') == 'v1'
+
+    artifact.checked_at -= 60
+    assert registry.get('revenue') == 'v2'
+
+    with open(path, 'wb') as f:
+        f.write(b'half written')
+    os.utime(path, (artifact.file_mtimes[path] + 5,) * 2)
+    artifact.checked_at -= 60
+    assert registry.get('revenue') == 'v2'
+    assert registry.status()['revenue']['state'] == 'loaded'
+
+    stats = []
+    monkeypatch.setattr(model_registry.os, 'stat', lambda path: stats.append(path))
+    for _ in range(3):
+        registry.get('revenue')
+    assert stats == []
+
+
+def test_missing_optional_file_is_passed_as_none(tmp_path):
+    """A missing optional file should not stop the model from loading"""
+    path = str(tmp_path / 'model.pkl')
+    metadata_path = str(tmp_path / 'metadata.pkl')
+    joblib.dump('model', path)
+    registry = ModelRegistry()
+    registry.register('expense', (path,), build=lambda model, metadata: (model, metadata),
+                      optional_paths=(metadata_path,))
+    assert registry.get('expense') == ('model', None)
+
+    joblib.dump({'interval': 1}, metadata_path)
+    assert registry.reload('expense') is True
+    assert registry.get('expense') == ('model', {'interval': 1})
+    assert 'metadata.pkl' in registry.status()['expense']['file_mtimes']
+
+
+if __name__ == "__main__":
+    # The tests use pytest's tmp_path and monkeypatch fixtures
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,69 @@
+"""
+Unit tests for request stage timing
+"""
+
+import json
+import threading
+import time
+from contextvars import copy_context
+
+from request_timing import append_timing, current_timings, stage, start_timing, stop_timing
+
+
+def test_stage_is_a_no_op_outside_timed_requests():
+    """Without start_timing, stages should record nothing"""
+    assert current_timings() is None
+    with stage('decode'):
+        pass
+    assert current_timings() is None
+
+
+def test_stages_accumulate_and_format_as_server_timing():
+    """Repeated stages should add up, including from threads in a copied context"""
+    token = start_timing()
+    try:
+        with stage('decode'):
+            time.sleep(0.002)
+        with stage('decode'):
+            time.sleep(0.002)
+
+        def detect():
+            with stage('face_cascade'):
+                time.sleep(0.001)
+
+        worker = threading.Thread(target=copy_context().run, args=(detect,))
+        worker.start()
+        worker.join()
+
+        timings = current_timings().as_dict()
+        assert list(timings) == ['decode', 'face_cascade', 'total']
+        assert timings['decode'] >= 4.0
+        assert timings['total'] >= timings['decode'] + timings['face_cascade']
+
+        header = current_timings().server_timing_header()
+        assert header.startswith('decode;dur=')
+        assert header.split(', ')[-1].startswith('total;dur=')
+    finally:
+        stop_timing(token)
+    assert current_timings() is None
+
+
+def test_append_timing_to_serialized_body():
+    """The timing member should be spliced into any JSON object"""
+    token = start_timing()
+    try:
+        with stage('serialize'):
+            pass
+        body = json.loads(append_timing('{"success": true, "data": {"a": 1}}', current_timings()))
+        assert body['data'] == {'a': 1}
+        assert set(body['timing']) == {'serialize', 'total'}
+        assert json.loads(append_timing('{}', current_timings()))['timing']['total'] >= 0
+    finally:
+        stop_timing(token)
+
+
+if __name__ == "__main__":
+    test_stage_is_a_no_op_outside_timed_requests()
+    test_stages_accumulate_and_format_as_server_timing()
+    test_append_timing_to_serialized_body()
+    print("✓ Request timing tests passed")
@@ -0,0 +1,53 @@
+"""
+Unit tests for the Prometheus service metrics
+"""
+
+import numpy as np
+from prometheus_client import REGISTRY
+
+from service_metrics import observe_image, record_cache_lookup, render_metrics, sample_process_rss, time_model_inference
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_image_and_cache_counters():
+    """Decoded images should add bytes and pixels; lookups should count by outcome"""
+    bytes_before = _value('ml_service_image_bytes_processed_total', source='test')
+    pixels_before = _value('ml_service_image_pixels_processed_total', source='test')
+    observe_image('test', 1000, np.zeros((480, 640, 3), dtype=np.uint8))
+    observe_image('test', 10, None)
+    assert _value('ml_service_image_bytes_processed_total', source='test') == bytes_before + 1010
+    assert _value('ml_service_image_pixels_processed_total', source='test') == pixels_before + 640 * 480
+
+    hits_before = _value('ml_service_cache_requests_total', cache='test', result='hit')
+    record_cache_lookup('test', True)
+    record_cache_lookup('test', False)
+    assert _value('ml_service_cache_requests_total', cache='test', result='hit') == hits_before + 1
+    assert _value('ml_service_cache_requests_total', cache='test', result='miss') >= 1
+
+
+def test_model_inference_histogram():
+    """Timed model calls should land in the per-model histogram"""
+    count_before = _value('ml_service_model_inference_seconds_count', model='test')
+    with time_model_inference('test'):
+        pass
+    assert _value('ml_service_model_inference_seconds_count', model='test') == count_before + 1
+
+
+def test_render_metrics_includes_rss():
+    """The text exposition should include this process's RSS"""
+    sample_process_rss(force=True)
+    assert _value('ml_service_process_resident_memory_bytes') > 0
+    body, content_type = render_metrics()
+    assert content_type.startswith('text/plain')
+    assert b'ml_service_process_resident_memory_bytes' in body
+    assert b'ml_service_http_requests_total' in body
+
+
+if __name__ == "__main__":
+    test_image_and_cache_counters()
+    test_model_inference_histogram()
+    test_render_metrics_includes_rss()
+    print("✓ Service metrics tests passed")
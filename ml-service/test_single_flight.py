@@ -0,0 +1,71 @@
+"""
+Tests for coalescing identical in-flight computations
+"""
+
+import threading
+import time
+import pytest
+from single_flight import SingleFlight
+
+
+def run_concurrently(flights, key, compute, count):
+    """Call flights.do from `count` threads at once; returns their outcomes"""
+    outcomes = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            outcomes[i] = flights.do(key, compute)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_calls_share_one_computation():
+    """Concurrent calls with one key should compute once and get equal copies"""
+    flights = SingleFlight('test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'success': True, 'data': {'face_shape': 'Oval'}}
+
+    outcomes = run_concurrently(flights, 'key', compute, 5)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+    results = [result for result, _ in outcomes]
+    assert all(result == results[0] for result in results)
+    assert len({id(result) for result in results}) == 5
+    assert flights.in_flight() == 0
+
+
+def test_errors_are_shared_and_later_calls_recompute():
+    """Waiters should get the computation's error; finished keys should compute again"""
+    flights = SingleFlight('test')
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError('analysis failed')
+
+    outcomes = run_concurrently(flights, 'key', fail, 3)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+    assert flights.do('key', lambda: 1) == (1, False)
+    assert flights.do('other', lambda: 2) == (2, False)
+    with pytest.raises(KeyError):
+        flights.do('key', lambda: {}['missing'])
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_computation()
+    test_errors_are_shared_and_later_calls_recompute()
+    print("✓ All single-flight tests passed")
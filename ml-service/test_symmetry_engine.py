@@ -0,0 +1,85 @@
+"""
+Unit tests for the mirror symmetry engine
+"""
+
+import cv2
+import numpy as np
+from symmetry_engine import MirrorSymmetryEngine
+
+FACE_BOX = (60, 60, 200, 200)
+EYES = [(110, 130), (209, 130)]
+
+
+def _synthetic_face(jaw_shift=0):
+    """Textured face that is mirror symmetric about x=159.5, with an optional lopsided jaw"""
+    rng = np.random.default_rng(7)
+    half = rng.integers(60, 200, size=(320, 160), dtype=np.uint8)
+    half = cv2.GaussianBlur(half, (0, 0), 2)
+    image = np.hstack([half, half[:, ::-1]])
+    for x, y in EYES:
+        cv2.circle(image, (x, y), 12, 20, -1)
+    if jaw_shift:
+        cv2.ellipse(image, (159 + jaw_shift, 225), (45, 18), 0, 0, 360, 30, -1)
+    return image
+
+
+def test_symmetric_face_scores_lower_than_asymmetric():
+    """A mirrored face should score near zero and a lopsided jaw should raise the jaw score"""
+    engine = MirrorSymmetryEngine(levels=3)
+    symmetric = engine.analyze(_synthetic_face(), FACE_BOX, EYES)
+    lopsided = engine.analyze(_synthetic_face(jaw_shift=30), FACE_BOX, EYES)
+
+    assert symmetric['eye_aligned']
+    assert max(symmetric['asymmetry_scores'].values()) < 5
+    assert lopsided['asymmetry_scores']['jaw'] > symmetric['asymmetry_scores']['jaw'] + 10
+    assert max(lopsided['asymmetry_scores'], key=lopsided['asymmetry_scores'].get) == 'jaw'
+
+
+def test_alignment_undoes_head_tilt():
+    """Rotating the face should barely change its scores once aligned on the eye axis"""
+    engine = MirrorSymmetryEngine(levels=3)
+    image = _synthetic_face()
+    matrix = cv2.getRotationMatrix2D((160, 160), -12, 1.0)
+    rotated = cv2.warpAffine(image, matrix, (320, 320), borderMode=cv2.BORDER_REPLICATE)
+    eyes = [tuple(matrix @ np.array([x, y, 1.0])) for x, y in EYES]
+
+    result = engine.analyze(rotated, FACE_BOX, eyes)
+    assert abs(result['eye_angle'] - 12) < 0.5
+    assert max(result['asymmetry_scores'].values()) < 6
+
+
+def test_implausible_eyes_fall_back_to_face_box():
+    """Eye pairs that are too tilted or too close should not drive the alignment"""
+    engine = MirrorSymmetryEngine()
+    assert not engine.eyes_usable([(110, 130), (160, 200)], FACE_BOX)
+    assert not engine.eyes_usable([(110, 130), (120, 130)], FACE_BOX)
+    result = engine.analyze(_synthetic_face(), FACE_BOX, [])
+    assert not result['eye_aligned']
+    assert set(result['asymmetry_scores']) == {'forehead', 'eye', 'cheek', 'jaw'}
+
+
+def test_pyramid_depth_is_the_configured_setting():
+    """Every engine with the same settings should score with the same depth and cache version"""
+    image = _synthetic_face()
+    first, second = MirrorSymmetryEngine(levels=2), MirrorSymmetryEngine(levels=2)
+    assert first.analyze(image, FACE_BOX, EYES)['levels_used'] == 2
+    assert first.version == second.version == 'mirror-128-2'
+    assert first.analyze(image, FACE_BOX, EYES)['asymmetry_scores'] == second.analyze(image, FACE_BOX, EYES)['asymmetry_scores']
+    assert MirrorSymmetryEngine(levels=0).levels == 1
+
+
+def test_analyzer_builds_engine_only_for_mirror_scoring(monkeypatch):
+    """Landmark scoring is the default and should not build the mirror engine"""
+    import face_symmetry_analyzer
+
+    assert face_symmetry_analyzer.FaceSymmetryAnalyzer().engine is None
+    monkeypatch.setattr(face_symmetry_analyzer, 'SYMMETRY_METHOD', 'mirror')
+    assert isinstance(face_symmetry_analyzer.FaceSymmetryAnalyzer().engine, MirrorSymmetryEngine)
+
+
+if __name__ == "__main__":
+    test_symmetric_face_scores_lower_than_asymmetric()
+    test_alignment_undoes_head_tilt()
+    test_implausible_eyes_fall_back_to_face_box()
+    test_pyramid_depth_is_the_configured_setting()
+    print("✓ Symmetry engine tests passed")
@@ -0,0 +1,60 @@
+"""
+Tests for exercise video ETags and poster frames
+"""
+
+import hashlib
+import os
+import cv2
+from video_assets import VideoAssets, VIDEO_DIR
+
+VIDEO_FILE = 'cheek_lift.mp4'
+
+
+def test_etag_is_content_hash_and_cached(tmp_path):
+    """ETags should be content digests computed once per file version"""
+    assets = VideoAssets(VIDEO_DIR, str(tmp_path))
+    with open(os.path.join(VIDEO_DIR, VIDEO_FILE), 'rb') as f:
+        expected = hashlib.sha256(f.read()).hexdigest()[:32]
+
+    assert assets.get_etag(VIDEO_FILE) == expected
+    assert assets._etags[VIDEO_FILE][1] == expected
+    assert assets.get_etag('missing.mp4') is None
+    assert assets.get_etag('../app.py') is None
+
+
+def test_poster_frame_is_generated_once(tmp_path):
+    """A JPEG poster should be written on first use and reused afterwards"""
+    assets = VideoAssets(VIDEO_DIR, str(tmp_path))
+    directory, filename = assets.get_poster(VIDEO_FILE)
+    poster_path = os.path.join(directory, filename)
+    assert cv2.imread(poster_path) is not None
+
+    mtime = os.path.getmtime(poster_path)
+    assert assets.get_poster(VIDEO_FILE) == (directory, filename)
+    assert os.path.getmtime(poster_path) == mtime
+    assert assets.get_poster('missing.mp4') is None
+
+
+def test_exit_hook_registered_once(tmp_path):
+    """Repeated warm-ups should not pile up atexit hooks"""
+    import video_assets
+    assets = VideoAssets(VIDEO_DIR, str(tmp_path))
+
+    hooks = []
+    register = video_assets.atexit.register
+    video_assets.atexit.register = hooks.append
+    try:
+        for _ in range(2):
+            assets.start_warm().join()
+    finally:
+        video_assets.atexit.register = register
+    assert hooks == [assets.stop]
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    with tempfile.TemporaryDirectory() as tmp:
+        test_etag_is_content_hash_and_cached(pathlib.Path(tmp))
+        test_poster_frame_is_generated_once(pathlib.Path(tmp))
+        test_exit_hook_registered_once(pathlib.Path(tmp))
+    print("All tests passed!")
@@ -0,0 +1,225 @@
+"""
+Exercise Video Assets
+Strong ETags and poster frames for the workout videos, computed once per
+file version and reused across requests
+"""
+
+import atexit
+import cv2
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+VIDEO_DIR = os.path.join(os.path.dirname(__file__), 'static')
+POSTER_CACHE_DIR = os.environ.get(
+    'VIDEO_POSTER_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.asset_cache', 'posters')
+)
+# Cache-Control max-age for videos and posters; ETags handle revalidation after it expires
+VIDEO_CACHE_MAX_AGE = int(os.environ.get('VIDEO_CACHE_MAX_AGE', str(30 * 24 * 3600)))
+# Playback position the poster frame is taken from
+POSTER_TIME_SECONDS = float(os.environ.get('VIDEO_POSTER_TIME_SECONDS', '1.0'))
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class VideoAssets:
+    """
+    Per-file metadata for the exercise videos
+
+    ETags are SHA-256 digests of the file contents, so they are strong
+    validators suitable for range requests. Digests and poster frames are
+    keyed by the file's size and modification time and only recomputed when
+    the file changes.
+    """
+
+    def __init__(self, video_dir: str = VIDEO_DIR, poster_dir: str = POSTER_CACHE_DIR):
+        """
+        Initialize the asset cache
+
+        Args:
+            video_dir: Directory holding the videos
+            poster_dir: Directory for generated poster frames
+        """
+        self.video_dir = video_dir
+        self.poster_dir = poster_dir
+        self._etags = {}
+        self._lock = threading.Lock()
+        self._warmer = None
+        self._stop = threading.Event()
+        self._exit_hook_registered = False
+
+    def _video_path(self, filename: str) -> Optional[str]:
+        """Absolute path of a video, or None if it is not a file in the video directory"""
+        if not filename.lower().endswith(VIDEO_EXTENSIONS):
+            return None
+        path = safe_join(self.video_dir, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        """File version used to key cached metadata"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_etag(self, filename: str) -> Optional[str]:
+        """
+        Get the strong ETag of a video
+
+        Args:
+            filename: Video file name
+
+        Returns:
+            Hex digest of the file contents, or None if the video does not exist
+        """
+        path = self._video_path(filename)
+        if path is None:
+            return None
+
+        signature = self._signature(path)
+        with self._lock:
+            cached = self._etags.get(filename)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()[:32]
+
+        with self._lock:
+            self._etags[filename] = (signature, etag)
+        return etag
+
+    def get_poster(self, filename: str) -> Optional[Tuple[str, str]]:
+        """
+        Get the poster frame of a video, generating it if missing or outdated
+
+        Args:
+            filename: Video file name
+
+        Returns:
+            (directory, filename) of the JPEG poster, or None if the video does
+            not exist or no frame could be read
+        """
+        path = self._video_path(filename)
+        if path is None:
+            return None
+
+        poster_name = f'{os.path.splitext(filename)[0]}.jpg'
+        poster_path = os.path.join(self.poster_dir, poster_name)
+        if os.path.exists(poster_path) and os.path.getmtime(poster_path) >= os.path.getmtime(path):
+            return self.poster_dir, poster_name
+
+        with self._lock:
+            frame = self._read_poster_frame(path)
+            if frame is None:
+                logger.warning(f"Could not read a poster frame from {filename}")
+                return None
+
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            if not ok:
+                return None
+            os.makedirs(self.poster_dir, exist_ok=True)
+            tmp_path = f'{poster_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(buffer.tobytes())
+            os.replace(tmp_path, poster_path)
+
+        logger.info(f"Generated poster frame for {filename}")
+        return self.poster_dir, poster_name
+
+    @staticmethod
+    def _read_poster_frame(path: str):
+        """Read the frame at POSTER_TIME_SECONDS, or the first frame for short videos"""
+        capture = cv2.VideoCapture(path)
+        try:
+            if not capture.isOpened():
+                return None
+            capture.set(cv2.CAP_PROP_POS_MSEC, POSTER_TIME_SECONDS * 1000.0)
+            ok, frame = capture.read()
+            if not ok:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = capture.read()
+            return frame if ok else None
+        finally:
+            capture.release()
+
+    def warm(self) -> Dict[str, bool]:
+        """
+        Compute ETags and posters for every video up front
+
+        Returns:
+            Mapping of video file name to whether its poster is available
+        """
+        results = {}
+        for filename in sorted(os.listdir(self.video_dir)):
+            if self._stop.is_set():
+                break
+            if self._video_path(filename) is None:
+                continue
+            self.get_etag(filename)
+            results[filename] = self.get_poster(filename) is not None
+        logger.info(f"Video assets ready: {results}")
+        return results
+
+    def start_warm(self) -> threading.Thread:
+        """
+        Warm ETags and posters in a background thread
+
+        Returns:
+            The warming thread
+        """
+        def run():
+            try:
+                self.warm()
+            except Exception as e:
+                logger.error(f"Preparing video assets failed: {str(e)}", exc_info=True)
+
+        self._stop.clear()
+        self._warmer = threading.Thread(target=run, name='video-assets', daemon=True)
+        self._warmer.start()
+        if not self._exit_hook_registered:
+            atexit.register(self.stop)
+            self._exit_hook_registered = True
+        return self._warmer
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop background warming between videos
+
+        Called at interpreter exit so OpenCV is never torn down mid-decode.
+
+        Args:
+            timeout: Seconds to wait for the warming thread
+        """
+        self._stop.set()
+        if self._warmer is not None and self._warmer.is_alive():
+            self._warmer.join(timeout)
+
+
+# Singleton instance
+_video_assets = None
+_video_assets_lock = threading.Lock()
+
+def get_video_assets() -> VideoAssets:
+    """
+    Get singleton instance of VideoAssets
+
+    Returns:
+        VideoAssets instance
+    """
+    global _video_assets
+    if _video_assets is None:
+        with _video_assets_lock:
+            if _video_assets is None:
+                _video_assets = VideoAssets()
+    return _video_assets
@@ -0,0 +1,10 @@
+"""ASGI entry point serving the same routes as the WSGI app.
+
+Run with an asyncio server, for example:
+    uvicorn your_application.asgi:application --host 0.0.0.0 --port $PORT
+"""
+
+from app import app
+from asgi_adapter import ASGIAdapter
+
+application = ASGIAdapter(app)